@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Headless JSON API for VPants POS clients and marketplace sync
+"""
+import argparse
+import json
+import queue
+import socket
+import threading
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from config.database import DEFAULT_LOCATION, ensure_database
+from models.money import rupiah
+from models.transaction import Transaction
+from services.backup_service import start_backup_scheduler, stop_backup_scheduler
+from services.dashboard_service import DashboardService
+from services.event_service import EventService, events, start_dispatcher, stop_dispatcher
+from services.finance_service import FinanceService
+from services.report_service import ReportService
+from services.reservation_service import ReservationService
+from services.sales_service import SalesService
+from services.simple_production_service import SimpleProductionService
+from services.stock_ledger_service import OutOfStockError
+from services.stock_management_service import StockManagementService
+from services.stock_service import StockService
+from services.write_queue import enable_write_queue, disable_write_queue
+from utils.metrics import render_metrics
+
+ROUTES = {}
+
+# Comment line sent on an idle event stream so proxies and clients keep it open
+SSE_HEARTBEAT_SECONDS = 15
+
+# Event streams open at once, each on its own thread outside the worker pool
+MAX_STREAMS = 64
+
+def route(method: str, path: str):
+    """Register a handler(services, params) for an exact method and path"""
+    def register(handler):
+        ROUTES[(method, path)] = handler
+        return handler
+    return register
+
+class ApiError(ValueError):
+    """Request error answered with an HTTP status"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class Services:
+    """Services owned by one worker thread, created on first use.
+    
+    Service connections are bound to the thread that opened them, so every
+    worker keeps its own set for its lifetime and reuses those connections
+    for every request it handles: the worker pool is the connection pool.
+    """
+    
+    classes = {
+        'sales': SalesService,
+        'reservations': ReservationService,
+        'stock': StockService,
+        'stock_management': StockManagementService,
+        'production': SimpleProductionService,
+        'finance': FinanceService,
+        'reports': ReportService,
+        'dashboard': DashboardService,
+        'events': EventService,
+    }
+    
+    def __getattr__(self, name):
+        if name not in self.classes:
+            raise AttributeError(name)
+        service = self.classes[name]()
+        setattr(self, name, service)
+        return service
+
+def _required(params, name):
+    if params.get(name) in (None, ''):
+        raise ApiError(f"Missing field: {name}")
+    return params[name]
+
+def _int(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise ApiError(f"Missing field: {name}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Field {name} must be an integer")
+
+def _quantity(params, name):
+    value = _int(params, name)
+    if value <= 0:
+        raise ApiError(f"Field {name} must be positive")
+    return value
+
+def _items(params):
+    """Cart items as {'product', 'size', 'quantity'} dicts, 400 naming the first bad item"""
+    items = _required(params, 'items')
+    if not isinstance(items, list) or not items:
+        raise ApiError("Field items must be a non-empty list")
+    checked = []
+    for index, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            raise ApiError(f"Item {index} must be an object")
+        try:
+            checked.append({'product': _required(item, 'product'), 'size': _required(item, 'size'),
+                            'quantity': _quantity(item, 'quantity')})
+        except ApiError as e:
+            raise ApiError(f"Item {index}: {e}")
+    return checked
+
+def _bool(params, name, default=False):
+    value = params.get(name, default)
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if str(value).strip().lower() in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ApiError(f"Field {name} must be true or false")
+
+def _float(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Field {name} must be a number")
+
+def _rupiah(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        return None
+    try:
+        return rupiah(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Field {name} must be an amount")
+
+def _date(params, name, default=None):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"Field {name} must be a date (YYYY-MM-DD)")
+
+def _records(frame):
+    """Report frame as JSON-ready rows, missing values as null"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+# Stock
+
+@route('GET', '/stock')
+def get_stock(services, params):
+    return [level._asdict() for level in services.stock.get_stock_levels(params.get('item_type'), params.get('location'))]
+
+@route('GET', '/stock/available')
+def get_available(services, params):
+    return {'available': services.reservations.get_available(
+        _required(params, 'product'), params.get('size'), params.get('token'),
+        params.get('location', DEFAULT_LOCATION))}
+
+@route('GET', '/stock/locations')
+def get_stock_by_location(services, params):
+    return _records(services.stock_management.get_stock_by_location(params.get('item_type')))
+
+@route('GET', '/products')
+def get_products(services, params):
+    return [offer._asdict() for offer in services.sales.get_available_products()]
+
+# Sales and carts
+
+@route('POST', '/sales')
+def post_sale(services, params):
+    amount = services.sales.record_sale(
+        _required(params, 'product'), params.get('size'), _quantity(params, 'quantity'),
+        unit_price=_rupiah(params, 'unit_price'), discount=_float(params, 'discount', 0),
+        payment_method=params.get('payment_method', ''), notes=params.get('notes', ''),
+        reservation=params.get('reservation'), location=params.get('location', DEFAULT_LOCATION))
+    return {'amount': amount}
+
+@route('POST', '/sales/pack')
+def post_pack_sale(services, params):
+    amount = services.sales.record_pack_sale(
+        _required(params, 'pack'), _quantity(params, 'quantity'),
+        unit_price=_rupiah(params, 'unit_price'), discount=_float(params, 'discount', 0),
+        payment_method=params.get('payment_method', ''), notes=params.get('notes', ''),
+        reservation=params.get('reservation'), location=params.get('location', DEFAULT_LOCATION))
+    return {'amount': amount}
+
+@route('POST', '/checkout')
+def post_checkout(services, params):
+    return services.sales.checkout(
+        _items(params), payment_method=params.get('payment_method', ''),
+        discount=_float(params, 'discount', 0), admin_fee=_rupiah(params, 'admin_fee', 0),
+        notes=params.get('notes', ''), include_bonus=_bool(params, 'include_bonus', True),
+        reservation=params.get('reservation'), location=params.get('location', DEFAULT_LOCATION))
+
+@route('POST', '/reservations')
+def post_reservation(services, params):
+    token = params.get('token') or services.reservations.new_token()
+    services.reservations.hold(token, _items(params),
+                               location=params.get('location', DEFAULT_LOCATION))
+    return {'token': token}
+
+@route('POST', '/reservations/release')
+def post_release(services, params):
+    services.reservations.release(_required(params, 'token'))
+    return {'token': params['token']}
+
+# Production and expenses
+
+@route('POST', '/production')
+def post_production(services, params):
+    return {'ok': services.production.record_production(
+        _required(params, 'product'), _required(params, 'size'), _quantity(params, 'quantity'),
+        _rupiah(params, 'cost_per_piece', 0))}
+
+@route('POST', '/packing')
+def post_packing(services, params):
+    return {'ok': services.production.record_packing(
+        _required(params, 'product'), _required(params, 'size'), _quantity(params, 'pack_size'),
+        _quantity(params, 'quantity'), _rupiah(params, 'pack_cost', 0))}
+
+@route('POST', '/expenses')
+def post_expense(services, params):
+    transaction_type = params.get('type', 'expense')
+    if transaction_type not in ('expense', 'purchase', 'withdrawal'):
+        raise ApiError("Field type must be expense, purchase or withdrawal")
+    amount = _rupiah(params, 'amount')
+    if not amount or amount <= 0:
+        raise ApiError("Field amount must be positive")
+    balance = services.finance.update_balance(Transaction(
+        type=transaction_type, category=_required(params, 'category'), amount=amount,
+        quantity=params.get('quantity'), notes=params.get('notes')))
+    return {'balance': balance}
+
+# Change events
+
+def _topics(params):
+    return [topic for topic in params.get('topics', '').split(',') if topic] or None
+
+@route('GET', '/events/poll')
+def get_events(services, params):
+    """Unacknowledged events of a consumer, or events after `since`"""
+    limit = _int(params, 'limit', 500)
+    if params.get('consumer'):
+        return services.events.read(params['consumer'], limit, _topics(params))
+    return services.events.get_events(_int(params, 'since', 0), limit, _topics(params))
+
+@route('POST', '/events/ack')
+def post_events_ack(services, params):
+    return {'consumer': _required(params, 'consumer'),
+            'last_id': services.events.ack(params['consumer'], _int(params, 'last_id'))}
+
+# Reports
+
+@route('GET', '/reports/dashboard')
+def get_dashboard(services, params):
+    return services.dashboard.get_snapshot()
+
+@route('GET', '/reports/daily-profit')
+def get_daily_profit(services, params):
+    day = _date(params, 'date')
+    return services.reports.get_daily_profit(datetime.combine(day, datetime.min.time()) if day else None)
+
+@route('GET', '/reports/profit')
+def get_profit(services, params):
+    return services.reports.get_profit_series(
+        _date(params, 'start', date.today()), _date(params, 'end', date.today()),
+        params.get('granularity', 'day'))
+
+@route('GET', '/reports/sales')
+def get_sales(services, params):
+    return _records(services.reports.get_sales_report(_int(params, 'days', 30), as_frame=True))
+
+@route('GET', '/reports/stock')
+def get_stock_report(services, params):
+    return _records(services.reports.get_stock_report(
+        as_frame=True, by_location=params.get('by_location') in ('1', 'true')))
+
+@route('GET', '/reports/transactions')
+def get_transactions(services, params):
+    return _records(services.reports.get_recent_transactions(_int(params, 'days', 7), as_frame=True))
+
+@route('GET', '/health')
+def get_health(services, params):
+    return {'status': 'ok'}
+
+def _json_default(value):
+    if is_dataclass(value):
+        return asdict(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # numpy scalars from report frames
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, POS clients reuse one connection
+    timeout = 5  # idle keep-alive connections give their worker back
+    handed_over = None  # set once the worker is done with a connection moved to a stream thread
+    
+    def setup(self):
+        super().setup()
+        # Small responses go out at once instead of waiting on the client's delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/events':
+            self._start_stream()
+        elif path == '/metrics':
+            body = render_metrics().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._dispatch('GET')
+    
+    def do_POST(self):
+        self._dispatch('POST')
+    
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        handler = ROUTES.get((method, url.path.rstrip('/') or '/'))
+        try:
+            if handler is None:
+                raise ApiError(f"Not found: {method} {url.path}", 404)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            params.update(self._read_body())
+            self._send(200, handler(self.server.local_services(), params))
+        except OutOfStockError as e:
+            self._send(409, {'error': str(e), 'item_name': e.item_name, 'size': e.size,
+                             'requested': e.requested, 'available': e.available, 'location': e.location})
+        except ApiError as e:
+            self._send(e.status, {'error': str(e)})
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            self._send(500, {'error': "Internal server error"})
+    
+    def _start_stream(self):
+        """Move an event stream to its own thread so it does not hold a worker"""
+        if not self.server.stream_slots.acquire(blocking=False):
+            self._send(503, {'error': "Too many event streams"})
+            return
+        self.close_connection = True
+        self.handed_over = threading.Event()
+        self.server.detach(self.request)
+        threading.Thread(target=self._run_stream, name="vpants-sse", daemon=True).start()
+    
+    def _run_stream(self):
+        try:
+            self._stream_events()
+        finally:
+            self.handed_over.wait()
+            super().finish()
+            self.server.stream_slots.release()
+            self.server.close_stream(self.request)
+    
+    def finish(self):
+        if self.handed_over is None:
+            super().finish()
+        else:
+            self.handed_over.set()
+    
+    def _stream_events(self):
+        """Server-Sent Events: backlog after the client's offset, then live events.
+        
+        The offset is `since`, the Last-Event-ID header on reconnect, or the
+        stored offset of `consumer` (acknowledged as events are sent). New
+        clients without any of these start at the latest event. At most
+        MAX_STREAMS streams are open at once, others get a 503.
+        """
+        params = {name: values[-1] for name, values in parse_qs(urlparse(self.path).query).items()}
+        service = self.server.local_services().events
+        topics = _topics(params)
+        consumer = params.get('consumer')
+        
+        live = queue.Queue()
+        unsubscribe = events.subscribe(live.put, topics)
+        try:
+            since = params.get('since') or self.headers.get('Last-Event-ID')
+            if since:
+                last_id = _int({'since': since}, 'since')
+            elif consumer:
+                last_id = service.get_offset(consumer)
+            else:
+                last_id = service.latest_id()
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.close_connection = True
+            
+            backlog = service.get_events(last_id, 500, topics)
+            while backlog:
+                for event in backlog:
+                    self._send_event(event)
+                last_id = backlog[-1].id
+                backlog = service.get_events(last_id, 500, topics)
+            if consumer:
+                service.ack(consumer, last_id)
+            
+            while True:
+                try:
+                    event = live.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    self.wfile.write(b': keepalive\n\n')
+                    continue
+                if event.id <= last_id:
+                    continue
+                self._send_event(event)
+                last_id = event.id
+                if consumer and live.empty():
+                    service.ack(consumer, last_id)
+        except ApiError as e:
+            self._send(e.status, {'error': str(e)})
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass
+        finally:
+            unsubscribe()
+    
+    def _send_event(self, event):
+        data = json.dumps(event.payload, default=_json_default)
+        self.wfile.write(f"id: {event.id}\nevent: {event.topic}\ndata: {data}\n\n".encode())
+    
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError("Body must be JSON")
+        if not isinstance(body, dict):
+            raise ApiError("Body must be a JSON object")
+        return body
+    
+    def _send(self, status, payload):
+        body = json.dumps(payload, default=_json_default).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class ApiServer(HTTPServer):
+    """HTTP server handing accepted connections to a fixed pool of worker threads.
+    
+    The accept loop never waits on a request. Each worker keeps its own
+    Services, so connections are opened once per worker instead of per
+    request, and writes from all workers are grouped by the write queue.
+    Event streams run on their own threads, up to `max_streams` at once.
+    """
+    
+    def __init__(self, address, workers: int = 16, verbose: bool = False, max_streams: int = MAX_STREAMS):
+        super().__init__(address, ApiHandler)
+        self.verbose = verbose
+        self.stream_slots = threading.BoundedSemaphore(max_streams)
+        self._streams = set()
+        self._local = threading.local()
+        self._connections = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, name=f"vpants-api-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+    
+    def local_services(self) -> Services:
+        """Services of the calling worker thread"""
+        if not hasattr(self._local, 'services'):
+            self._local.services = Services()
+        return self._local.services
+    
+    def process_request(self, request, client_address):
+        self._connections.put((request, client_address))
+    
+    def _work(self):
+        while True:
+            item = self._connections.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+    
+    def detach(self, request):
+        """Leave the connection open after its worker returns, a stream thread closes it"""
+        self._streams.add(request)
+    
+    def close_stream(self, request):
+        self._streams.discard(request)
+        super().shutdown_request(request)
+    
+    def shutdown_request(self, request):
+        if request not in self._streams:
+            super().shutdown_request(request)
+    
+    def server_close(self):
+        for _ in self._workers:
+            self._connections.put(None)
+        super().server_close()
+
+def serve(host: str = "127.0.0.1", port: int = 8600, workers: int = 16, verbose: bool = False):
+    """Run the API until interrupted"""
+    ensure_database()
+    enable_write_queue()
+    start_dispatcher()
+    start_backup_scheduler()
+    server = ApiServer((host, port), workers, verbose)
+    print(f"🚀 VPants API on http://{host}:{port} ({workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stop_dispatcher()
+        stop_backup_scheduler()
+        disable_write_queue()
+
+def main():
+    parser = argparse.ArgumentParser(description="VPants JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.verbose)
+
+if __name__ == "__main__":
+    main()
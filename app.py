@@ -1,26 +1,20 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
 import base64
-from PIL import Image
-import io
+import time
+from functools import lru_cache
 
 # Import authentication
 from auth import check_password
 
-# Import services
-from config.database import init_database
+# Import services - only what every page needs, pages import the rest (and pandas) themselves
+from config.database import ensure_database
 from config.brand_config import get_brand_config
-from services.finance_service import FinanceService
-from services.stock_service import StockService
-from services.stock_management_service import StockManagementService
 from services.initial_setup_service import InitialSetupService
-from services.report_service import ReportService
-from services.production_service import ProductionService
-from services.sales_service import SalesService
-from models.transaction import Transaction
-from models.stock import StockItem
-from utils.helpers import format_currency, safe_float
+from utils.helpers import format_currency, format_rupiah
+from utils.metrics import observe_page_render
+from utils.ui import METRICS_REFRESH_SECONDS
+
+script_started = time.perf_counter()
 
 # Page configuration
 st.set_page_config(
@@ -33,21 +27,31 @@ st.set_page_config(
 if not check_password():
     st.stop()
 
-# Initialize database and services
-init_database()
-finance_service = FinanceService()
-stock_service = StockService()
-stock_management_service = StockManagementService()
+@st.cache_resource
+def bootstrap():
+    """Once per server process, reruns and other sessions skip this"""
+    from services.backup_service import start_backup_scheduler
+    from services.event_service import start_dispatcher
+    from utils.metrics import start_metrics_server
+    
+    # Create the database on first start only
+    ensure_database()
+    # Caches drop their copies when other processes (API, scripts) change data
+    start_dispatcher()
+    # Service latency and database health on http://127.0.0.1:9108/metrics
+    start_metrics_server()
+    # Verified online backups into data/backups every few hours, while sales keep running
+    start_backup_scheduler()
+
+bootstrap()
 setup_service = InitialSetupService()
-report_service = ReportService()
-production_service = ProductionService()
-sales_service = SalesService()
 
 # Get brand configuration
 brand_config = get_brand_config()
 
+@lru_cache(maxsize=None)
 def get_base64_of_image(image_path):
-    """Convert image to base64 for HTML display"""
+    """Convert image to base64 for HTML display, read and encoded once per process"""
     try:
         with open(image_path, "rb") as img_file:
             return base64.b64encode(img_file.read()).decode()
@@ -145,103 +149,84 @@ if not setup_status['finance_initialized'] and page != "⚙️ Setup Awal":
 # Header
 st.markdown(f'<div class="main-header">👙 {brand_config["name"]} - Sistem Pembukuan & Stok</div>', unsafe_allow_html=True)
 
-# [REST OF YOUR ORIGINAL APP.PY CODE CONTINUES HERE...]
-# Copy the rest of your original app.py content starting from Dashboard section
-
 # Dashboard Page
-if page == "🏠 Dashboard":
-    col1, col2, col3 = st.columns(3)
+@st.fragment(run_every=METRICS_REFRESH_SECONDS)
+def dashboard():
+    """Dashboard from one consistent snapshot, re-read only after a change event"""
+    import pandas as pd
+    from datetime import date
+    from services.dashboard_service import DashboardService
+    from services.event_service import EventService
+    
+    latest_event = EventService().latest_id()
+    snapshot = st.session_state.get('dashboard_snapshot')
+    if (snapshot is None or snapshot.date != date.today().isoformat()
+            or st.session_state.get('dashboard_event_id') != latest_event):
+        snapshot = DashboardService().get_snapshot()
+        st.session_state.dashboard_snapshot = snapshot
+        st.session_state.dashboard_event_id = latest_event
     
-    # Current Balance
-    current_balance = finance_service.get_current_balance()
+    col1, col2, col3 = st.columns(3)
     with col1:
         st.metric(
             label="Saldo Saat Ini",
-            value=format_currency(current_balance),
+            value=format_currency(snapshot.balance),
             delta=None
         )
-    
-    # Financial Summary
-    summary = finance_service.get_financial_summary()
-    if summary:
-        current_balance, total_income, total_expenses, income_tx, expense_tx = summary
-        
-        with col2:
-            st.metric(
-                label="Total Pemasukan",
-                value=format_currency(total_income),
-                delta=f"{income_tx} transaksi"
-            )
-        
-        with col3:
-            st.metric(
-                label="Total Pengeluaran",
-                value=format_currency(total_expenses),
-                delta=f"{expense_tx} transaksi"
-            )
-    
-    # Stock Summary
-    st.subheader("📊 Ringkasan Stok")
-    
-    try:
-        stock_summary = stock_management_service.get_stock_summary()
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            total_raw = sum(item[1] for item in stock_summary['raw_materials']) if stock_summary['raw_materials'] else 0
-            st.metric("Bahan Mentah", f"{total_raw} items")
-        
-        with col2:
-            total_finished = sum(item[1] for item in stock_summary['finished_goods']) if stock_summary['finished_goods'] else 0
-            st.metric("Barang Jadi", f"{total_finished} pcs")
-        
-        with col3:
-            st.metric("Nilai Stok Bahan", format_currency(stock_summary['total_raw_value']))
-        
-        with col4:
-            st.metric("Nilai Stok Jadi", format_currency(stock_summary['total_finished_value']))
-            
-    except Exception as e:
-        st.error(f"Error loading stock summary: {e}")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Bahan Mentah", "0 items")
-        with col2:
-            st.metric("Barang Jadi", "0 pcs")
-        with col3:
-            st.metric("Nilai Stok Bahan", "Rp 0")
-        with col4:
-            st.metric("Nilai Stok Jadi", "Rp 0")
+    with col2:
+        st.metric(
+            label="Total Pemasukan",
+            value=format_currency(snapshot.total_income),
+            delta=f"{snapshot.income_transactions} transaksi"
+        )
+    with col3:
+        st.metric(
+            label="Total Pengeluaran",
+            value=format_currency(snapshot.total_expenses),
+            delta=f"{snapshot.expense_transactions} transaksi"
+        )
     
     # Daily Profit
     st.subheader("💰 Profit Hari Ini")
-    daily_profit = report_service.get_daily_profit()
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Pemasukan Hari Ini", format_currency(daily_profit['income']))
+        st.metric("Pemasukan Hari Ini", format_currency(snapshot.today_income))
     with col2:
-        st.metric("Pengeluaran Hari Ini", format_currency(daily_profit['expenses']))
+        st.metric("Pengeluaran Hari Ini", format_currency(snapshot.today_expenses))
     with col3:
-        profit_class = "profit-positive" if daily_profit['profit'] >= 0 else "profit-negative"
-        st.markdown(f"**Profit Hari Ini:** <span class='{profit_class}'>{format_currency(daily_profit['profit'])}</span>", 
+        profit_class = "profit-positive" if snapshot.today_profit >= 0 else "profit-negative"
+        st.markdown(f"**Profit Hari Ini:** <span class='{profit_class}'>{format_currency(snapshot.today_profit)}</span>", 
                    unsafe_allow_html=True)
     with col4:
-        st.metric("Total Transaksi", daily_profit['transaction_count'])
+        st.metric("Total Transaksi", snapshot.today_transactions)
+    
+    # Stock Summary
+    st.subheader("📊 Ringkasan Stok")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Bahan Mentah", f"{snapshot.total_raw_quantity} items")
+    with col2:
+        st.metric("Barang Jadi", f"{snapshot.total_finished_quantity} pcs")
+    with col3:
+        st.metric("Nilai Stok Bahan", format_currency(snapshot.total_raw_value))
+    with col4:
+        st.metric("Nilai Stok Jadi", format_currency(snapshot.total_finished_value))
     
     # Recent Transactions
     st.subheader("📋 Transaksi Terbaru")
-    recent_transactions = report_service.get_transaction_history(days=7)
     
-    if recent_transactions:
-        df_recent = pd.DataFrame(recent_transactions, 
-                               columns=['Jenis', 'Kategori', 'Amount', 'Qty', 'Size', 'Notes', 'Tanggal'])
-        df_recent['Amount'] = df_recent['Amount'].apply(format_currency)
-        st.dataframe(df_recent.head(10), width='stretch')
+    if snapshot.recent_transactions:
+        df_recent = pd.DataFrame(snapshot.recent_transactions,
+                                 columns=['Jenis', 'Kategori', 'Amount', 'Qty', 'Size', 'Notes', 'Tanggal'])
+        df_recent['Amount'] = format_rupiah(df_recent['Amount'])
+        st.dataframe(df_recent, width='stretch')
     else:
         st.info("Belum ada transaksi dalam 7 hari terakhir.")
 
-# [CONTINUE WITH THE REST OF YOUR ORIGINAL APP.PY...]
-# Add all the other pages (Input Manual, Stok, Produksi, Laporan, Setup Awal)
+# Other pages never run the dashboard queries
+if page == "🏠 Dashboard":
+    dashboard()
 
+observe_page_render(page, time.perf_counter() - script_started)
@@ -9,7 +9,7 @@ import io
 from auth import check_password
 
 # Import services
-from config.database import init_database
+from config.database import ensure_database
 from config.brand_config import get_brand_config
 from services.finance_service import FinanceService
 from services.stock_service import StockService
@@ -34,7 +34,7 @@ if not check_password():
     st.stop()
 
 # Initialize database and services
-init_database()
+ensure_database()
 finance_service = FinanceService()
 stock_service = StockService()
 stock_management_service = StockManagementService()
@@ -189,11 +189,11 @@ if page == "🏠 Dashboard":
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            total_raw = sum(item[1] for item in stock_summary['raw_materials']) if stock_summary['raw_materials'] else 0
+            total_raw = sum(item.quantity for item in stock_summary['raw_materials']) if stock_summary['raw_materials'] else 0
             st.metric("Bahan Mentah", f"{total_raw} items")
         
         with col2:
-            total_finished = sum(item[1] for item in stock_summary['finished_goods']) if stock_summary['finished_goods'] else 0
+            total_finished = sum(item.quantity for item in stock_summary['finished_goods']) if stock_summary['finished_goods'] else 0
             st.metric("Barang Jadi", f"{total_finished} pcs")
         
         with col3:
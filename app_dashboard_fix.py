@@ -11,11 +11,11 @@ try:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_raw = sum(item[1] for item in stock_summary['raw_materials']) if stock_summary['raw_materials'] else 0
+        total_raw = sum(item.quantity for item in stock_summary['raw_materials']) if stock_summary['raw_materials'] else 0
         st.metric("Bahan Mentah", f"{total_raw} pack")
     
     with col2:
-        total_finished = sum(item[1] for item in stock_summary['finished_goods']) if stock_summary['finished_goods'] else 0
+        total_finished = sum(item.quantity for item in stock_summary['finished_goods']) if stock_summary['finished_goods'] else 0
         st.metric("Barang Jadi", f"{total_finished} pcs")
     
     with col3:
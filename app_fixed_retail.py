@@ -1,18 +1,37 @@
 # GANTI BAGIAN RETAIL SALES FORM DENGAN INI:
+# Butuh import di app.py: from services.pricing_service import pricing
+#                         from services.reservation_service import ReservationService
+#                         from services.sales_service import SalesService
+#                         from services.stock_ledger_service import OutOfStockError
 
-with tab1:
-    st.subheader("🛒 Penjualan Retail")
+@st.fragment
+def retail_cart():
+    """Keranjang retail, dijalankan ulang sendiri saat item diubah"""
+    reservations = ReservationService()
+    sales_service = SalesService()
+    
+    # Pilihan produk dan ukuran dari katalog yang masih ada stoknya
+    sizes = {}
+    for offer in sales_service.get_available_products():
+        sizes.setdefault(offer.name, []).append(offer.size)
+    if not sizes:
+        st.info("Belum ada produk dengan stok untuk dijual")
+        return
+    products = list(sizes)
+    new_item = lambda: {'product': products[0], 'size': sizes[products[0]][0], 'quantity': 1}
     
     # Dynamic form untuk multiple items - di luar form utama
     if 'sale_items' not in st.session_state:
-        st.session_state.sale_items = [{'product': 'Celana VPants Basic', 'size': 'M', 'quantity': 1}]
+        st.session_state.sale_items = [new_item()]
+    if 'cart_token' not in st.session_state:
+        st.session_state.cart_token = ReservationService.new_token()
     
     # Controls untuk manage items (di luar form)
     col_controls, _ = st.columns([2, 1])
     with col_controls:
         if st.button("➕ Tambah Item", key="add_item_btn"):
-            st.session_state.sale_items.append({'product': 'Celana VPants Basic', 'size': 'M', 'quantity': 1})
-            st.experimental_rerun()
+            st.session_state.sale_items.append(new_item())
+            st.rerun(scope="fragment")
     
     # Tampilkan items saat ini
     st.write("**Item yang Dijual:**")
@@ -21,15 +40,15 @@ with tab1:
         with col1:
             product = st.selectbox(
                 f"Produk {i+1}",
-                ['Celana VPants Basic', 'Celana VPants Premium'],
-                index=0 if item['product'] == 'Celana VPants Basic' else 1,
+                products,
+                index=products.index(item['product']) if item['product'] in products else 0,
                 key=f"product_{i}"
             )
         with col2:
             size = st.selectbox(
                 f"Ukuran {i+1}",
-                ['S', 'M', 'L', 'XL', 'XXL'],
-                index=['S', 'M', 'L', 'XL', 'XXL'].index(item['size']),
+                sizes[product],
+                index=sizes[product].index(item['size']) if item['size'] in sizes[product] else 0,
                 key=f"size_{i}"
             )
         with col3:
@@ -43,16 +62,25 @@ with tab1:
             if i > 0:
                 if st.button("❌", key=f"remove_{i}"):
                     st.session_state.sale_items.pop(i)
-                    st.experimental_rerun()
+                    st.rerun(scope="fragment")
         
         # Update session state
         st.session_state.sale_items[i] = {'product': product, 'size': size, 'quantity': quantity}
     
-    # Bonus items untuk pembelian banyak
-    total_qty = sum(item['quantity'] for item in st.session_state.sale_items)
-    if total_qty >= 5:
+    # Tahan stok untuk keranjang ini selama masih dibuka
+    try:
+        reservations.hold(st.session_state.cart_token, st.session_state.sale_items)
+    except OutOfStockError as e:
+        st.warning(f"⚠️ Stok {e.item_name} {e.size} tinggal {e.available} pcs")
+    
+    # Bonus items untuk pembelian banyak, sesuai aturan bonus di pricing engine
+    channel = st.session_state.get("payment_method", "Cash")
+    cart_quote = pricing.price_cart(st.session_state.sale_items, channel)
+    total_qty = cart_quote.total_quantity
+    if cart_quote.bonus_items:
+        bonus = cart_quote.bonus_items[0]
         st.success(f"🎉 Pembelian {total_qty} pcs dapat bonus!")
-        bonus_item = st.checkbox("Tambahkan bonus 1 pcs (size M)", key="bonus_checkbox")
+        bonus_item = st.checkbox(f"Tambahkan bonus {bonus.quantity} pcs (size {bonus.size})", key="bonus_checkbox")
     else:
         bonus_item = False
     
@@ -66,63 +94,41 @@ with tab1:
             customer_notes = st.text_input("Catatan Pelanggan", key="customer_notes")
             admin_fee = st.number_input("Biaya Admin", min_value=0, value=0, key="admin_fee")
         
-        # Calculate total
-        estimated_total = total_qty * 150000  # Simplified calculation
-        final_total = estimated_total * (1 - discount/100) - admin_fee
+        # Calculate total dengan pricing engine yang sama dipakai SalesService.checkout
+        quote = pricing.price_cart(st.session_state.sale_items, payment_method, discount, admin_fee)
+        
+        for label, amount in quote.adjustments:
+            st.write(f"- {label}: {format_currency(amount)}")
+        if quote.unpriced_lines:
+            st.warning("⚠️ Harga belum diatur untuk: " +
+                       ", ".join(f"{line.product} {line.size}" for line in quote.unpriced_lines))
         
-        st.info(f"**Total Estimasi:** {format_currency(estimated_total)} | "
-               f"**Setelah Diskon {discount}%:** {format_currency(estimated_total * (1 - discount/100))} | "
-               f"**Final:** {format_currency(final_total)}")
+        st.info(f"**Subtotal:** {format_currency(quote.subtotal)} | "
+               f"**Final:** {format_currency(quote.total)}")
         
         submitted = st.form_submit_button("💾 Simpan Penjualan")
         
         if submitted:
             try:
-                # Process each sale item
-                for item in st.session_state.sale_items:
-                    transaction = Transaction(
-                        type='sale',
-                        category='retail_sale',
-                        amount=final_total / len(st.session_state.sale_items),  # Split amount
-                        quantity=item['quantity'],
-                        size=item['size'],
-                        notes=f"Penjualan {item['product']} {item['size']} - {customer_notes}"
-                    )
-                    
-                    # Update balance
-                    finance_service.update_balance(transaction)
-                    
-                    # Update stock
-                    stock_item = StockItem(
-                        item_type='finished',
-                        item_name=item['product'],
-                        quantity=-item['quantity'],
-                        size=item['size']
-                    )
-                    stock_service.update_stock(stock_item)
-                
-                # Add bonus item if applicable
-                if total_qty >= 5 and bonus_item:
-                    bonus_transaction = Transaction(
-                        type='sale',
-                        category='bonus',
-                        amount=0,
-                        quantity=1,
-                        size='M',
-                        notes="Bonus untuk pembelian 5+ pcs"
-                    )
-                    finance_service.update_balance(bonus_transaction)
-                    
-                    bonus_stock = StockItem(
-                        item_type='finished',
-                        item_name='Celana VPants Basic',
-                        quantity=-1,
-                        size='M'
-                    )
-                    stock_service.update_stock(bonus_stock)
+                sales_service.checkout(
+                    st.session_state.sale_items,
+                    payment_method=payment_method,
+                    discount=discount,
+                    admin_fee=admin_fee,
+                    notes=customer_notes,
+                    include_bonus=bonus_item,
+                    reservation=st.session_state.cart_token
+                )
                 
                 st.success(f"✅ Penjualan {total_qty} pcs berhasil dicatat!")
-                st.session_state.sale_items = [{'product': 'Celana VPants Basic', 'size': 'M', 'quantity': 1}]
+                st.session_state.sale_items = [new_item()]
+                st.session_state.cart_token = ReservationService.new_token()
                 
+            except OutOfStockError as e:
+                st.error(f"❌ Stok {e.item_name} {e.size} tidak cukup: diminta {e.requested}, tersedia {e.available}")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
+
+with tab1:
+    st.subheader("🛒 Penjualan Retail")
+    retail_cart()
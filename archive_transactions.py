@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Move closed fiscal years of transactions into yearly archive databases
+"""
+import argparse
+from pathlib import Path
+
+import config.database as database
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed fiscal years into data/archive_YYYY.db")
+    parser.add_argument("years", nargs="*", type=int, help="years to archive, default every closed year")
+    parser.add_argument("--db", default=str(database.DB_PATH), help="live database file")
+    parser.add_argument("--vacuum", action="store_true", help="shrink the live database file afterwards")
+    parser.add_argument("--list", action="store_true", help="only list archived years")
+    args = parser.parse_args()
+    
+    database.DB_PATH = Path(args.db)
+    from services.archive_service import ArchiveService
+    service = ArchiveService()
+    
+    if not args.list:
+        years = args.years or service.get_archivable_years()
+        if not years:
+            print("Nothing to archive")
+        for i, year in enumerate(years):
+            archive = service.archive_year(year, vacuum=args.vacuum and i == len(years) - 1)
+            print(f"✅ {year}: {archive.row_count} transactions in {archive.file}")
+    
+    for archive in service.get_archives():
+        print(f"{archive.year}  {archive.file}  {archive.row_count} rows  archived {archive.archived_at}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Online backup, rotation and restore of the VPants database
+"""
+import argparse
+from pathlib import Path
+
+import config.database as database
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up the live database into data/backups")
+    parser.add_argument("--db", default=str(database.DB_PATH), help="live database file")
+    parser.add_argument("--list", action="store_true", help="only list backups")
+    parser.add_argument("--rotate", action="store_true", help="delete backups outside the retention after backing up")
+    parser.add_argument("--restore", metavar="FILE", help="replace the live database with this backup")
+    args = parser.parse_args()
+    
+    database.DB_PATH = Path(args.db)
+    from services.backup_service import BackupService
+    service = BackupService()
+    
+    if args.restore:
+        safety = service.restore_backup(args.restore)
+        print(f"✅ Restored {args.restore}, previous data kept in {safety.path}")
+    elif not args.list:
+        backup = service.create_backup()
+        print(f"✅ Backup verified: {backup.path} ({backup.size_bytes} bytes)")
+        if args.rotate:
+            for path in service.rotate():
+                print(f"🗑️ Removed {path}")
+    
+    for backup in service.get_backups():
+        print(f"{backup.created_at}  {backup.path}  {backup.size_bytes} bytes")
+
+if __name__ == "__main__":
+    main()
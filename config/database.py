@@ -1,32 +1,311 @@
 import sqlite3
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 DB_PATH = Path("data/vpants.db")
 os.makedirs(DB_PATH.parent, exist_ok=True)
 
+# Route service writes through one background writer thread (services/write_queue.py)
+WRITE_QUEUE_ENABLED = os.environ.get("VPANTS_WRITE_QUEUE", "0") == "1"
+
+# Stock location used when none is given
+DEFAULT_LOCATION = "home"
+
+# Stock locations every database starts with, (code, name)
+DEFAULT_LOCATIONS = [(DEFAULT_LOCATION, 'Rumah'), ('reseller', 'Reseller'), ('shopee', 'Gudang Shopee')]
+
+# Catalog SKU given away by the default bonus rule
+BONUS_PRODUCT, BONUS_SIZE = 'Celana Dalam VPants', 'M'
+
+# Pricing rules every database starts with, (rule_type, product_name, min_quantity, price,
+# bonus_product, bonus_size, bonus_quantity, notes)
+DEFAULT_PRICING_RULES = [
+    # Pack bundles for loose pieces
+    ('pack', 'Celana Dalam VPants', 3, 200000, None, None, 0, 'Pack 3pcs'),
+    ('pack', 'Celana Dalam VPants', 5, 300000, None, None, 0, 'Pack 5pcs'),
+    ('pack', 'Celana Dalam VPants', 10, 550000, None, None, 0, 'Pack 10pcs'),
+    
+    # Bonus 1 pcs for 5+ pcs purchase
+    ('bonus', None, 5, None, BONUS_PRODUCT, BONUS_SIZE, 1, 'Bonus pembelian 5+ pcs'),
+]
+
+# PRAGMA user_version of the current schema, migrate_database() upgrades older files:
+# 0 the original schema, 1 whole rupiah amounts, 2 locations, ledger, pricing, alerts, outbox and archives,
+# 3 default bonus pointing at a catalog SKU
+SCHEMA_VERSION = 3
+
+# Columns added to the original tables, created by migrate_database() on older files
+ADDED_COLUMNS = {
+    'transactions': (('product_name', 'TEXT'), ('payment_method', 'TEXT'), ('location', 'TEXT'),
+                     ('gross_amount', 'INTEGER'), ('cost_amount', 'INTEGER')),
+    'stock': (('location', f"TEXT NOT NULL DEFAULT '{DEFAULT_LOCATION}' REFERENCES locations(code)"),
+              ('low_stock_threshold', 'INTEGER NOT NULL DEFAULT 10')),
+}
+
+# Columns holding whole rupiah
+MONEY_COLUMNS = {
+    'products': ('selling_price', 'cost_per_piece'),
+    'transactions': ('amount', 'gross_amount', 'cost_amount'),
+    'production_batches': ('labor_cost', 'materials_cost', 'total_cost'),
+    'finance': ('current_balance', 'total_income', 'total_expenses'),
+    'pricing_rules': ('price',),
+}
+
+# Called with every SQL statement run on connections opened while set (see set_statement_tracer)
+_statement_tracer = None
+
+def set_statement_tracer(tracer):
+    """Trace statements of connections opened from now on, e.g. to check their query plans; None stops"""
+    global _statement_tracer
+    _statement_tracer = tracer
+
+def _in_memory() -> bool:
+    return str(DB_PATH).startswith("file:")
+
 def get_connection():
     """Create database connection"""
-    return sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, uri=_in_memory())
+    if _statement_tracer is not None:
+        conn.set_trace_callback(_statement_tracer)
+    return conn
 
-def init_database():
-    """Initialize database tables dengan schema sederhana"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def get_read_connection():
+    """Create read-only connection for reports and dashboards"""
+    if _in_memory():
+        conn = sqlite3.connect(DB_PATH, uri=True, isolation_level=None)
+    else:
+        conn = sqlite3.connect(f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+    conn.execute("PRAGMA query_only = ON")
+    if _statement_tracer is not None:
+        conn.set_trace_callback(_statement_tracer)
+    return conn
+
+def archive_path(year: int) -> Path:
+    """File holding the archived transactions of a fiscal year"""
+    return Path(DB_PATH).with_name(f"archive_{year}.db")
+
+def backup_dir() -> Path:
+    """Directory holding online backups of the database"""
+    return Path(DB_PATH).with_name("backups")
+
+def _iso(value) -> str:
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+def transactions_view(conn, start=None, end=None) -> str:
+    """Table to read transactions created in [start, end) from, on a read connection.
     
-    # Drop existing tables
-    tables = ['transactions', 'stock', 'products', 'raw_materials', 'production_batches', 'finance']
+    Plain `transactions` while no archived year overlaps the range, so
+    current-year queries never open an archive. Otherwise the overlapping
+    archive_YYYY.db files are attached read-only and a temp UNION ALL view
+    over them and the live table is returned; range conditions on the view
+    are pushed down to each part's created_at index.
+    """
+    try:
+        archives = conn.execute('SELECT year, file FROM transaction_archives ORDER BY year').fetchall()
+    except sqlite3.OperationalError:
+        # Database created before archiving existed
+        return 'transactions'
+    archives = [(year, file) for year, file in archives
+                if (start is None or _iso(start) < f"{year + 1}-01-01")
+                and (end is None or _iso(end) > f"{year}-01-01")]
+    if not archives:
+        return 'transactions'
+    
+    view = 'transactions_' + '_'.join(str(year) for year, _ in archives)
+    if conn.execute("SELECT 1 FROM temp.sqlite_master WHERE name = ?", (view,)).fetchone():
+        return view
+    
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    for year, file in archives:
+        if f"archive_{year}" not in attached:
+            uri = Path(DB_PATH).with_name(file).resolve().as_uri()
+            conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (f"{uri}?mode=ro",))
+    
+    parts = ['SELECT * FROM main.transactions'] + \
+            [f'SELECT * FROM archive_{year}.transactions' for year, _ in archives]
+    # The temp schema lives in memory, query_only is lifted only to define the view
+    conn.execute("PRAGMA query_only = OFF")
+    try:
+        conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS {view} AS " + ' UNION ALL '.join(parts))
+    finally:
+        conn.execute("PRAGMA query_only = ON")
+    return view
+
+@contextmanager
+def read_transaction(conn):
+    """Run a group of reads inside one deferred transaction.
+
+    Under WAL every query in the block sees the same snapshot, so numbers
+    computed from several queries stay consistent while writers commit.
+    Nested use joins the outer transaction.
+    """
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+
+    conn.execute("BEGIN DEFERRED")
+    try:
+        yield conn.cursor()
+    finally:
+        conn.execute("COMMIT")
+
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+def ensure_database():
+    """Initialize the database once, only when it has no schema yet.
+    
+    Safe to call on every app rerun: after the first check in a process it
+    returns immediately, and it never drops an existing database the way
+    init_database() does. Returns True when the schema was created.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return False
+    
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return False
+        
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'")
+            initialized = cursor.fetchone() is not None
+        finally:
+            conn.close()
+        
+        if not initialized:
+            init_database()
+        else:
+            migrate_database()
+        _bootstrapped = True
+        return not initialized
+
+def _round_money(conn, tables):
+    """Store every fractional amount in tables as whole rupiah, half up like models.money.rupiah"""
     for table in tables:
-        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for column in MONEY_COLUMNS[table]:
+            if column not in existing:
+                continue
+            conn.execute(f'''
+                UPDATE {table} SET {column} = CAST(ROUND({column}) AS INTEGER)
+                WHERE typeof({column}) = 'real'
+            ''')
+
+def _migrate_whole_rupiah(conn):
+    """Version 1: REAL amounts left by the old DECIMAL(10,2) columns rounded half up to integers, in archives too"""
+    archives = conn.execute('SELECT year FROM transaction_archives').fetchall() \
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transaction_archives'").fetchone() else []
+    for (year,) in archives:
+        archive = sqlite3.connect(archive_path(year))
+        try:
+            _round_money(archive, ['transactions'])
+            archive.commit()
+        finally:
+            archive.close()
+    _round_money(conn, MONEY_COLUMNS)
+
+def _migrate_schema(conn):
+    """Version 2: columns, tables, indexes, triggers and seed rows added since the original schema"""
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for column, definition in columns:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    # One row per SKU and location, as idx_stock_sku_location requires
+    conn.execute('''
+        UPDATE stock SET quantity = (
+            SELECT SUM(s.quantity) FROM stock s
+            WHERE s.item_type = stock.item_type AND s.item_name = stock.item_name
+            AND s.size IS stock.size AND s.location = stock.location
+        )
+        WHERE id IN (SELECT MIN(id) FROM stock GROUP BY item_type, item_name, size, location HAVING COUNT(*) > 1)
+    ''')
+    conn.execute('DELETE FROM stock WHERE id NOT IN (SELECT MIN(id) FROM stock GROUP BY item_type, item_name, size, location)')
+    
+    _create_schema(conn.cursor())
+    conn.executemany('INSERT OR IGNORE INTO locations (code, name) VALUES (?, ?)', DEFAULT_LOCATIONS)
+    if not conn.execute('SELECT 1 FROM pricing_rules LIMIT 1').fetchone():
+        conn.executemany('''
+            INSERT INTO pricing_rules (rule_type, product_name, min_quantity, price,
+                                       bonus_product, bonus_size, bonus_quantity, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', DEFAULT_PRICING_RULES)
+
+def _migrate_bonus_sku(conn):
+    """Version 3: the default bonus seeded by version 2 gave away a product missing from the catalog"""
+    conn.execute('''
+        UPDATE pricing_rules SET bonus_product = ?, bonus_size = ?
+        WHERE rule_type = 'bonus' AND bonus_product = 'Celana VPants Basic'
+        AND NOT EXISTS (SELECT 1 FROM products p WHERE p.name = bonus_product AND p.size IS bonus_size)
+    ''', (BONUS_PRODUCT, BONUS_SIZE))
+
+# (version, step) in order, each step brings a database at the previous version up to its own
+MIGRATIONS = [
+    (1, _migrate_whole_rupiah),
+    (2, _migrate_schema),
+    (3, _migrate_bonus_sku),
+]
+
+def migrate_database():
+    """Bring a database created by an older version up to SCHEMA_VERSION.
     
+    Runs every step in MIGRATIONS newer than the file's PRAGMA user_version,
+    each in its own transaction that also records the version it reached.
+    A backup is taken before anything is rewritten.
+    """
+    conn = get_connection()
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return False
+        
+        from services.backup_service import BackupService
+        backup = BackupService().create_backup()
+        print(f"Backup before migrating to schema {SCHEMA_VERSION}: {backup.path}")
+        
+        conn.execute('PRAGMA journal_mode=WAL')
+        for target, step in MIGRATIONS:
+            if version >= target:
+                continue
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                step(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+    _invalidate_caches()
+    
+    # Stock as of a date replays movements from a snapshot, the first one holds the migrated quantities
+    from services.stock_ledger_service import StockLedgerService
+    ledger = StockLedgerService()
+    ledger.ensure_snapshot()
+    ledger.conn.close()
+    ledger.read_conn.close()
+    return True
+
+def _create_schema(cursor):
+    """Create every table, index and trigger missing from the database, leaving existing ones as they are"""
     # Products table - simplified
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS products (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             size TEXT NOT NULL,
-            selling_price DECIMAL(10,2) NOT NULL,
-            cost_per_piece DECIMAL(10,2) NOT NULL,
+            selling_price INTEGER NOT NULL,
+            cost_per_piece INTEGER NOT NULL,
             pieces_per_pack INTEGER NOT NULL DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
@@ -42,24 +321,40 @@ def init_database():
                 'production', 'packing'
             )),
             category TEXT NOT NULL,
-            amount DECIMAL(10,2) NOT NULL,
+            amount INTEGER NOT NULL,
             quantity INTEGER,
             size TEXT,
             unit TEXT,
             discount DECIMAL(5,2) DEFAULT 0,
             notes TEXT,
+            product_name TEXT,
+            payment_method TEXT,
+            location TEXT,
+            gross_amount INTEGER,
+            cost_amount INTEGER,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
-    # Stock table - simplified
+    # Stock locations - home, resellers, marketplace fulfilment warehouses
     cursor.execute('''
+        CREATE TABLE IF NOT EXISTS locations (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Stock table - simplified, one row per SKU and location
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS stock (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             item_type TEXT NOT NULL CHECK(item_type IN ('material', 'finished')),
             item_name TEXT NOT NULL,
             size TEXT,
+            location TEXT NOT NULL DEFAULT '{DEFAULT_LOCATION}' REFERENCES locations(code),
             quantity INTEGER NOT NULL,
+            low_stock_threshold INTEGER NOT NULL DEFAULT 10,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
@@ -71,9 +366,9 @@ def init_database():
             product_name TEXT NOT NULL,
             size TEXT NOT NULL,
             quantity_produced INTEGER NOT NULL,
-            labor_cost DECIMAL(10,2) NOT NULL,
-            materials_cost DECIMAL(10,2) NOT NULL,
-            total_cost DECIMAL(10,2) NOT NULL,
+            labor_cost INTEGER NOT NULL,
+            materials_cost INTEGER NOT NULL,
+            total_cost INTEGER NOT NULL,
             notes TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
@@ -83,13 +378,246 @@ def init_database():
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS finance (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            current_balance DECIMAL(10,2) DEFAULT 0,
-            total_income DECIMAL(10,2) DEFAULT 0,
-            total_expenses DECIMAL(10,2) DEFAULT 0,
+            current_balance INTEGER DEFAULT 0,
+            total_income INTEGER DEFAULT 0,
+            total_expenses INTEGER DEFAULT 0,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    # Pricing rules table - pack bundles, quantity tiers, channel prices, bonuses
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pricing_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rule_type TEXT NOT NULL CHECK(rule_type IN ('pack', 'tier', 'channel', 'bonus')),
+            product_name TEXT,
+            size TEXT,
+            channel TEXT,
+            min_quantity INTEGER NOT NULL DEFAULT 1,
+            price INTEGER,
+            discount_percent DECIMAL(5,2) DEFAULT 0,
+            bonus_product TEXT,
+            bonus_size TEXT,
+            bonus_quantity INTEGER DEFAULT 0,
+            active INTEGER NOT NULL DEFAULT 1,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Demand forecast state - smoothed daily demand per SKU, updated incrementally
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS demand_forecast (
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            size TEXT NOT NULL DEFAULT '',
+            daily_demand REAL NOT NULL DEFAULT 0,
+            demand_variance REAL NOT NULL DEFAULT 0,
+            last_day DATE NOT NULL,
+            PRIMARY KEY (item_type, item_name, size)
+        )
+    ''')
+    
+    # Low stock alerts - queued by triggers when a quantity crosses its threshold
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stock_id INTEGER NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            size TEXT,
+            location TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            threshold INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            acknowledged_at TIMESTAMP,
+            resolved_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_stock_alerts_pending ON stock_alerts(stock_id)
+        WHERE acknowledged_at IS NULL AND resolved_at IS NULL
+    ''')
+    
+    # Enqueue on the change that takes a SKU to or below its threshold,
+    # resolve open alerts once it is restocked above it again
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stock_low_insert
+        AFTER INSERT ON stock
+        WHEN NEW.quantity <= NEW.low_stock_threshold
+        BEGIN
+            INSERT INTO stock_alerts (stock_id, item_type, item_name, size, location, quantity, threshold)
+            VALUES (NEW.id, NEW.item_type, NEW.item_name, NEW.size, NEW.location, NEW.quantity, NEW.low_stock_threshold);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stock_low_update
+        AFTER UPDATE OF quantity, low_stock_threshold ON stock
+        WHEN NEW.quantity <= NEW.low_stock_threshold AND OLD.quantity > OLD.low_stock_threshold
+        BEGIN
+            INSERT INTO stock_alerts (stock_id, item_type, item_name, size, location, quantity, threshold)
+            VALUES (NEW.id, NEW.item_type, NEW.item_name, NEW.size, NEW.location, NEW.quantity, NEW.low_stock_threshold);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stock_low_resolve
+        AFTER UPDATE OF quantity, low_stock_threshold ON stock
+        WHEN NEW.quantity > NEW.low_stock_threshold AND OLD.quantity <= OLD.low_stock_threshold
+        BEGIN
+            UPDATE stock_alerts SET resolved_at = CURRENT_TIMESTAMP
+            WHERE stock_id = NEW.id AND acknowledged_at IS NULL AND resolved_at IS NULL;
+        END
+    ''')
+    
+    # Stock movement ledger - every quantity change with the quantity it left
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stock_id INTEGER NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            size TEXT,
+            location TEXT NOT NULL,
+            quantity_change INTEGER NOT NULL,
+            quantity_after INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            transaction_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_movements_created_at ON stock_movements(created_at)')
+    
+    # Point-in-time inventory, stock as of a date replays only movements after the nearest snapshot
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last_movement_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+            snapshot_id INTEGER NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            size TEXT,
+            location TEXT NOT NULL,
+            quantity INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_snapshot_items_snapshot ON stock_snapshot_items(snapshot_id)')
+    
+    # Short-lived stock holds for carts open in the UI, ignored once expired
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token TEXT NOT NULL,
+            item_type TEXT NOT NULL,
+            item_name TEXT NOT NULL,
+            size TEXT,
+            location TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_reservations_item ON stock_reservations(item_type, item_name, size, location)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_reservations_token ON stock_reservations(token)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_reservations_expires_at ON stock_reservations(expires_at)')
+    
+    # Closed fiscal years moved out of transactions into archive_YYYY.db files next to the database
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            income_count INTEGER NOT NULL,
+            expense_count INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Transactional outbox - triggers append a change event in the same transaction as every write
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_offsets (
+            consumer TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    stock_event = "json_object('id', NEW.id, 'item_type', NEW.item_type, 'item_name', NEW.item_name, " \
+                  "'size', NEW.size, 'location', NEW.location, 'quantity', NEW.quantity, 'change', {change})"
+    product_event = "json_object('id', {row}.id, 'name', {row}.name, 'size', {row}.size, 'action', '{action}')"
+    outbox_triggers = {
+        'trg_outbox_transaction': ('INSERT ON transactions', 'transaction',
+            "json_object('id', NEW.id, 'type', NEW.type, 'category', NEW.category, 'amount', NEW.amount, "
+            "'quantity', NEW.quantity, 'size', NEW.size, 'product_name', NEW.product_name, 'location', NEW.location)"),
+        'trg_outbox_stock_insert': ('INSERT ON stock', 'stock', stock_event.format(change='NEW.quantity')),
+        'trg_outbox_stock_update': ('UPDATE OF quantity, low_stock_threshold ON stock', 'stock',
+                                    stock_event.format(change='NEW.quantity - OLD.quantity')),
+        'trg_outbox_finance': ('INSERT ON finance', 'balance',
+            "json_object('current_balance', NEW.current_balance, 'total_income', NEW.total_income, "
+            "'total_expenses', NEW.total_expenses)"),
+        'trg_outbox_alert': ('INSERT ON stock_alerts', 'alert',
+            "json_object('id', NEW.id, 'item_type', NEW.item_type, 'item_name', NEW.item_name, 'size', NEW.size, "
+            "'location', NEW.location, 'quantity', NEW.quantity, 'threshold', NEW.threshold)"),
+        'trg_outbox_product_insert': ('INSERT ON products', 'product', product_event.format(row='NEW', action='insert')),
+        'trg_outbox_product_update': ('UPDATE ON products', 'product', product_event.format(row='NEW', action='update')),
+        'trg_outbox_product_delete': ('DELETE ON products', 'product', product_event.format(row='OLD', action='delete')),
+        'trg_outbox_pricing_insert': ('INSERT ON pricing_rules', 'pricing', "json_object('id', NEW.id, 'active', NEW.active)"),
+        'trg_outbox_pricing_update': ('UPDATE ON pricing_rules', 'pricing', "json_object('id', NEW.id, 'active', NEW.active)"),
+    }
+    for name, (event, topic, payload) in outbox_triggers.items():
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name}
+            AFTER {event}
+            BEGIN
+                INSERT INTO outbox (topic, payload) VALUES ('{topic}', {payload});
+            END
+        ''')
+    
+    # SKU lookups per location, and location-wide listings
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_sku_location ON stock(item_type, item_name, size, location)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stock_location ON stock(location, item_type, item_name, size)')
+    
+    # Indexes for date range reports
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_type_created_at ON transactions(type, created_at)')
+
+def init_database():
+    """Initialize database tables dengan schema sederhana"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # WAL lets report snapshots read while writers commit
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    # Drop existing tables
+    tables = ['transactions', 'stock', 'products', 'raw_materials', 'production_batches', 'finance',
+              'pricing_rules', 'demand_forecast', 'stock_alerts', 'stock_movements', 'stock_snapshots',
+              'stock_snapshot_items', 'stock_reservations', 'locations', 'outbox', 'outbox_offsets',
+              'transaction_archives']
+    for table in tables:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    
+    _create_schema(cursor)
+    
+    # Insert stock locations
+    cursor.executemany('''
+        INSERT INTO locations (code, name) VALUES (?, ?)
+    ''', DEFAULT_LOCATIONS)
+    
     # Insert initial finance record
     cursor.execute('''
         INSERT INTO finance (current_balance, total_income, total_expenses) 
@@ -135,9 +663,95 @@ def init_database():
         VALUES (?, ?, ?, ?)
     ''', initial_materials)
     
+    # Insert default pricing rules
+
+    cursor.executemany('''
+        INSERT INTO pricing_rules (rule_type, product_name, min_quantity, price,
+                                   bonus_product, bonus_size, bonus_quantity, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', DEFAULT_PRICING_RULES)
+
     conn.commit()
     conn.close()
+
+    _invalidate_caches()
+    from services.stock_ledger_service import StockLedgerService
+    ledger = StockLedgerService()
+    ledger.take_snapshot()
+    ledger.conn.close()
+    ledger.read_conn.close()
     print("✅ Database initialized dengan sistem sederhana!")
 
+def _invalidate_caches():
+    # Imported here, services depend on this module
+    from services.catalog_service import catalog
+    from services.pricing_service import pricing
+    catalog.invalidate()
+    pricing.invalidate()
+
+_template_lock = threading.Lock()
+
+def database_template() -> Path:
+    """File with the schema and seed rows init_database() creates.
+    
+    Built once per version of this module and shared by every process
+    through the temp directory; cloning it replaces running the DDL and
+    seed inserts statement by statement.
+    """
+    digest = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:12]
+    template = Path(tempfile.gettempdir()) / f"vpants-template-{digest}.db"
+    with _template_lock:
+        if template.exists():
+            return template
+        
+        global DB_PATH
+        live_path = DB_PATH
+        partial = template.with_name(f"{template.stem}-{os.getpid()}.partial")
+        DB_PATH = partial
+        try:
+            init_database()
+        finally:
+            DB_PATH = live_path
+        # Rollback journal in the template, a WAL header cannot be restored into memory
+        conn = sqlite3.connect(partial)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+        os.replace(partial, template)
+        _invalidate_caches()
+    return template
+
+def fresh_database(path=None):
+    """Replace the database file (DB_PATH by default) with a copy of the template.
+    
+    Same result as init_database() on an empty file, without its DDL. Use it
+    only while no connection has the file open.
+    """
+    path = Path(path or DB_PATH)
+    template = database_template()
+    for suffix in ('-wal', '-shm'):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    shutil.copyfile(template, path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    _invalidate_caches()
+
+def use_memory_database(name: str = "vpants"):
+    """Point DB_PATH at a shared in-memory copy of the template, for tests.
+    
+    Returns the connection keeping the database alive; close it and set
+    DB_PATH back when done.
+    """
+    global DB_PATH
+    DB_PATH = f"file:{name}?mode=memory&cache=shared"
+    keeper = sqlite3.connect(DB_PATH, uri=True)
+    template = sqlite3.connect(database_template())
+    try:
+        template.backup(keeper)
+    finally:
+        template.close()
+    _invalidate_caches()
+    return keeper
+
 if __name__ == "__main__":
     init_database()
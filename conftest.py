@@ -0,0 +1,15 @@
+"""
+Test setup: every test gets its own in-memory copy of the template database
+"""
+import pytest
+
+import config.database as database
+
+@pytest.fixture(autouse=True)
+def memory_database():
+    """Fresh schema and seed rows without touching data/vpants.db"""
+    live_path = database.DB_PATH
+    keeper = database.use_memory_database()
+    yield keeper
+    keeper.close()
+    database.DB_PATH = live_path
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Load test VPants services with concurrent cashiers and dashboard viewers
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import config.database as database
+
+# Operation mix, relative weights
+DEFAULT_MIX = {'sale': 50, 'pack_sale': 10, 'update_stock': 10, 'adjust_stock': 5, 'dashboard': 25}
+INITIAL_BALANCE = 5000000
+PRODUCTS = [('Celana Dalam VPants', size) for size in ('S', 'M', 'L', 'XL')] + \
+           [('Celana Pembalut VPants', size) for size in ('S', 'M', 'L')]
+PACKS = ['Celana Dalam Pack 3pcs', 'Celana Dalam Pack 5pcs', 'Celana Dalam Pack 10pcs']
+MATERIALS = ['Benang', 'Karet Elastis', 'Kemasan']
+
+def parse_mix(text: str):
+    """'sale=50,dashboard=25' -> {'sale': 50, 'dashboard': 25}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+def prepare_database(db_path: str, stock_per_sku: int):
+    """Fresh database with balance and stock for the run, returns the starting stock snapshot id"""
+    database.DB_PATH = Path(db_path)
+    database.fresh_database()
+    
+    from services.initial_setup_service import InitialSetupService
+    from services.stock_ledger_service import StockLedgerService
+    from services.stock_management_service import StockManagementService
+    from models.stock import StockItem
+    InitialSetupService().setup_initial_balance(INITIAL_BALANCE)
+    StockManagementService().initialize_stock(
+        [StockItem('finished', name, stock_per_sku, size) for name, size in PRODUCTS] +
+        [StockItem('finished', pack, stock_per_sku // 10, 'PACKED') for pack in PACKS] +
+        [StockItem('material', material, stock_per_sku) for material in MATERIALS])
+    return StockLedgerService().take_snapshot()
+
+class Cashier:
+    """One simulated session running the operation mix on its own services"""
+    
+    def __init__(self, seed: int, mix):
+        from services.dashboard_service import DashboardService
+        from services.sales_service import SalesService
+        from services.stock_management_service import StockManagementService
+        from services.stock_service import StockService
+        self.random = random.Random(seed)
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.sales = SalesService()
+        self.stock = StockService()
+        self.stock_management = StockManagementService()
+        self.dashboard = DashboardService()
+    
+    def run_once(self):
+        """Run one random operation, returns (operation, outcome, seconds)"""
+        from services.stock_ledger_service import OutOfStockError
+        operation = self.random.choices(self.operations, self.weights)[0]
+        start = time.perf_counter()
+        try:
+            getattr(self, f"_{operation}")()
+            outcome = 'ok'
+        except OutOfStockError:
+            outcome = 'out_of_stock'
+        except sqlite3.OperationalError as e:
+            outcome = 'lock_timeout' if 'locked' in str(e) or 'busy' in str(e) else 'error'
+        except ValueError:
+            outcome = 'rejected'
+        except Exception:
+            outcome = 'error'
+        return operation, outcome, time.perf_counter() - start
+    
+    def _sale(self):
+        name, size = self.random.choice(PRODUCTS)
+        self.sales.record_sale(name, size, self.random.randint(1, 3), payment_method='Cash')
+    
+    def _pack_sale(self):
+        self.sales.record_pack_sale(self.random.choice(PACKS), 1, payment_method='Cash')
+    
+    def _update_stock(self):
+        from models.stock import StockItem
+        name, size = self.random.choice(PRODUCTS)
+        self.stock.update_stock(StockItem('finished', name, self.random.randint(1, 5), size))
+    
+    def _adjust_stock(self):
+        self.stock_management.adjust_stock('material', self.random.choice(MATERIALS),
+                                           self.random.choice([-2, -1, 1, 2]), notes='load test')
+    
+    def _dashboard(self):
+        self.dashboard.get_snapshot()
+
+def run_threads(db_path: str, threads: int, duration: float, mix, seed: int, write_queue: bool):
+    """Run cashier threads until the deadline, returns {operation: {outcome: [seconds]}}"""
+    database.DB_PATH = Path(db_path)
+    if write_queue:
+        from services.write_queue import enable_write_queue
+        enable_write_queue()
+    
+    results = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    
+    def work(worker_seed):
+        cashier = Cashier(worker_seed, mix)
+        local = {}
+        barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            operation, outcome, seconds = cashier.run_once()
+            local.setdefault(operation, {}).setdefault(outcome, []).append(seconds)
+        with lock:
+            for operation, outcomes in local.items():
+                for outcome, latencies in outcomes.items():
+                    results.setdefault(operation, {}).setdefault(outcome, []).extend(latencies)
+    
+    workers = [threading.Thread(target=work, args=(seed * 1000 + i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    if write_queue:
+        from services.write_queue import disable_write_queue
+        disable_write_queue()
+    return results
+
+def _run_process(args):
+    return run_threads(*args)
+
+def percentile(sorted_values, pct: float):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        'p50_ms': round(percentile(values, 50) * 1000, 3) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 3) if values else None,
+        'max_ms': round(values[-1] * 1000, 3) if values else None,
+    }
+
+def check_invariants(db_path: str, snapshot_id: int):
+    """Stock and balance consistency after the run"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    checks = {}
+    
+    # Every stock row equals its starting snapshot plus the movements ledgered since
+    cursor.execute('''
+        SELECT COUNT(*)
+        FROM stock s
+        JOIN stock_snapshots snap ON snap.id = ?
+        LEFT JOIN stock_snapshot_items i ON i.snapshot_id = snap.id AND i.item_type = s.item_type
+            AND i.item_name = s.item_name AND i.size IS s.size AND i.location = s.location
+        WHERE s.quantity != COALESCE(i.quantity, 0) + (
+            SELECT COALESCE(SUM(m.quantity_change), 0) FROM stock_movements m
+            WHERE m.stock_id = s.id AND m.id > snap.last_movement_id)
+    ''', (snapshot_id,))
+    drifted = cursor.fetchone()[0]
+    checks['stock_matches_ledger'] = {'ok': drifted == 0, 'mismatched_rows': drifted}
+    
+    # Sales never take finished stock below zero
+    cursor.execute("SELECT COUNT(*) FROM stock WHERE item_type = 'finished' AND quantity < 0")
+    negative = cursor.fetchone()[0]
+    checks['no_negative_finished_stock'] = {'ok': negative == 0, 'negative_rows': negative}
+    
+    # Balance and income follow the recorded sales (no lost finance updates)
+    cursor.execute("SELECT current_balance, total_income FROM finance ORDER BY id DESC LIMIT 1")
+    balance, income = cursor.fetchone()
+    cursor.execute("SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM transactions WHERE type = 'sale'")
+    sales_amount, sales_count = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM finance")
+    finance_rows = cursor.fetchone()[0]
+    checks['balance_matches_sales'] = {
+        'ok': abs(balance - INITIAL_BALANCE - sales_amount) < 0.01 and abs(income - sales_amount) < 0.01,
+        'balance': balance, 'expected_balance': INITIAL_BALANCE + sales_amount,
+        'total_income': income, 'sales_amount': sales_amount,
+    }
+    checks['one_finance_row_per_sale'] = {'ok': finance_rows == sales_count + 1,
+                                          'finance_rows': finance_rows, 'sales': sales_count}
+    conn.close()
+    return checks
+
+def run(db_path: str, processes: int, threads: int, duration: float, mix, seed: int,
+        write_queue: bool, stock_per_sku: int):
+    """Run the load test and return the JSON-ready report"""
+    snapshot_id = prepare_database(db_path, stock_per_sku)
+    
+    started = time.perf_counter()
+    if processes == 1:
+        runs = [run_threads(db_path, threads, duration, mix, seed, write_queue)]
+    else:
+        jobs = [(db_path, threads, duration, mix, seed + i, write_queue) for i in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            runs = pool.map(_run_process, jobs)
+    elapsed = time.perf_counter() - started
+    
+    merged = {}
+    for result in runs:
+        for operation, outcomes in result.items():
+            for outcome, latencies in outcomes.items():
+                merged.setdefault(operation, {}).setdefault(outcome, []).extend(latencies)
+    
+    operations = {}
+    for operation in sorted(merged):
+        outcomes = merged[operation]
+        every = [seconds for latencies in outcomes.values() for seconds in latencies]
+        operations[operation] = {
+            'count': len(every),
+            'outcomes': {outcome: len(latencies) for outcome, latencies in sorted(outcomes.items())},
+            **summarize(every),
+        }
+    all_latencies = [seconds for outcomes in merged.values() for latencies in outcomes.values() for seconds in latencies]
+    invariants = check_invariants(db_path, snapshot_id)
+    
+    return {
+        'config': {
+            'processes': processes, 'threads_per_process': threads, 'sessions': processes * threads,
+            'duration_s': duration, 'mix': mix, 'seed': seed, 'write_queue': write_queue,
+            'stock_per_sku': stock_per_sku,
+        },
+        'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform()},
+        'elapsed_s': round(elapsed, 3),
+        'total_operations': len(all_latencies),
+        'throughput_ops_s': round(len(all_latencies) / elapsed, 1),
+        'lock_timeouts': sum(len(outcomes.get('lock_timeout', [])) for outcomes in merged.values()),
+        'errors': sum(len(outcomes.get('error', [])) for outcomes in merged.values()),
+        'latency': summarize(all_latencies),
+        'operations': operations,
+        'invariants': invariants,
+        'invariants_ok': all(check['ok'] for check in invariants.values()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="VPants load test")
+    parser.add_argument("--db", default="data/loadtest.db", help="database file, recreated for every run")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8, help="sessions per process")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="operation weights, e.g. sale=50,pack_sale=10,update_stock=10,adjust_stock=5,dashboard=25")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--write-queue", action="store_true", help="route writes through the single writer thread")
+    parser.add_argument("--stock", type=int, default=100000, help="starting quantity per SKU")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    
+    if Path(args.db).resolve() == Path("data/vpants.db").resolve():
+        parser.error("refusing to run against the live database")
+    
+    report = run(args.db, args.processes, args.threads, args.duration, args.mix, args.seed,
+                 args.write_queue, args.stock)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    sys.exit(0 if report['invariants_ok'] else 1)
+
+if __name__ == "__main__":
+    main()
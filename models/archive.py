@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class TransactionArchive:
+    year: int
+    file: str  # archive_YYYY.db, next to the main database
+    row_count: int
+    income_count: int
+    expense_count: int
+    last_id: int  # highest transaction id moved into the archive
+    archived_at: Optional[str] = None
@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+@dataclass
+class Backup:
+    path: str
+    created_at: str  # YYYY-MM-DD HH:MM:SS, from the file name
+    size_bytes: int
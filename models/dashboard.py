@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from models.money import Rupiah
+from models.transaction import TransactionRecord
+
+@dataclass
+class DashboardSnapshot:
+    """Everything the dashboard shows, read from one database snapshot"""
+    date: str
+    balance: Rupiah = 0
+    total_income: Rupiah = 0
+    total_expenses: Rupiah = 0
+    income_transactions: int = 0
+    expense_transactions: int = 0
+    today_income: Rupiah = 0
+    today_expenses: Rupiah = 0
+    today_profit: Rupiah = 0
+    today_transactions: int = 0
+    raw_materials: List[Tuple[str, int]] = field(default_factory=list)  # (item_name, quantity)
+    finished_goods: List[Tuple[Optional[str], int]] = field(default_factory=list)  # (size, quantity)
+    total_raw_value: Rupiah = 0
+    total_finished_value: Rupiah = 0
+    recent_transactions: List[TransactionRecord] = field(default_factory=list)
+    
+    @property
+    def total_raw_quantity(self) -> int:
+        return sum(quantity for _, quantity in self.raw_materials)
+    
+    @property
+    def total_finished_quantity(self) -> int:
+        return sum(quantity for _, quantity in self.finished_goods)
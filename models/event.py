@@ -0,0 +1,9 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+@dataclass
+class Event:
+    id: int
+    topic: str  # transaction, stock, balance, alert, product, pricing
+    payload: dict = field(default_factory=dict)
+    created_at: Optional[str] = None
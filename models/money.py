@@ -0,0 +1,46 @@
+"""
+Whole Rupiah amounts.
+
+Money is stored and computed as int rupiah. Percentages (discounts,
+channel rates) stay as given and are applied with Decimal arithmetic
+rounded half up, so results are exact and the same on every platform.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+Rupiah = int  # whole rupiah
+
+_ONE = Decimal(1)
+
+def rupiah(value) -> Rupiah:
+    """Whole rupiah from an int, float, Decimal or numeric string, rounded half up; None is 0"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value
+    try:
+        return int(Decimal(str(value)).quantize(_ONE, ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}")
+
+def percent_of(amount: Rupiah, percent) -> Rupiah:
+    """percent % of amount, rounded half up"""
+    if not percent:
+        return 0
+    return int((Decimal(amount) * Decimal(str(percent)) / 100).quantize(_ONE, ROUND_HALF_UP))
+
+def discounted(amount: Rupiah, percent) -> Rupiah:
+    """amount less percent %"""
+    return amount - percent_of(amount, percent)
+
+def prorate(amount: Rupiah, part, whole) -> Rupiah:
+    """amount * part / whole for a positive whole, rounded half up, in integer arithmetic"""
+    product = amount * part
+    rounded = (2 * abs(product) + whole) // (2 * whole)
+    return rounded if product >= 0 else -rounded
+
+def rupiah_array(values):
+    """Vectorized rupiah(): numpy int64 array, half up, missing values as 0"""
+    import numpy as np
+    
+    values = np.asarray(values, dtype='float64')
+    return np.where(np.isnan(values), 0, np.floor(np.abs(values) + 0.5) * np.sign(values)).astype('int64')
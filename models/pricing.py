@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional, List, Tuple
+from models.money import Rupiah
+
+@dataclass
+class PricingRule:
+    rule_type: str  # pack, tier, channel, bonus
+    product_name: Optional[str] = None  # None = all products
+    size: Optional[str] = None  # None = all sizes
+    channel: Optional[str] = None  # Cash, Transfer, Shopee, Tokopedia
+    min_quantity: int = 1
+    price: Optional[Rupiah] = None  # bundle price (pack) or unit price (tier, channel)
+    discount_percent: float = 0
+    bonus_product: Optional[str] = None
+    bonus_size: Optional[str] = None
+    bonus_quantity: int = 0
+    notes: str = ""
+    id: Optional[int] = None
+
+class PricingRuleRecord(NamedTuple):
+    """Stored pricing rule as listed for display"""
+    id: int
+    rule_type: str
+    product_name: Optional[str]
+    size: Optional[str]
+    channel: Optional[str]
+    min_quantity: int
+    price: Optional[Rupiah]
+    discount_percent: float
+    bonus_product: Optional[str]
+    bonus_size: Optional[str]
+    bonus_quantity: int
+    active: int
+    notes: Optional[str]
+
+@dataclass
+class QuoteLine:
+    product: str
+    size: str
+    quantity: int
+    unit_price: Rupiah
+    gross: Rupiah  # unit_price * quantity, before cart rules
+    amount: Rupiah = 0  # share of quote total
+
+@dataclass
+class Quote:
+    channel: str
+    lines: List[QuoteLine]
+    subtotal: Rupiah
+    adjustments: List[Tuple[str, Rupiah]] = field(default_factory=list)  # (label, negative amount)
+    bonus_items: List[QuoteLine] = field(default_factory=list)
+    total: Rupiah = 0
+
+    @property
+    def total_quantity(self) -> int:
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def unpriced_lines(self) -> List[QuoteLine]:
+        """Lines whose SKU has no price in catalog or rules"""
+        return [line for line in self.lines if not line.unit_price]
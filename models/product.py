@@ -1,18 +1,19 @@
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import NamedTuple, Optional, List
+from models.money import Rupiah, discounted
 
 @dataclass
 class Product:
     name: str
     size: str  # S, M, L, XL, XXL
-    selling_price: float
-    cost_per_piece: float
+    selling_price: Rupiah
+    cost_per_piece: Rupiah
     pieces_per_pack: int
     id: Optional[int] = None
     
-    def calculate_profit(self, quantity: int, discount: float = 0) -> float:
-        """Calculate profit for given quantity with optional discount"""
-        total_revenue = (self.selling_price * quantity) * (1 - discount)
+    def calculate_profit(self, quantity: int, discount: float = 0) -> Rupiah:
+        """Calculate profit for given quantity with optional discount (a fraction, 0.1 = 10%)"""
+        total_revenue = discounted(self.selling_price * quantity, discount * 100)
         total_cost = self.cost_per_piece * quantity
         return total_revenue - total_cost
 
@@ -20,7 +21,7 @@ class Product:
 class RawMaterial:
     name: str
     unit: str  # roll, kg, pack, pcs
-    cost_per_unit: float
+    cost_per_unit: Rupiah
     id: Optional[int] = None
 
 @dataclass
@@ -28,6 +29,36 @@ class ProductionBatch:
     product_id: int
     quantity_produced: int
     materials_used: List[dict]  # [{material_id: 1, quantity: 2}, ...]
-    labor_cost: float
+    labor_cost: Rupiah
     notes: str = ""
     id: Optional[int] = None
+
+class ProductOffer(NamedTuple):
+    """Product on sale with its stock, from the catalog"""
+    name: str
+    size: str
+    selling_price: Rupiah
+    stock: int
+
+class MaterialPrice(NamedTuple):
+    id: int
+    name: str
+    unit: str
+    cost_per_unit: Rupiah
+
+class ProductionRecord(NamedTuple):
+    product_name: str
+    size: str
+    quantity_produced: int
+    labor_cost: Rupiah
+    materials_cost: Rupiah
+    total_cost: Rupiah
+    notes: Optional[str]
+    created_at: str
+
+class ProductionTotal(NamedTuple):
+    """Production summed per product and size"""
+    product_name: str
+    size: str
+    quantity: int
+    total_cost: Rupiah
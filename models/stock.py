@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import NamedTuple, Optional
 from datetime import datetime
+from config.database import DEFAULT_LOCATION
 
 @dataclass
 class StockItem:
@@ -10,3 +11,98 @@ class StockItem:
     size: Optional[str] = None
     id: Optional[int] = None
     last_updated: Optional[datetime] = None
+    location: str = DEFAULT_LOCATION
+
+class StockLevel(NamedTuple):
+    """Quantity per SKU, summed across locations unless one was asked for"""
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+    last_updated: Optional[str]
+
+class StockRecord(NamedTuple):
+    """One stock row, per SKU and location"""
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+    last_updated: Optional[str]
+    location: str
+
+class LowStockItem(NamedTuple):
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+    location: str
+
+class StockAlert(NamedTuple):
+    id: int
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+    threshold: int
+    created_at: str
+    location: str
+
+class StockMovement(NamedTuple):
+    """Stock ledger row"""
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    location: str
+    quantity_change: int
+    quantity_after: int
+    reason: str
+    transaction_id: Optional[int]
+    created_at: str
+
+class StockQuantity(NamedTuple):
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+
+class LocationStockQuantity(NamedTuple):
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    location: str
+    quantity: int
+
+class StockStatus(NamedTuple):
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    quantity: int
+    stock_level: str  # LOW, MEDIUM, HIGH
+
+class LocationStockStatus(NamedTuple):
+    item_type: str
+    item_name: str
+    size: Optional[str]
+    location: str
+    quantity: int
+    stock_level: str  # LOW, MEDIUM, HIGH
+
+class MaterialTotal(NamedTuple):
+    item_name: str
+    quantity: int
+
+class SizeTotal(NamedTuple):
+    size: str
+    quantity: int
+
+class Location(NamedTuple):
+    code: str
+    name: str
+
+class LocationSummary(NamedTuple):
+    """Item count and quantity per location and item type"""
+    code: str
+    name: str
+    item_type: Optional[str]
+    item_count: int
+    quantity: int
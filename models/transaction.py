@@ -1,14 +1,46 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import NamedTuple, Optional
 from datetime import datetime
+from models.money import Rupiah
 
 @dataclass
 class Transaction:
     type: str  # sale, purchase, expense, withdrawal, se_income
     category: str
-    amount: float
+    amount: Rupiah
     quantity: Optional[int] = None
     size: Optional[str] = None
     notes: Optional[str] = None
     id: Optional[int] = None
     created_at: Optional[datetime] = None
+
+class TransactionRecord(NamedTuple):
+    """Transaction row as listed by reports and the dashboard"""
+    type: str
+    category: str
+    amount: Rupiah
+    quantity: Optional[int]
+    size: Optional[str]
+    notes: Optional[str]
+    created_at: str
+
+class AdjustmentRecord(NamedTuple):
+    """Stock adjustment logged in transactions"""
+    type: str
+    category: str
+    quantity: Optional[int]
+    notes: Optional[str]
+    created_at: str
+
+class SalesDay(NamedTuple):
+    sale_date: str  # YYYY-MM-DD
+    transaction_count: int
+    total_sales: Rupiah
+    total_quantity: Optional[int]
+
+class FinancialSummary(NamedTuple):
+    current_balance: Rupiah
+    total_income: Rupiah
+    total_expenses: Rupiah
+    income_transactions: int
+    expense_transactions: int
@@ -3,19 +3,22 @@
 Reset database dengan schema yang updated
 """
 import os
-from config.database import init_database
+from config.database import fresh_database
 
 def main():
     print("🔄 Resetting database dengan constraint yang diperbaiki...")
     
-    # Hapus file database lama jika ada
+    # Hapus file database lama jika ada, setelah dibackup dulu
     db_path = "data/vpants.db"
     if os.path.exists(db_path):
+        from services.backup_service import BackupService
+        backup = BackupService().create_backup()
+        print(f"💾 Backup database lama: {backup.path}")
         os.remove(db_path)
         print("✅ Database lama dihapus")
     
-    # Inisialisasi database baru
-    init_database()
+    # Inisialisasi database baru dari template
+    fresh_database(db_path)
     print("✅ Database baru dibuat dengan constraint yang diperbaiki")
     print("🎯 Transaction types yang didukung: sale, purchase, expense, withdrawal, se_income, stock_adjustment, initial_balance")
 
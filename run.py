@@ -7,10 +7,10 @@ import sys
 import os
 
 def main():
-    # Initialize database first
-    from config.database import init_database
-    init_database()
-    print("✅ Database initialized successfully!")
+    # Create the database on first run, migrate an existing one without touching its data
+    from config.database import ensure_database
+    ensure_database()
+    print("✅ Database ready!")
     
     # Run Streamlit app
     print("🚀 Starting VPants Streamlit App...")
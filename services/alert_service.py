@@ -0,0 +1,74 @@
+"""
+Low stock alerts for VPants
+"""
+from config.database import get_connection
+from models.stock import StockAlert
+from services.write_queue import run_write
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
+
+@instrumented
+class AlertService:
+    """Read and acknowledge low stock alerts.
+    
+    Alerts are queued by triggers on the stock table when a quantity drops to
+    or below its low_stock_threshold, so reading them never scans inventory.
+    """
+    
+    def __init__(self):
+        self.conn = get_connection()
+    
+    def get_pending_alerts(self):
+        """Alerts not yet acknowledged or resolved by restocking, oldest first"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, item_type, item_name, size, quantity, threshold, created_at, location
+            FROM stock_alerts
+            WHERE acknowledged_at IS NULL AND resolved_at IS NULL
+            ORDER BY id
+        ''')
+        return rows_to_models(cursor, StockAlert)
+    
+    def count_pending(self):
+        """Number of pending alerts"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) FROM stock_alerts
+            WHERE acknowledged_at IS NULL AND resolved_at IS NULL
+        ''')
+        return cursor.fetchone()[0]
+    
+    def acknowledge(self, alert_ids=None):
+        """Acknowledge the given alerts, or every pending alert when none are given"""
+        return run_write(self.conn, self._acknowledge, alert_ids)
+    
+    def _acknowledge(self, cursor, alert_ids):
+        if alert_ids is None:
+            cursor.execute('''
+                UPDATE stock_alerts SET acknowledged_at = CURRENT_TIMESTAMP
+                WHERE acknowledged_at IS NULL AND resolved_at IS NULL
+            ''')
+        else:
+            cursor.executemany('''
+                UPDATE stock_alerts SET acknowledged_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND acknowledged_at IS NULL
+            ''', [(alert_id,) for alert_id in alert_ids])
+        return cursor.rowcount
+    
+    def set_threshold(self, item_type: str, item_name: str, size: str, threshold: int, location: str = None):
+        """Set low stock threshold for a SKU at one or (by default) every location.
+        
+        Crossing the threshold through this change also queues an alert.
+        """
+        if threshold < 0:
+            raise ValueError("Threshold cannot be negative")
+        return run_write(self.conn, self._set_threshold, item_type, item_name, size, threshold, location)
+    
+    def _set_threshold(self, cursor, item_type, item_name, size, threshold, location):
+        cursor.execute('''
+            UPDATE stock SET low_stock_threshold = ?
+            WHERE item_type = ? AND item_name = ? AND size IS ? AND (? IS NULL OR location = ?)
+        ''', (threshold, item_type, item_name, size, location, location))
+        if cursor.rowcount == 0:
+            raise ValueError(f"Stock item not found: {item_name} {size or ''}")
+        return True
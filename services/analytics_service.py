@@ -0,0 +1,128 @@
+"""
+Margin and COGS analytics for VPants
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from config.database import get_read_connection, read_transaction, transactions_view
+from services.report_service import _as_date
+from utils.helpers import rows_to_frame
+from utils.metrics import instrumented
+
+DIMENSIONS = ('product_name', 'size', 'payment_method', 'location', 'period')
+
+# pandas period frequency per report granularity
+PERIOD_FREQUENCIES = {
+    'day': 'D',
+    'week': 'W-SUN',
+    'month': 'M',
+}
+
+@instrumented
+class AnalyticsService:
+    """Revenue, COGS, gross margin and discount leakage per product, size, channel, location and period.
+    
+    Sales are pulled once per date range as a daily rollup (one row per day,
+    SKU, channel and location) and cached; every breakdown is a pandas groupby over that
+    frame. The cache entry is reused until a new transaction is recorded.
+    """
+    
+    CACHE_SIZE = 16
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
+    def __init__(self):
+        self.conn = get_read_connection()
+    
+    def get_sales_frame(self, start, end):
+        """Daily sales rollup with revenue, gross (before discounts) and COGS for start..end.
+        
+        The frame is shared through the cache, copy it before modifying.
+        """
+        start, end = _as_date(start), _as_date(end)
+        
+        with read_transaction(self.conn) as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+            version = cursor.fetchone()[0]
+            
+            key = (start, end)
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached and cached[0] == version:
+                    self._cache.move_to_end(key)
+                    return cached[1]
+            
+            # Rows recorded before cost_amount existed fall back to current product cost
+            range_end = (end + timedelta(days=1)).isoformat()
+            cursor.execute(f'''
+                SELECT
+                    DATE(t.created_at) as sale_date,
+                    t.product_name,
+                    t.size,
+                    t.payment_method,
+                    t.location,
+                    SUM(t.quantity) as quantity,
+                    SUM(COALESCE(t.gross_amount, t.amount)) as gross,
+                    SUM(t.amount) as revenue,
+                    SUM(COALESCE(t.cost_amount, t.quantity * p.cost_per_piece, 0)) as cogs
+                FROM {transactions_view(self.conn, start, range_end)} t
+                LEFT JOIN products p ON p.name = t.product_name AND p.size = t.size
+                WHERE t.type = 'sale'
+                AND t.created_at >= ? AND t.created_at < ?
+                GROUP BY sale_date, t.product_name, t.size, t.payment_method, t.location
+            ''', (start.isoformat(), range_end))
+            
+            frame = rows_to_frame(cursor, {
+                'sale_date': 'datetime',
+                'product_name': 'category',
+                'size': 'category',
+                'payment_method': 'category',
+                'location': 'category',
+                'quantity': 'int64',
+                'gross': 'rupiah',
+                'revenue': 'rupiah',
+                'cogs': 'rupiah'
+            })
+        
+        with self._cache_lock:
+            self._cache[key] = (version, frame)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return frame
+    
+    def get_margin_report(self, start, end, by=('product_name',), granularity: str = 'month'):
+        """Revenue, COGS, gross margin and discount leakage grouped by `by` dimensions.
+        
+        `by` takes any of product_name, size, payment_method, location and period;
+        period buckets follow `granularity` (day, week, month).
+        """
+        import numpy as np
+        
+        keys = [by] if isinstance(by, str) else list(by)
+        unknown = [key for key in keys if key not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions {unknown}, use {list(DIMENSIONS)}")
+        if granularity not in PERIOD_FREQUENCIES:
+            raise ValueError(f"Granularity must be one of {list(PERIOD_FREQUENCIES)}")
+        
+        frame = self.get_sales_frame(start, end)
+        if 'period' in keys:
+            frame = frame.assign(period=frame['sale_date'].dt.to_period(PERIOD_FREQUENCIES[granularity]).dt.start_time)
+        
+        report = frame.groupby(keys, dropna=False, observed=True)[['quantity', 'gross', 'revenue', 'cogs']].sum()
+        
+        revenue = report['revenue'].to_numpy()
+        gross = report['gross'].to_numpy()
+        report['gross_margin'] = revenue - report['cogs'].to_numpy()
+        report['discount_leakage'] = gross - revenue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            report['margin_pct'] = np.where(revenue != 0, report['gross_margin'].to_numpy() / revenue * 100, np.nan)
+            report['leakage_pct'] = np.where(gross != 0, report['discount_leakage'].to_numpy() / gross * 100, np.nan)
+        
+        return report.reset_index().sort_values('gross_margin', ascending=False, ignore_index=True)
+    
+    @classmethod
+    def clear_cache(cls):
+        """Drop cached sales frames"""
+        with cls._cache_lock:
+            cls._cache.clear()
@@ -0,0 +1,131 @@
+"""
+Transaction archiving for VPants
+"""
+import sqlite3
+from datetime import datetime
+from config.database import archive_path, get_connection
+from models.archive import TransactionArchive
+from services.dashboard_service import EXPENSE_TYPES, INCOME_TYPES
+from services.write_queue import run_write
+from utils.metrics import instrumented
+
+@instrumented
+class ArchiveService:
+    """Moves closed fiscal years of transactions into yearly archive databases.
+    
+    Rows are first copied into data/archive_YYYY.db (idempotent, by id), then
+    deleted from the live table in one write that also records the year in
+    transaction_archives. A crash between the two steps leaves the rows in
+    both places, and running the year again finishes the job. Reports read
+    archived years through config.database.transactions_view().
+    """
+    
+    def __init__(self):
+        self.conn = get_connection()
+    
+    def get_archives(self):
+        """Archived years, oldest first"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT year, file, row_count, income_count, expense_count, last_id, archived_at
+            FROM transaction_archives
+            ORDER BY year
+        ''')
+        return [TransactionArchive(*row) for row in cursor.fetchall()]
+    
+    def get_archivable_years(self):
+        """Closed fiscal years that still have transactions in the live table"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT DISTINCT CAST(strftime('%Y', created_at) AS INTEGER) as year
+            FROM transactions
+            WHERE created_at < ?
+            ORDER BY year
+        ''', (f"{datetime.now().year}-01-01",))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def archive_year(self, year: int, vacuum: bool = False) -> TransactionArchive:
+        """Move every transaction of a closed fiscal year into its archive file.
+        
+        With vacuum the live database is rebuilt afterwards so the file
+        actually shrinks; that holds an exclusive lock while it runs.
+        """
+        if year >= datetime.now().year:
+            raise ValueError(f"Fiscal year {year} is not closed yet")
+        start, end = f"{year}-01-01", f"{year + 1}-01-01"
+        
+        last_id = self._copy_year(year, start, end)
+        archive = run_write(self.conn, self._drop_archived, year, start, end, last_id)
+        
+        if vacuum:
+            self.conn.execute('VACUUM')
+        return archive
+    
+    def _copy_year(self, year, start, end):
+        """Copy the year's rows into the archive file, returns the highest id copied"""
+        from config.database import DB_PATH
+        
+        archive = sqlite3.connect(archive_path(year))
+        try:
+            cursor = archive.cursor()
+            cursor.execute('ATTACH DATABASE ? AS live', (str(DB_PATH),))
+            
+            # Same table and indexes as the live database, so the union view lines up
+            cursor.execute('''
+                SELECT type, sql FROM live.sqlite_master
+                WHERE tbl_name = 'transactions' AND type IN ('table', 'index') AND sql IS NOT NULL
+                ORDER BY type DESC
+            ''')
+            for kind, sql in cursor.fetchall():
+                cursor.execute(sql.replace(f'CREATE {kind.upper()} ', f'CREATE {kind.upper()} IF NOT EXISTS ', 1))
+            
+            # Both statements read the same snapshot of the live database
+            cursor.execute('BEGIN')
+            cursor.execute('''
+                SELECT COALESCE(MAX(id), 0) FROM live.transactions
+                WHERE created_at >= ? AND created_at < ?
+            ''', (start, end))
+            last_id = cursor.fetchone()[0]
+            cursor.execute('''
+                INSERT OR IGNORE INTO main.transactions
+                SELECT * FROM live.transactions
+                WHERE created_at >= ? AND created_at < ? AND id <= ?
+            ''', (start, end, last_id))
+            archive.commit()
+            cursor.execute('DETACH DATABASE live')
+        finally:
+            archive.close()
+        return last_id
+    
+    def _drop_archived(self, cursor, year, start, end, last_id):
+        cursor.execute('''
+            DELETE FROM transactions
+            WHERE created_at >= ? AND created_at < ? AND id <= ?
+        ''', (start, end, last_id))
+        
+        archive = sqlite3.connect(f"{archive_path(year).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            row_count, income_count, expense_count, archived_last_id = archive.execute(f'''
+                SELECT COUNT(*), COALESCE(SUM(type IN {INCOME_TYPES}), 0),
+                       COALESCE(SUM(type IN {EXPENSE_TYPES}), 0), COALESCE(MAX(id), 0)
+                FROM transactions
+            ''').fetchone()
+        finally:
+            archive.close()
+        
+        cursor.execute('''
+            INSERT INTO transaction_archives (year, file, row_count, income_count, expense_count, last_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(year) DO UPDATE SET
+                row_count = excluded.row_count,
+                income_count = excluded.income_count,
+                expense_count = excluded.expense_count,
+                last_id = excluded.last_id,
+                archived_at = CURRENT_TIMESTAMP
+        ''', (year, archive_path(year).name, row_count, income_count, expense_count, archived_last_id))
+        
+        cursor.execute('''
+            SELECT year, file, row_count, income_count, expense_count, last_id, archived_at
+            FROM transaction_archives WHERE year = ?
+        ''', (year,))
+        return TransactionArchive(*cursor.fetchone())
@@ -0,0 +1,231 @@
+"""
+Online backups for VPants
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from config.database import archive_path, backup_dir, get_connection, get_read_connection
+from models.backup import Backup
+from utils.metrics import instrumented
+
+# Pages copied per step, and the pause between steps that lets checkouts run
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_SLEEP = 0.01
+
+# Hours between scheduled backups, 0 turns the scheduler off
+BACKUP_INTERVAL_HOURS = float(os.environ.get("VPANTS_BACKUP_INTERVAL_HOURS", "6"))
+
+# Rotation: newest backup of each of the last N days, ISO weeks and months
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 6
+
+BACKUP_PREFIX = "vpants-"
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+def _backup(path: Path) -> Backup:
+    created_at = datetime.strptime(path.stem[len(BACKUP_PREFIX):], STAMP_FORMAT)
+    return Backup(str(path), created_at.strftime('%Y-%m-%d %H:%M:%S'), path.stat().st_size)
+
+def verify_backup(path) -> None:
+    """Raise sqlite3.DatabaseError unless PRAGMA integrity_check passes on the file"""
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    finally:
+        conn.close()
+    if result != ['ok']:
+        raise sqlite3.DatabaseError(f"Backup {path} failed integrity check: {'; '.join(result[:5])}")
+
+def copy_database(source, target_path: Path, pages: int = BACKUP_STEP_PAGES, sleep: float = BACKUP_STEP_SLEEP):
+    """Copy a database into a new self-contained file with the backup API, then verify it.
+    
+    The source read transaction stays open for every step, so the copy is
+    one consistent snapshot; without it any commit from another connection
+    would restart the copy from the first page. Under WAL the open read
+    does not block writers.
+    """
+    partial = target_path.with_name(target_path.name + '.partial')
+    partial.unlink(missing_ok=True)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute('BEGIN')
+        try:
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages, sleep=sleep)
+        finally:
+            source.execute('COMMIT')
+        target.execute('PRAGMA journal_mode=DELETE')
+        target.close()
+        verify_backup(partial)
+        partial.replace(target_path)
+    except BaseException:
+        target.close()
+        partial.unlink(missing_ok=True)
+        raise
+
+@instrumented
+class BackupService:
+    """Online backups of the live database into data/backups.
+    
+    Backups copy pages in small steps from a read snapshot, so sales keep
+    committing while one runs. Every copy passes PRAGMA integrity_check
+    before it gets its final name. Archive files are copied alongside when
+    they are new or changed.
+    """
+    
+    def create_backup(self, pages: int = BACKUP_STEP_PAGES, sleep: float = BACKUP_STEP_SLEEP) -> Backup:
+        """Back up the live database (and changed archives) now"""
+        directory = backup_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now()
+        path = directory / f"{BACKUP_PREFIX}{stamp.strftime(STAMP_FORMAT)}.db"
+        # Never overwrite a backup from the same second, restore_backup may be reading it
+        while path.exists():
+            stamp += timedelta(seconds=1)
+            path = directory / f"{BACKUP_PREFIX}{stamp.strftime(STAMP_FORMAT)}.db"
+        
+        source = get_read_connection()
+        try:
+            copy_database(source, path, pages, sleep)
+            archives = [row[0] for row in source.execute('SELECT year FROM transaction_archives')]
+        except sqlite3.OperationalError as e:
+            if 'transaction_archives' not in str(e):
+                raise
+            archives = []
+        finally:
+            source.close()
+        
+        for year in archives:
+            self._copy_archive(archive_path(year), directory)
+        return _backup(path)
+    
+    def _copy_archive(self, archive: Path, directory: Path):
+        target = directory / archive.name
+        if target.exists() and target.stat().st_mtime >= archive.stat().st_mtime:
+            return
+        source = sqlite3.connect(f"{archive.resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+        try:
+            copy_database(source, target)
+        finally:
+            source.close()
+    
+    def get_backups(self):
+        """Backups of the live database, newest first"""
+        directory = backup_dir()
+        if not directory.exists():
+            return []
+        return sorted((_backup(path) for path in directory.glob(f"{BACKUP_PREFIX}*.db")),
+                      key=lambda backup: backup.created_at, reverse=True)
+    
+    def rotate(self, keep_daily: int = KEEP_DAILY, keep_weekly: int = KEEP_WEEKLY, keep_monthly: int = KEEP_MONTHLY):
+        """Delete backups outside the daily/weekly/monthly retention, returns the deleted paths"""
+        backups = self.get_backups()
+        keep = {backups[0].path} if backups else set()
+        for limit, bucket in ((keep_daily, lambda d: d.date()),
+                              (keep_weekly, lambda d: d.isocalendar()[:2]),
+                              (keep_monthly, lambda d: (d.year, d.month))):
+            seen = []
+            for backup in backups:
+                key = bucket(datetime.fromisoformat(backup.created_at))
+                if key not in seen:
+                    seen.append(key)
+                    if len(seen) > limit:
+                        break
+                    keep.add(backup.path)
+        
+        deleted = [backup.path for backup in backups if backup.path not in keep]
+        for path in deleted:
+            Path(path).unlink(missing_ok=True)
+        return deleted
+    
+    def run_scheduled(self, interval_hours: float = BACKUP_INTERVAL_HOURS):
+        """Back up and rotate when the newest backup is older than the interval, else None.
+        
+        The age check makes the job safe to schedule from several processes.
+        """
+        backups = self.get_backups()
+        if backups:
+            age = datetime.now() - datetime.fromisoformat(backups[0].created_at)
+            if age.total_seconds() < interval_hours * 3600:
+                return None
+        backup = self.create_backup()
+        self.rotate()
+        return backup
+    
+    def restore_backup(self, path) -> Backup:
+        """Replace the live database with a verified backup, returns the backup taken just before"""
+        verify_backup(path)
+        safety = self.create_backup()
+        
+        source = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        target = get_connection()
+        try:
+            source.backup(target)
+            target.execute('PRAGMA journal_mode=WAL')
+        finally:
+            source.close()
+            target.close()
+        
+        from services.catalog_service import catalog
+        from services.pricing_service import pricing
+        catalog.invalidate()
+        pricing.invalidate()
+        return safety
+
+class BackupScheduler:
+    """Background thread running BackupService.run_scheduled every check_interval seconds"""
+    
+    def __init__(self, interval_hours: float = BACKUP_INTERVAL_HOURS, check_interval: float = 60):
+        self.interval_hours = interval_hours
+        self.check_interval = check_interval
+        self._stopping = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="vpants-backup", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5):
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def _run(self):
+        service = BackupService()
+        while not self._stopping.is_set():
+            try:
+                backup = service.run_scheduled(self.interval_hours)
+                if backup:
+                    print(f"Backup written to {backup.path}")
+            except Exception as e:
+                print(f"Scheduled backup failed: {e}")
+            self._stopping.wait(self.check_interval)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_backup_scheduler(interval_hours: float = BACKUP_INTERVAL_HOURS):
+    """Run scheduled backups from a background thread once per process, None when turned off"""
+    global _scheduler
+    if interval_hours <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BackupScheduler(interval_hours)
+            _scheduler.start()
+        return _scheduler
+
+def stop_backup_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
@@ -0,0 +1,121 @@
+"""
+Product catalog cache for VPants
+"""
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from config.database import get_connection
+from models.money import Rupiah
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    name: str
+    size: str
+    selling_price: Rupiah
+    cost_per_piece: Rupiah
+    pieces_per_pack: int
+    stock: int
+
+    @property
+    def sku(self):
+        """SKU key used by the catalog: (product name, size)"""
+        return (self.name, self.size)
+
+class ProductCatalog:
+    """Process-wide product catalog with price, cost and finished stock per SKU.
+
+    Loaded lazily on first lookup and dropped by `invalidate()` whenever a
+    service writes products or stock, so sale screens only hit the database
+    once per change instead of once per render.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._generation = 0
+
+    def _load(self):
+        """Read products joined with finished stock"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.name, p.size, p.selling_price, p.cost_per_piece, p.pieces_per_pack,
+                       COALESCE(s.quantity, 0)
+                FROM products p
+                LEFT JOIN (
+                    SELECT item_name, size, SUM(quantity) AS quantity
+                    FROM stock
+                    WHERE item_type = 'finished'
+                    GROUP BY item_name, size
+                ) s ON s.item_name = p.name AND s.size = p.size
+                ORDER BY p.name, p.size
+            ''')
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        return {(row[0], row[1]): CatalogEntry(*row) for row in rows}
+
+    def _get_entries(self):
+        entries = self._entries
+        if entries is not None:
+            return entries
+
+        with self._lock:
+            if self._entries is None:
+                generation = self._generation
+                entries = self._load()
+                # A write that landed while loading makes this copy stale
+                if generation == self._generation:
+                    self._entries = entries
+                return entries
+            return self._entries
+
+    def invalidate(self):
+        """Drop cached catalog, next lookup reloads from database"""
+        with self._lock:
+            self._generation += 1
+            self._entries = None
+
+    def get(self, name: str, size: str) -> Optional[CatalogEntry]:
+        """Get catalog entry for SKU, None if unknown"""
+        return self._get_entries().get((name, size))
+
+    def get_price(self, name: str, size: str, default: Rupiah = 0) -> Rupiah:
+        """Get selling price for SKU"""
+        entry = self.get(name, size)
+        return entry.selling_price if entry else default
+
+    def get_entries(self):
+        """Get all catalog entries ordered by name and size"""
+        return list(self._get_entries().values())
+
+    def get_pack(self, product_name: str, pieces: int) -> Optional[CatalogEntry]:
+        """Packed SKU of `pieces` pieces for a loose product, None if the catalog has none.
+
+        Pack names share the product's leading words ("Celana Dalam VPants"
+        is packed as "Celana Dalam Pack 3pcs"), the longest shared prefix wins.
+        """
+        words = product_name.split()
+
+        def shared(entry):
+            count = 0
+            for word, pack_word in zip(words, entry.name.split()):
+                if word != pack_word:
+                    break
+                count += 1
+            return count
+
+        packs = [entry for entry in self._get_entries().values()
+                 if entry.size == 'PACKED' and entry.pieces_per_pack == pieces and shared(entry)]
+        return max(packs, key=shared, default=None)
+
+    def get_available(self):
+        """Get catalog entries that still have finished stock"""
+        return [entry for entry in self._get_entries().values() if entry.stock > 0]
+
+catalog = ProductCatalog()
+
+def get_catalog() -> ProductCatalog:
+    return catalog
@@ -0,0 +1,200 @@
+"""
+Change events from the transactional outbox for VPants
+"""
+import json
+import threading
+import time
+from config.database import get_connection, get_read_connection
+from models.event import Event
+from services.write_queue import add_commit_listener, remove_commit_listener, run_write
+from utils.metrics import instrumented
+
+# Days acknowledged events stay in the outbox, the dispatcher prunes older ones once a day
+EVENT_RETENTION_DAYS = 7
+PRUNE_INTERVAL_SECONDS = 24 * 60 * 60
+
+def _event(row) -> Event:
+    return Event(row[0], row[1], json.loads(row[2]), row[3])
+
+class EventBus:
+    """In-process publish/subscribe for change events"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []
+    
+    def subscribe(self, callback, topics=None):
+        """Call callback(event) for events on the given topics (all when None), returns an unsubscribe function"""
+        subscriber = (callback, frozenset(topics) if topics else None)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+        return unsubscribe
+    
+    def publish(self, event: Event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, topics in subscribers:
+            if topics is None or event.topic in topics:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Event subscriber failed on {event.topic} #{event.id}: {e}")
+
+class OutboxDispatcher:
+    """Background thread publishing new outbox rows on an EventBus.
+    
+    Writes committed by this process wake it immediately; writes from other
+    processes (API server, scripts) are picked up on the next poll. Delivered
+    events past EVENT_RETENTION_DAYS are pruned once a day.
+    """
+    
+    def __init__(self, bus: EventBus, poll_interval: float = 1.0, batch_size: int = 500):
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.last_id = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start publishing events committed from now on"""
+        if self._thread and self._thread.is_alive():
+            return
+        if self.last_id is None:
+            self.last_id = EventService().latest_id()
+        self._stopping.clear()
+        add_commit_listener(self._wake.set)
+        self._thread = threading.Thread(target=self._run, name="vpants-outbox", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5):
+        if not self._thread:
+            return
+        remove_commit_listener(self._wake.set)
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def _run(self):
+        service = EventService()
+        next_prune = time.monotonic()
+        while not self._stopping.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                events = service.get_events(self.last_id, self.batch_size)
+            except Exception as e:
+                print(f"Outbox dispatch failed: {e}")
+                continue
+            for event in events:
+                self.bus.publish(event)
+                self.last_id = event.id
+            if len(events) == self.batch_size:
+                self._wake.set()
+            elif time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+                try:
+                    service.prune()
+                except Exception as e:
+                    print(f"Outbox prune failed: {e}")
+
+@instrumented
+class EventService:
+    """Read the outbox and keep named consumer offsets.
+    
+    Every service write appends its change events to the outbox through
+    triggers in the same transaction, so a committed write always has its
+    events and a rolled back one never does.
+    """
+    
+    def __init__(self):
+        self.conn = get_connection()
+        self.read_conn = get_read_connection()
+    
+    def latest_id(self) -> int:
+        """Id of the newest event, 0 when there are none"""
+        cursor = self.read_conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM outbox')
+        return cursor.fetchone()[0]
+    
+    def get_events(self, after_id: int = 0, limit: int = 500, topics=None):
+        """Events after an id, oldest first"""
+        topics = list(topics or [])
+        topic_filter = f"AND topic IN ({', '.join('?' * len(topics))})" if topics else ""
+        cursor = self.read_conn.cursor()
+        cursor.execute(f'''
+            SELECT id, topic, payload, created_at FROM outbox
+            WHERE id > ? {topic_filter}
+            ORDER BY id LIMIT ?
+        ''', [after_id or 0, *topics, limit])
+        return [_event(row) for row in cursor.fetchall()]
+    
+    def get_offset(self, consumer: str) -> int:
+        """Last event id a consumer acknowledged, 0 for a new consumer"""
+        cursor = self.read_conn.cursor()
+        cursor.execute('SELECT last_id FROM outbox_offsets WHERE consumer = ?', (consumer,))
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    def read(self, consumer: str, limit: int = 500, topics=None):
+        """Events the consumer has not acknowledged yet"""
+        return self.get_events(self.get_offset(consumer), limit, topics)
+    
+    def ack(self, consumer: str, last_id: int):
+        """Store a consumer's offset, it never moves backwards; returns the stored offset"""
+        return run_write(self.conn, self._ack, consumer, last_id)
+    
+    def _ack(self, cursor, consumer, last_id):
+        cursor.execute('''
+            INSERT INTO outbox_offsets (consumer, last_id) VALUES (?, ?)
+            ON CONFLICT(consumer) DO UPDATE SET
+                last_id = MAX(last_id, excluded.last_id), updated_at = CURRENT_TIMESTAMP
+        ''', (consumer, last_id))
+        cursor.execute('SELECT last_id FROM outbox_offsets WHERE consumer = ?', (consumer,))
+        return cursor.fetchone()[0]
+    
+    def prune(self, keep_days: int = EVENT_RETENTION_DAYS):
+        """Delete events older than keep_days that every consumer has acknowledged"""
+        return run_write(self.conn, self._prune, keep_days)
+    
+    def _prune(self, cursor, keep_days):
+        cursor.execute('''
+            DELETE FROM outbox
+            WHERE created_at < DATETIME('now', ?)
+            AND id <= COALESCE((SELECT MIN(last_id) FROM outbox_offsets), id)
+        ''', (f'-{keep_days} days',))
+        return cursor.rowcount
+
+events = EventBus()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+_cache_subscriptions = []
+
+def start_dispatcher(poll_interval: float = 1.0) -> OutboxDispatcher:
+    """Publish outbox events on `events` and invalidate process caches on matching changes"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            from services.catalog_service import catalog
+            from services.pricing_service import pricing
+            _cache_subscriptions.append(events.subscribe(lambda event: catalog.invalidate(), ('stock', 'product')))
+            _cache_subscriptions.append(events.subscribe(lambda event: pricing.invalidate(), ('pricing',)))
+            _dispatcher = OutboxDispatcher(events, poll_interval)
+            _dispatcher.start()
+        return _dispatcher
+
+def stop_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.stop()
+            _dispatcher = None
+        while _cache_subscriptions:
+            _cache_subscriptions.pop()()
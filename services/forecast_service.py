@@ -0,0 +1,135 @@
+"""
+Demand forecast and reorder points for VPants
+"""
+from datetime import date, timedelta
+from config.database import get_connection
+from services.write_queue import run_write
+from utils.helpers import rows_to_frame
+from utils.metrics import instrumented
+
+@instrumented
+class ForecastService:
+    """Exponentially smoothed daily demand per SKU with days of cover and reorder points.
+    
+    Demand comes from sales (finished goods) and material usage/negative
+    material adjustments (materials). Smoothed mean and variance are kept in
+    the demand_forecast table; `refresh()` only folds in the complete days
+    since the last run, one numpy step per day across all SKUs at once.
+    """
+    
+    def __init__(self, alpha: float = 0.1, lookback_days: int = 90):
+        self.conn = get_connection()
+        self.alpha = alpha
+        self.lookback_days = lookback_days
+    
+    def refresh(self):
+        """Fold complete days since last refresh into the smoothed demand"""
+        import numpy as np
+        import pandas as pd
+        
+        cursor = self.conn.cursor()
+        end = date.today() - timedelta(days=1)
+        
+        cursor.execute('SELECT MAX(last_day) FROM demand_forecast')
+        last_day = cursor.fetchone()[0]
+        last_day = date.fromisoformat(last_day) if last_day else end - timedelta(days=self.lookback_days)
+        if last_day >= end:
+            return 0
+        
+        days = pd.date_range(last_day + timedelta(days=1), end, freq='D')
+        range_params = (days[0].date().isoformat(), (end + timedelta(days=1)).isoformat())
+        
+        cursor.execute('''
+            SELECT item_type, item_name, size, daily_demand, demand_variance
+            FROM demand_forecast
+        ''')
+        state = rows_to_frame(cursor).set_index(['item_type', 'item_name', 'size'])
+        
+        cursor.execute('''
+            SELECT 'finished' as item_type, product_name as item_name, COALESCE(size, '') as size,
+                   DATE(created_at) as day, SUM(quantity) as demand
+            FROM transactions
+            WHERE type = 'sale' AND product_name IS NOT NULL
+            AND created_at >= ? AND created_at < ?
+            GROUP BY product_name, size, day
+            UNION ALL
+            SELECT 'material', product_name, COALESCE(size, ''),
+                   DATE(created_at), -SUM(quantity)
+            FROM transactions
+            WHERE type = 'stock_adjustment' AND category IN ('material_usage', 'stock_material')
+            AND quantity < 0 AND product_name IS NOT NULL
+            AND created_at >= ? AND created_at < ?
+            GROUP BY product_name, size, DATE(created_at)
+        ''', range_params + range_params)
+        demand = rows_to_frame(cursor, {'day': 'datetime', 'demand': 'float64'})
+        
+        # SKU x day matrix, missing days are zero demand
+        matrix = demand.pivot_table(index=['item_type', 'item_name', 'size'], columns='day',
+                                    values='demand', aggfunc='sum', fill_value=0)
+        matrix = matrix.reindex(index=state.index.union(matrix.index), columns=days, fill_value=0)
+        state = state.reindex(matrix.index, fill_value=0)
+        
+        mean = state['daily_demand'].to_numpy(dtype='float64')
+        variance = state['demand_variance'].to_numpy(dtype='float64')
+        for day_demand in matrix.to_numpy(dtype='float64').T:
+            diff = day_demand - mean
+            increment = self.alpha * diff
+            mean = mean + increment
+            variance = (1 - self.alpha) * (variance + diff * increment)
+        
+        rows = [(item_type, item_name, size, float(m), float(v), end.isoformat())
+                for (item_type, item_name, size), m, v in zip(matrix.index, mean, variance)]
+        run_write(self.conn, self._save_state, rows)
+        return len(days)
+    
+    def _save_state(self, cursor, rows):
+        cursor.executemany('''
+            INSERT INTO demand_forecast (item_type, item_name, size, daily_demand, demand_variance, last_day)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(item_type, item_name, size) DO UPDATE SET
+                daily_demand = excluded.daily_demand,
+                demand_variance = excluded.demand_variance,
+                last_day = excluded.last_day
+        ''', rows)
+    
+    def get_forecast(self, lead_time_days: int = 7, target_cover_days: int = 30, service_z: float = 1.65):
+        """Per-SKU demand, days of cover, reorder point and suggested quantity.
+        
+        reorder_point = demand over lead time + safety stock (z * std * sqrt(lead time)),
+        suggested_quantity tops stock up to reorder point + target_cover_days of demand.
+        """
+        import numpy as np
+        
+        self.refresh()
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT s.item_type, s.item_name, COALESCE(s.size, '') as size, SUM(s.quantity) as stock,
+                   COALESCE(f.daily_demand, 0) as daily_demand,
+                   COALESCE(f.demand_variance, 0) as demand_variance
+            FROM stock s
+            LEFT JOIN demand_forecast f
+                ON f.item_type = s.item_type AND f.item_name = s.item_name AND f.size = COALESCE(s.size, '')
+            GROUP BY s.item_type, s.item_name, COALESCE(s.size, '')
+            ORDER BY s.item_type, s.item_name, size
+        ''')
+        forecast = rows_to_frame(cursor, {'stock': 'int64', 'daily_demand': 'float64', 'demand_variance': 'float64'})
+        
+        demand = forecast['daily_demand'].to_numpy()
+        stock = forecast['stock'].to_numpy()
+        safety_stock = service_z * np.sqrt(forecast['demand_variance'].to_numpy().clip(min=0) * lead_time_days)
+        reorder_point = np.ceil(demand * lead_time_days + safety_stock)
+        
+        with np.errstate(divide='ignore'):
+            forecast['days_of_cover'] = np.where(demand > 0, stock / demand, np.inf)
+        forecast['safety_stock'] = np.ceil(safety_stock).astype('int64')
+        forecast['reorder_point'] = reorder_point.astype('int64')
+        forecast['suggested_quantity'] = np.maximum(
+            np.ceil(reorder_point + demand * target_cover_days - stock), 0).astype('int64')
+        forecast['needs_reorder'] = stock <= reorder_point
+        return forecast
+    
+    def get_reorder_alerts(self, lead_time_days: int = 7, target_cover_days: int = 30):
+        """SKUs at or below their reorder point, lowest cover first"""
+        forecast = self.get_forecast(lead_time_days, target_cover_days)
+        return forecast[forecast['needs_reorder']].sort_values('days_of_cover', ignore_index=True)
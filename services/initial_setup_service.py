@@ -1,40 +1,39 @@
 import sqlite3
 from config.database import get_connection
+from services.catalog_service import catalog
+from services.write_queue import run_write
+from models.money import rupiah
 from models.transaction import Transaction
+from utils.metrics import instrumented
 
+@instrumented
 class InitialSetupService:
     def __init__(self):
         self.conn = get_connection()
     
     def setup_initial_balance(self, initial_balance):
         """Set initial balance for the business"""
-        cursor = self.conn.cursor()
+        return run_write(self.conn, self._setup_initial_balance, initial_balance)
+    
+    def _setup_initial_balance(self, cursor, initial_balance):
+        initial_balance = rupiah(initial_balance)
+        # Reset finance table
+        cursor.execute('DELETE FROM finance')
+        cursor.execute('''
+            INSERT INTO finance (current_balance, total_income, total_expenses)
+            VALUES (?, 0, 0)
+        ''', (initial_balance,))
         
-        try:
-            # Reset finance table
-            cursor.execute('DELETE FROM finance')
-            cursor.execute('''
-                INSERT INTO finance (current_balance, total_income, total_expenses)
-                VALUES (?, 0, 0)
-            ''', (initial_balance,))
-            
-            # Log initial balance transaction dengan type yang benar
-            cursor.execute('''
-                INSERT INTO transactions (type, category, amount, notes)
-                VALUES (?, ?, ?, ?)
-            ''', ('initial_balance', 'setup', initial_balance, 'Initial capital setup'))
-            
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        # Log initial balance transaction dengan type yang benar
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, notes)
+            VALUES (?, ?, ?, ?)
+        ''', ('initial_balance', 'setup', initial_balance, 'Initial capital setup'))
+        
+        return True
     
     def setup_initial_products(self):
         """Setup initial product catalog"""
-        cursor = self.conn.cursor()
-        
         initial_products = [
             ('Celana VPants Basic', 'S', 150000, 80000, 1),
             ('Celana VPants Basic', 'M', 150000, 80000, 1),
@@ -43,21 +42,18 @@ class InitialSetupService:
             ('Celana VPants Basic', 'XXL', 160000, 85000, 1),
         ]
         
-        try:
-            cursor.execute('DELETE FROM products')
-            
-            for product in initial_products:
-                cursor.execute('''
-                    INSERT INTO products (name, size, selling_price, cost_per_piece, pieces_per_pack)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', product)
-            
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        result = run_write(self.conn, self._setup_initial_products, initial_products)
+        catalog.invalidate()
+        return result
+    
+    def _setup_initial_products(self, cursor, initial_products):
+        cursor.execute('DELETE FROM products')
+        cursor.executemany('''
+            INSERT INTO products (name, size, selling_price, cost_per_piece, pieces_per_pack)
+            VALUES (?, ?, ?, ?, ?)
+        ''', initial_products)
+        
+        return True
     
     def get_setup_status(self):
         """Check if system has been initialized"""
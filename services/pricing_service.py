@@ -0,0 +1,244 @@
+"""
+Pricing engine for VPants
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from config.database import get_connection
+from models.pricing import PricingRule, PricingRuleRecord, Quote, QuoteLine
+from models.money import discounted, percent_of, prorate, rupiah
+from services.catalog_service import catalog
+from utils.helpers import rows_to_models
+
+class CompiledRules:
+    """Lookup tables built once from the pricing_rules table"""
+
+    def __init__(self, rules):
+        # product_name -> [(pieces, bundle_price)], largest bundle first
+        self.packs = defaultdict(list)
+        # product_name (None = any) -> sorted min_quantity list + matching rules
+        self.tier_keys = {}
+        self.tier_rules = {}
+        # (channel, product_name, size) -> rule, None acts as wildcard
+        self.channels = {}
+        # bonuses sorted by min_quantity, largest first
+        self.bonuses = []
+
+        tiers = defaultdict(list)
+        for rule in rules:
+            if rule.rule_type == 'pack':
+                self.packs[rule.product_name].append((rule.min_quantity, rupiah(rule.price)))
+            elif rule.rule_type == 'tier':
+                tiers[rule.product_name].append(rule)
+            elif rule.rule_type == 'channel':
+                self.channels[(rule.channel, rule.product_name, rule.size)] = rule
+            elif rule.rule_type == 'bonus':
+                self.bonuses.append(rule)
+
+        for bundles in self.packs.values():
+            bundles.sort(reverse=True)
+        for product_name, product_tiers in tiers.items():
+            product_tiers.sort(key=lambda rule: rule.min_quantity)
+            self.tier_keys[product_name] = [rule.min_quantity for rule in product_tiers]
+            self.tier_rules[product_name] = product_tiers
+        self.bonuses.sort(key=lambda rule: rule.min_quantity, reverse=True)
+
+    def channel_rule(self, channel, product_name, size):
+        """Most specific channel rule for SKU"""
+        for key in ((channel, product_name, size), (channel, product_name, None), (channel, None, None)):
+            rule = self.channels.get(key)
+            if rule:
+                return rule
+        return None
+
+    def tier_rule(self, product_name, quantity):
+        """Highest tier reached by quantity, product tiers before global ones"""
+        for key in (product_name, None):
+            keys = self.tier_keys.get(key)
+            if keys:
+                index = bisect_right(keys, quantity)
+                if index:
+                    return self.tier_rules[key][index - 1]
+        return None
+
+class PricingService:
+    """Prices carts from catalog prices plus pack, tier, channel and bonus rules.
+
+    Rules are stored in the pricing_rules table and compiled into dict/bisect
+    lookups on first use; `invalidate()` drops them after a rule change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = None
+
+    def _load_rules(self):
+        """Read active rules from database"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT rule_type, product_name, size, channel, min_quantity, price,
+                       discount_percent, bonus_product, bonus_size, bonus_quantity, notes, id
+                FROM pricing_rules
+                WHERE active = 1
+            ''')
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        return CompiledRules([PricingRule(*row) for row in rows])
+
+    def _get_rules(self) -> CompiledRules:
+        rules = self._rules
+        if rules is None:
+            with self._lock:
+                if self._rules is None:
+                    self._rules = self._load_rules()
+                rules = self._rules
+        return rules
+
+    def invalidate(self):
+        """Drop compiled rules, next quote reloads them"""
+        with self._lock:
+            self._rules = None
+
+    def unit_price(self, product_name: str, size: str, channel: str = "") -> int:
+        """Unit price for SKU on channel, before cart level rules"""
+        return self._unit_price(self._get_rules(), product_name, size, channel)
+
+    def _unit_price(self, rules, product_name, size, channel):
+        price = rupiah(catalog.get_price(product_name, size))
+        rule = rules.channel_rule(channel, product_name, size) if channel else None
+        if rule:
+            if rule.price:
+                price = rupiah(rule.price)
+            price = discounted(price, rule.discount_percent)
+        return price
+
+    def price_cart(self, items, channel: str = "", discount: float = 0, admin_fee: int = 0) -> Quote:
+        """Price a whole cart in one pass.
+
+        `items` is a list of {'product', 'size', 'quantity'} dicts, the same
+        shape the retail form keeps in session state. Pack bundles and tiers
+        apply to loose pieces per product, `discount` (%) and `admin_fee`
+        apply to the cart total. The total is spread over the lines so every
+        recorded transaction row carries its share.
+        """
+        rules = self._get_rules()
+        lines = []
+        loose = defaultdict(lambda: [0, 0])  # product -> [quantity, gross]
+
+        for item in items:
+            product_name, size, quantity = item['product'], item['size'], int(item['quantity'])
+            if quantity <= 0:
+                continue
+            unit_price = self._unit_price(rules, product_name, size, channel)
+            line = QuoteLine(product_name, size, quantity, unit_price, unit_price * quantity)
+            lines.append(line)
+            if size != 'PACKED':
+                loose[product_name][0] += quantity
+                loose[product_name][1] += line.gross
+
+        subtotal = sum(line.gross for line in lines)
+        adjustments = []
+
+        for product_name, (quantity, gross) in loose.items():
+            remaining = quantity
+
+            for pieces, bundle_price in rules.packs.get(product_name, ()):
+                bundles = remaining // pieces
+                saving = prorate(gross, bundles * pieces, quantity) - bundles * bundle_price
+                if bundles and saving > 0:
+                    adjustments.append((f"Pack {pieces}pcs {product_name} x{bundles}", -saving))
+                    remaining -= bundles * pieces
+
+            tier = rules.tier_rule(product_name, quantity)
+            if tier and remaining:
+                if tier.price:
+                    saving = prorate(gross, remaining, quantity) - remaining * rupiah(tier.price)
+                else:
+                    saving = percent_of(prorate(gross, remaining, quantity), tier.discount_percent)
+                if saving > 0:
+                    adjustments.append((f"Harga grosir {tier.min_quantity}+ pcs {product_name}", -saving))
+
+        total = subtotal + sum(amount for _, amount in adjustments)
+        if discount:
+            discount_amount = percent_of(total, discount)
+            adjustments.append((f"Diskon {discount}%", -discount_amount))
+            total -= discount_amount
+        if admin_fee:
+            admin_fee = rupiah(admin_fee)
+            adjustments.append(("Biaya admin", -admin_fee))
+            total -= admin_fee
+
+        quote = Quote(channel, lines, subtotal, adjustments, total=max(total, 0))
+        self._allocate(quote)
+
+        total_quantity = quote.total_quantity
+        for rule in rules.bonuses:
+            if total_quantity >= rule.min_quantity and rule.bonus_quantity:
+                quote.bonus_items.append(QuoteLine(rule.bonus_product, rule.bonus_size,
+                                                   rule.bonus_quantity, 0, 0))
+                break
+
+        return quote
+
+    def _allocate(self, quote: Quote):
+        """Split quote total over lines by gross, rounding leftovers into the last line"""
+        if not quote.lines:
+            return
+        if not quote.subtotal:
+            for line in quote.lines:
+                line.amount = quote.total // len(quote.lines)
+        else:
+            for line in quote.lines:
+                line.amount = prorate(quote.total, line.gross, quote.subtotal)
+        quote.lines[-1].amount += quote.total - sum(line.amount for line in quote.lines)
+
+    def get_rules(self):
+        """Get all pricing rules for display"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, rule_type, product_name, size, channel, min_quantity, price,
+                       discount_percent, bonus_product, bonus_size, bonus_quantity, active, notes
+                FROM pricing_rules
+                ORDER BY rule_type, product_name, min_quantity
+            ''')
+            return rows_to_models(cursor, PricingRuleRecord)
+        finally:
+            conn.close()
+
+    def add_rule(self, rule: PricingRule):
+        """Add a pricing rule, active immediately"""
+        conn = get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO pricing_rules
+                (rule_type, product_name, size, channel, min_quantity, price,
+                 discount_percent, bonus_product, bonus_size, bonus_quantity, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (rule.rule_type, rule.product_name, rule.size, rule.channel, rule.min_quantity,
+                  rule.price, rule.discount_percent, rule.bonus_product, rule.bonus_size,
+                  rule.bonus_quantity, rule.notes))
+            conn.commit()
+        finally:
+            conn.close()
+        self.invalidate()
+
+    def set_rule_active(self, rule_id: int, active: bool):
+        """Enable or disable a pricing rule"""
+        conn = get_connection()
+        try:
+            conn.execute('UPDATE pricing_rules SET active = ? WHERE id = ?', (1 if active else 0, rule_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self.invalidate()
+
+pricing = PricingService()
+
+def get_pricing() -> PricingService:
+    return pricing
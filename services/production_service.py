@@ -1,71 +1,84 @@
 import sqlite3
 from datetime import datetime, timedelta
 from config.database import get_connection
+from services.catalog_service import catalog
+from services.stock_ledger_service import move_stock
+from services.write_queue import run_write
+from models.money import rupiah
+from models.product import MaterialPrice, ProductionRecord
 from models.transaction import Transaction
-from utils.helpers import safe_float
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
 
+@instrumented
 class ProductionService:
     def __init__(self):
         self.conn = get_connection()
     
     def record_production(self, product_name: str, size: str, quantity: int, 
-                         labor_cost: float, materials_used: list, notes: str = ""):
+                         labor_cost: int, materials_used: list, notes: str = ""):
         """Record production batch dengan materials used"""
-        cursor = self.conn.cursor()
-        
-        try:
-            # Calculate materials cost
-            materials_cost = 0
-            for material in materials_used:
-                material_id = material['material_id']
-                material_qty = material['quantity']
-                
-                # Get material cost
-                cursor.execute('SELECT cost_per_unit FROM raw_materials WHERE id = ?', (material_id,))
-                result = cursor.fetchone()
-                if result:
-                    materials_cost += result[0] * material_qty
-            
-            total_cost = labor_cost + materials_cost
+        result = run_write(self.conn, self._record_production, product_name, size, quantity, labor_cost, materials_used, notes)
+        catalog.invalidate()
+        return result
+    
+    def _record_production(self, cursor, product_name, size, quantity, labor_cost, materials_used, notes):
+        # Calculate materials cost
+        labor_cost = rupiah(labor_cost)
+        materials_cost = 0
+        for material in materials_used:
+            material_id = material['material_id']
+            material_qty = material['quantity']
             
-            # Insert production batch
-            cursor.execute('''
-                INSERT INTO production_batches 
-                (product_name, size, quantity_produced, labor_cost, materials_cost, total_cost, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (product_name, size, quantity, labor_cost, materials_cost, total_cost, notes))
+            # Get material cost
+            cursor.execute('SELECT cost_per_unit FROM raw_materials WHERE id = ?', (material_id,))
+            result = cursor.fetchone()
+            if result:
+                materials_cost += rupiah(result[0] * material_qty)
+        
+        total_cost = labor_cost + materials_cost
+        
+        # Insert production batch
+        cursor.execute('''
+            INSERT INTO production_batches 
+            (product_name, size, quantity_produced, labor_cost, materials_cost, total_cost, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (product_name, size, quantity, labor_cost, materials_cost, total_cost, notes))
+        
+        # Update finished goods stock
+        move_stock(cursor, 'finished', product_name, size, quantity, 'production')
+        
+        # Update raw materials stock (reduce)
+        for material in materials_used:
+            material_id = material['material_id']
+            material_qty = material['quantity']
             
-            # Update finished goods stock
             cursor.execute('''
-                INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                VALUES ('finished', ?, ?, COALESCE(
-                    (SELECT quantity FROM stock WHERE item_type='finished' AND item_name=? AND size=?), 0
-                ) + ?)
-            ''', (product_name, size, product_name, size, quantity))
+                SELECT item_name, size, location FROM stock WHERE item_type = 'material' AND id = ?
+            ''', (material_id,))
+            stock_item = cursor.fetchone()
+            if not stock_item:
+                continue
+            material_name, material_size, material_location = stock_item
             
-            # Update raw materials stock (reduce)
-            for material in materials_used:
-                material_id = material['material_id']
-                material_qty = material['quantity']
-                
-                cursor.execute('''
-                    UPDATE stock SET quantity = quantity - ?
-                    WHERE item_type = 'material' AND id = ?
-                ''', (material_qty, material_id))
-            
-            # Record labor cost as expense
+            # Log material usage, feeds material demand forecast
             cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, notes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', ('expense', 'production_labor', labor_cost, quantity, 
-                  f"Ongkos jahit {quantity}pcs {product_name} {size}"))
-            
-            self.conn.commit()
-            return True
+                INSERT INTO transactions (type, category, amount, quantity, size, notes, product_name)
+                VALUES ('stock_adjustment', 'material_usage', 0, ?, ?, ?, ?)
+            ''', (-material_qty, material_size, f"Pemakaian bahan untuk {quantity}pcs {product_name} {size}",
+                  material_name))
             
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+            move_stock(cursor, 'material', material_name, material_size, -material_qty,
+                       'material_usage', cursor.lastrowid, location=material_location)
+        
+        # Record labor cost as expense
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ('expense', 'production_labor', labor_cost, quantity, 
+              f"Ongkos jahit {quantity}pcs {product_name} {size}"))
+        
+        return True
     
     def get_production_history(self, days: int = 30):
         """Get production history"""
@@ -81,10 +94,10 @@ class ProductionService:
             ORDER BY created_at DESC
         ''', (start_date,))
         
-        return cursor.fetchall()
+        return rows_to_models(cursor, ProductionRecord)
     
     def get_raw_materials(self):
         """Get all raw materials"""
         cursor = self.conn.cursor()
         cursor.execute('SELECT id, name, unit, cost_per_unit FROM raw_materials ORDER BY name')
-        return cursor.fetchall()
+        return rows_to_models(cursor, MaterialPrice)
@@ -2,154 +2,233 @@
 Report service for VPants
 """
 import sqlite3
-from datetime import datetime, timedelta
-from config.database import get_connection
-from utils.helpers import format_currency
+from datetime import date, datetime, timedelta
+from config.database import get_read_connection, read_transaction, transactions_view
+from models.stock import LocationStockStatus, StockStatus
+from models.transaction import SalesDay, TransactionRecord
+from utils.helpers import format_currency, rows_to_frame, rows_to_models
+from utils.metrics import instrumented
 
+WITHDRAWAL_FEE = 3000
+
+# SQL expression giving the first day of the bucket a transaction falls in
+PERIOD_EXPRESSIONS = {
+    'day': "DATE(created_at)",
+    'week': "DATE(created_at, 'weekday 0', '-6 days')",
+    'month': "DATE(created_at, 'start of month')",
+}
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def _shift_period(period: date, granularity: str, steps: int) -> date:
+    """Move a bucket start by whole buckets"""
+    if granularity == 'day':
+        return period + timedelta(days=steps)
+    if granularity == 'week':
+        return period + timedelta(weeks=steps)
+    month = period.year * 12 + period.month - 1 + steps
+    return date(month // 12, month % 12 + 1, 1)
+
+def _period_starts(start: date, end: date, granularity: str):
+    """Bucket start dates covering start..end"""
+    if granularity == 'week':
+        period = start - timedelta(days=start.weekday())
+    elif granularity == 'month':
+        period = start.replace(day=1)
+    else:
+        period = start
+    
+    periods = []
+    while period <= end:
+        periods.append(period)
+        period = _shift_period(period, granularity, 1)
+    return periods
+
+@instrumented
 class ReportService:
     def __init__(self):
-        self.conn = get_connection()
+        self.conn = get_read_connection()
     
     def get_daily_profit(self, date: datetime = None):
         """Calculate daily profit"""
         if date is None:
             date = datetime.now()
         
-        date_str = date.strftime('%Y-%m-%d')
-        
-        cursor = self.conn.cursor()
-        
-        # Get daily income
-        cursor.execute('''
-            SELECT COALESCE(SUM(amount), 0) 
-            FROM transactions 
-            WHERE type IN ('sale', 'se_income') 
-            AND DATE(created_at) = ?
-        ''', (date_str,))
-        
-        daily_income = cursor.fetchone()[0] or 0
-        
-        # Get daily expenses
-        cursor.execute('''
-            SELECT COALESCE(SUM(amount), 0) 
-            FROM transactions 
-            WHERE type IN ('purchase', 'expense', 'production', 'packing') 
-            AND DATE(created_at) = ?
-        ''', (date_str,))
-        
-        daily_expenses = cursor.fetchone()[0] or 0
-        
-        # Add withdrawal fees
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM transactions 
-            WHERE type = 'withdrawal' 
-            AND DATE(created_at) = ?
-        ''', (date_str,))
-        
-        withdrawal_count = cursor.fetchone()[0] or 0
-        withdrawal_fees = withdrawal_count * 3000
-        
-        total_expenses = daily_expenses + withdrawal_fees
-        daily_profit = daily_income - total_expenses
-        
-        # Count total transactions for the day
-        cursor.execute('''
-            SELECT COUNT(*) 
-            FROM transactions 
-            WHERE DATE(created_at) = ?
-        ''', (date_str,))
-        
-        transaction_count = cursor.fetchone()[0] or 0
+        day = self.get_profit_series(date, date)[0]
         
         return {
-            'date': date_str,
-            'income': daily_income,
-            'expenses': total_expenses,
-            'profit': daily_profit,
-            'transaction_count': transaction_count
+            'date': day['period'],
+            'income': day['income'],
+            'expenses': day['expenses'] + day['withdrawal_fees'],
+            'profit': day['profit'],
+            'transaction_count': day['transaction_count']
         }
     
-    def get_sales_report(self, days: int = 30):
-        """Get sales report"""
-        cursor = self.conn.cursor()
-        
+    def get_profit_series(self, start: date, end: date, granularity: str = 'day', as_frame: bool = False):
+        """Income, expenses, withdrawal fees and profit per day/week/month bucket.
+        
+        One grouped query covers the whole range plus the bucket before it, so
+        every bucket (including the first) gets period-over-period deltas.
+        Buckets without transactions are filled with zeros.
+        """
+        if granularity not in PERIOD_EXPRESSIONS:
+            raise ValueError(f"Granularity must be one of {list(PERIOD_EXPRESSIONS)}")
+        
+        start, end = _as_date(start), _as_date(end)
+        periods = _period_starts(start, end, granularity)
+        previous = _shift_period(periods[0], granularity, -1)
+        
+        range_start, range_end = previous.isoformat(), (end + timedelta(days=1)).isoformat()
+        
+        with read_transaction(self.conn) as cursor:
+            cursor.execute(f'''
+                SELECT 
+                    {PERIOD_EXPRESSIONS[granularity]} as period,
+                    COALESCE(SUM(CASE WHEN type IN ('sale', 'se_income') THEN amount END), 0) as income,
+                    COALESCE(SUM(CASE WHEN type IN ('purchase', 'expense', 'production', 'packing') THEN amount END), 0) as expenses,
+                    SUM(CASE WHEN type = 'withdrawal' THEN 1 ELSE 0 END) as withdrawal_count,
+                    COUNT(*) as transaction_count
+                FROM {transactions_view(self.conn, range_start, range_end)} 
+                WHERE created_at >= ? AND created_at < ?
+                GROUP BY period
+            ''', (range_start, range_end))
+            
+            buckets = {row[0]: row[1:] for row in cursor.fetchall()}
+        
+        series = []
+        last = None
+        for period in [previous] + periods:
+            income, expenses, withdrawal_count, transaction_count = buckets.get(period.isoformat(), (0, 0, 0, 0))
+            withdrawal_fees = withdrawal_count * WITHDRAWAL_FEE
+            row = {
+                'period': period.isoformat(),
+                'income': income,
+                'expenses': expenses,
+                'withdrawal_fees': withdrawal_fees,
+                'profit': income - expenses - withdrawal_fees,
+                'transaction_count': transaction_count
+            }
+            if last is not None:
+                row['income_delta'] = row['income'] - last['income']
+                row['expenses_delta'] = row['expenses'] - last['expenses']
+                row['profit_delta'] = row['profit'] - last['profit']
+                row['profit_change_pct'] = (row['profit_delta'] / abs(last['profit']) * 100
+                                            if last['profit'] else None)
+                series.append(row)
+            last = row
+        
+        if as_frame:
+            import pandas as pd
+            frame = pd.DataFrame(series)
+            frame['period'] = pd.to_datetime(frame['period'])
+            return frame
+        return series
+    
+    def get_sales_report(self, days: int = 30, as_frame: bool = False):
+        """Get sales report, as a typed DataFrame when as_frame is set"""
         start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        cursor.execute('''
-            SELECT 
-                strftime('%Y-%m-%d', created_at) as sale_date,
-                COUNT(*) as transaction_count,
-                SUM(amount) as total_sales,
-                SUM(quantity) as total_quantity
-            FROM transactions 
-            WHERE type = 'sale' 
-            AND DATE(created_at) >= ?
-            GROUP BY sale_date
-            ORDER BY sale_date DESC
-        ''', (start_date,))
-        
-        return cursor.fetchall()
+        with read_transaction(self.conn) as cursor:
+            cursor.execute(f'''
+                SELECT 
+                    strftime('%Y-%m-%d', created_at) as sale_date,
+                    COUNT(*) as transaction_count,
+                    SUM(amount) as total_sales,
+                    SUM(quantity) as total_quantity
+                FROM {transactions_view(self.conn, start_date)} 
+                WHERE type = 'sale' 
+                AND created_at >= ?
+                GROUP BY sale_date
+                ORDER BY sale_date DESC
+            ''', (start_date,))
+            
+            if as_frame:
+                return rows_to_frame(cursor, {
+                    'sale_date': 'datetime',
+                    'transaction_count': 'int64',
+                    'total_sales': 'rupiah',
+                    'total_quantity': 'Int64'
+                })
+            return rows_to_models(cursor, SalesDay)
     
-    def get_stock_report(self):
-        """Get stock report"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            SELECT item_type, item_name, size, quantity,
-                   CASE 
-                       WHEN quantity <= 10 THEN 'LOW'
-                       WHEN quantity <= 25 THEN 'MEDIUM' 
-                       ELSE 'HIGH'
-                   END as stock_level
-            FROM stock
-            ORDER BY item_type, item_name, size
-        ''')
-        
-        return cursor.fetchall()
+    def get_stock_report(self, as_frame: bool = False, by_location: bool = False):
+        """Get stock report summed across locations (or per location), as a typed DataFrame when as_frame is set"""
+        columns = 'item_type, item_name, size, location' if by_location else 'item_type, item_name, size'
+        
+        with read_transaction(self.conn) as cursor:
+            cursor.execute(f'''
+                SELECT {columns}, SUM(quantity) as quantity,
+                       CASE 
+                           WHEN SUM(quantity) <= SUM(low_stock_threshold) THEN 'LOW'
+                           WHEN SUM(quantity) <= 25 THEN 'MEDIUM' 
+                           ELSE 'HIGH'
+                       END as stock_level
+                FROM stock
+                GROUP BY {columns}
+                ORDER BY {columns}
+            ''')
+            
+            if as_frame:
+                return rows_to_frame(cursor, {
+                    'item_type': 'category',
+                    'size': 'category',
+                    'location': 'category',
+                    'quantity': 'int64',
+                    'stock_level': 'category'
+                })
+            return rows_to_models(cursor, LocationStockStatus if by_location else StockStatus)
     
     def get_financial_summary(self):
         """Get financial summary"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                current_balance,
-                total_income,
-                total_expenses,
-                (SELECT COUNT(*) FROM transactions WHERE type IN ('sale', 'se_income')) as income_count,
-                (SELECT COUNT(*) FROM transactions WHERE type IN ('purchase', 'expense', 'withdrawal', 'production', 'packing')) as expense_count
-            FROM finance 
-            ORDER BY last_updated DESC LIMIT 1
-        ''')
-        
-        result = cursor.fetchone()
-        if result:
-            return {
-                'current_balance': result[0] or 0,
-                'total_income': result[1] or 0,
-                'total_expenses': result[2] or 0,
-                'income_transactions': result[3] or 0,
-                'expense_transactions': result[4] or 0
-            }
-        return None
+        with read_transaction(self.conn) as cursor:
+            cursor.execute('''
+                SELECT 
+                    current_balance,
+                    total_income,
+                    total_expenses,
+                    (SELECT COUNT(*) FROM transactions WHERE type IN ('sale', 'se_income'))
+                        + (SELECT COALESCE(SUM(income_count), 0) FROM transaction_archives) as income_count,
+                    (SELECT COUNT(*) FROM transactions WHERE type IN ('purchase', 'expense', 'withdrawal', 'production', 'packing'))
+                        + (SELECT COALESCE(SUM(expense_count), 0) FROM transaction_archives) as expense_count
+                FROM finance 
+                ORDER BY id DESC LIMIT 1
+            ''')
+            
+            result = cursor.fetchone()
+            if result:
+                return {
+                    'current_balance': result[0] or 0,
+                    'total_income': result[1] or 0,
+                    'total_expenses': result[2] or 0,
+                    'income_transactions': result[3] or 0,
+                    'expense_transactions': result[4] or 0
+                }
+            return None
     
-    def get_recent_transactions(self, days: int = 7):
-        """Get recent transactions for dashboard"""
-        cursor = self.conn.cursor()
-        
+    def get_recent_transactions(self, days: int = 7, as_frame: bool = False):
+        """Get recent transactions for dashboard, as a typed DataFrame when as_frame is set"""
         start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        cursor.execute('''
-            SELECT type, category, amount, quantity, size, notes, created_at
-            FROM transactions 
-            WHERE DATE(created_at) >= ?
-            ORDER BY created_at DESC
-            LIMIT 10
-        ''', (start_date,))
-        
-        return cursor.fetchall()
+        with read_transaction(self.conn) as cursor:
+            cursor.execute(f'''
+                SELECT type, category, amount, quantity, size, notes, created_at
+                FROM {transactions_view(self.conn, start_date)} 
+                WHERE created_at >= ?
+                ORDER BY created_at DESC
+                LIMIT 10
+            ''', (start_date,))
+            
+            if as_frame:
+                return rows_to_frame(cursor, {
+                    'type': 'category',
+                    'category': 'category',
+                    'amount': 'rupiah',
+                    'quantity': 'Int64',
+                    'created_at': 'datetime'
+                })
+            return rows_to_models(cursor, TransactionRecord)
     
-    def get_transaction_history(self, days: int = 7):
+    def get_transaction_history(self, days: int = 7, as_frame: bool = False):
         """Alias for get_recent_transactions for compatibility"""
-        return self.get_recent_transactions(days)
+        return self.get_recent_transactions(days, as_frame)
@@ -0,0 +1,61 @@
+"""
+Cart stock reservations for VPants
+"""
+import uuid
+from config.database import DEFAULT_LOCATION, get_connection
+from services.stock_ledger_service import OutOfStockError, RESERVED_QUANTITY_SQL, available_stock, release_reservation
+from services.write_queue import run_write
+from utils.metrics import instrumented
+
+RESERVATION_MINUTES = 10
+
+@instrumented
+class ReservationService:
+    """Short-lived holds on finished stock for carts still open in the UI.
+    
+    A cart keeps one token; `hold()` replaces the token's reservations with
+    the current cart and pushes the expiry out again. Sales and checkout
+    called with the same token may use the held stock, everyone else sees
+    it as unavailable until it is sold, released or expires.
+    """
+    
+    def __init__(self):
+        self.conn = get_connection()
+    
+    @staticmethod
+    def new_token():
+        """Token identifying one cart"""
+        return uuid.uuid4().hex
+    
+    def hold(self, token: str, items, minutes: int = RESERVATION_MINUTES, location: str = DEFAULT_LOCATION):
+        """Reserve cart items ({'product', 'size', 'quantity'}), raises OutOfStockError and keeps the old hold"""
+        quantities = {}
+        for item in items:
+            key = (item['product'], item.get('size'))
+            quantities[key] = quantities.get(key, 0) + item['quantity']
+        return run_write(self.conn, self._hold, token, quantities, minutes, location)
+    
+    def _hold(self, cursor, token, quantities, minutes, location):
+        release_reservation(cursor, token)
+        
+        for (product, size), quantity in quantities.items():
+            cursor.execute(f'''
+                INSERT INTO stock_reservations (token, item_type, item_name, size, location, quantity, expires_at)
+                SELECT ?, item_type, item_name, size, location, ?, DATETIME('now', ?)
+                FROM stock
+                WHERE item_type = 'finished' AND item_name = ? AND size IS ? AND location = ?
+                AND quantity - ? >= {RESERVED_QUANTITY_SQL}
+            ''', (token, quantity, f'+{minutes} minutes', product, size, location, quantity, token))
+            if cursor.rowcount == 0:
+                raise OutOfStockError(product, size, quantity,
+                                      available_stock(cursor, 'finished', product, size, token, location),
+                                      location)
+        return True
+    
+    def release(self, token: str):
+        """Drop a cart's reservations"""
+        return run_write(self.conn, release_reservation, token)
+    
+    def get_available(self, product: str, size: str, token: str = None, location: str = DEFAULT_LOCATION):
+        """Stock of a SKU at a location not held by other carts"""
+        return available_stock(self.conn.cursor(), 'finished', product, size, token, location)
@@ -2,99 +2,185 @@
 Sales service for VPants
 """
 import sqlite3
-from config.database import get_connection
+from config.database import DEFAULT_LOCATION, get_connection
+from services.catalog_service import catalog
+from services.pricing_service import pricing
+from services.stock_ledger_service import OutOfStockError, move_stock, release_reservation
+from services.write_queue import run_write
+from models.money import discounted, rupiah
+from models.product import ProductOffer
 from models.transaction import Transaction
+from utils.metrics import instrumented
 
+@instrumented
 class SalesService:
     def __init__(self):
         self.conn = get_connection()
     
-    def record_sale(self, product_name: str, size: str, quantity: int, unit_price: float, 
-                   discount: float = 0, payment_method: str = "", notes: str = ""):
-        """Record a sale transaction"""
-        cursor = self.conn.cursor()
+    def record_sale(self, product_name: str, size: str, quantity: int, unit_price: int = None,
+                   discount: float = 0, payment_method: str = "", notes: str = "", reservation: str = None,
+                   location: str = DEFAULT_LOCATION):
+        """Record a sale from a stock location, raises OutOfStockError when stock not held by other carts runs short"""
+        if quantity <= 0:
+            raise ValueError("Sale quantity must be positive")
+        if unit_price is None:
+            unit_price = pricing.unit_price(product_name, size, payment_method)
+        unit_price = rupiah(unit_price)
+        unit_cost = self._unit_cost(product_name, size)
         
-        try:
-            total_amount = (unit_price * quantity) * (1 - discount/100)
-            
-            # Record transaction
-            cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, size, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', ('sale', 'retail_sale', total_amount, quantity, size, 
-                  f"Penjualan {product_name} {size} - {payment_method} - {notes}"))
-            
-            # Update stock
-            cursor.execute('''
-                UPDATE stock SET quantity = quantity - ?
-                WHERE item_type = 'finished' AND item_name = ? AND size = ?
-            ''', (quantity, product_name, size))
-            
-            # Update finance
-            cursor.execute('''
-                INSERT INTO finance (current_balance, total_income, total_expenses)
-                SELECT 
-                    current_balance + ?,
-                    total_income + ?,
-                    total_expenses
-                FROM finance 
-                ORDER BY last_updated DESC LIMIT 1
-            ''', (total_amount, total_amount))
-            
-            self.conn.commit()
-            return total_amount
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        total_amount = run_write(self.conn, self._record_sale, product_name, size, quantity,
+                                 unit_price, unit_cost, discount, payment_method, notes, reservation, location)
+        catalog.invalidate()
+        return total_amount
     
-    def record_pack_sale(self, pack_name: str, quantity: int, unit_price: float, 
-                        discount: float = 0, payment_method: str = "", notes: str = ""):
+    def _record_sale(self, cursor, product_name, size, quantity, unit_price, unit_cost, discount, payment_method, notes,
+                     reservation, location):
+        total_amount = discounted(unit_price * quantity, discount)
+        
+        # Record transaction
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, size, discount, notes,
+                                      product_name, payment_method, location, gross_amount, cost_amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ('sale', 'retail_sale', total_amount, quantity, size, discount,
+              f"Penjualan {product_name} {size} - {payment_method} - {notes}",
+              product_name, payment_method, location, unit_price * quantity, unit_cost * quantity))
+        
+        # Update stock
+        move_stock(cursor, 'finished', product_name, size, -quantity, 'sale', cursor.lastrowid,
+                   check_available=True, reservation=reservation, location=location)
+        release_reservation(cursor, reservation)
+        
+        # Update finance
+        cursor.execute('''
+            INSERT INTO finance (current_balance, total_income, total_expenses)
+            SELECT
+                current_balance + ?,
+                total_income + ?,
+                total_expenses
+            FROM finance
+            ORDER BY id DESC LIMIT 1
+        ''', (total_amount, total_amount))
+        
+        return total_amount
+    
+    def record_pack_sale(self, pack_name: str, quantity: int, unit_price: int = None,
+                        discount: float = 0, payment_method: str = "", notes: str = "", reservation: str = None,
+                        location: str = DEFAULT_LOCATION):
         """Record pack sale"""
-        cursor = self.conn.cursor()
+        if quantity <= 0:
+            raise ValueError("Sale quantity must be positive")
+        if unit_price is None:
+            unit_price = pricing.unit_price(pack_name, 'PACKED', payment_method)
+        unit_price = rupiah(unit_price)
+        unit_cost = self._unit_cost(pack_name, 'PACKED')
         
-        try:
-            total_amount = (unit_price * quantity) * (1 - discount/100)
-            
-            # Record transaction
-            cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, size, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', ('sale', 'pack_sale', total_amount, quantity, 'PACKED', 
-                  f"Penjualan {pack_name} - {payment_method} - {notes}"))
-            
-            # Update stock
-            cursor.execute('''
-                UPDATE stock SET quantity = quantity - ?
-                WHERE item_type = 'finished' AND item_name = ? AND size = 'PACKED'
-            ''', (quantity, pack_name))
-            
-            # Update finance
-            cursor.execute('''
-                INSERT INTO finance (current_balance, total_income, total_expenses)
-                SELECT 
-                    current_balance + ?,
-                    total_income + ?,
-                    total_expenses
-                FROM finance 
-                ORDER BY last_updated DESC LIMIT 1
-            ''', (total_amount, total_amount))
-            
-            self.conn.commit()
-            return total_amount
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        total_amount = run_write(self.conn, self._record_pack_sale, pack_name, quantity,
+                                 unit_price, unit_cost, discount, payment_method, notes, reservation, location)
+        catalog.invalidate()
+        return total_amount
     
-    def get_available_products(self):
-        """Get available products for sale"""
-        cursor = self.conn.cursor()
+    def _record_pack_sale(self, cursor, pack_name, quantity, unit_price, unit_cost, discount, payment_method, notes,
+                          reservation, location):
+        total_amount = discounted(unit_price * quantity, discount)
+        
+        # Record transaction
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, size, discount, notes,
+                                      product_name, payment_method, location, gross_amount, cost_amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ('sale', 'pack_sale', total_amount, quantity, 'PACKED', discount,
+              f"Penjualan {pack_name} - {payment_method} - {notes}",
+              pack_name, payment_method, location, unit_price * quantity, unit_cost * quantity))
+        
+        # Update stock
+        move_stock(cursor, 'finished', pack_name, 'PACKED', -quantity, 'sale', cursor.lastrowid,
+                   check_available=True, reservation=reservation, location=location)
+        release_reservation(cursor, reservation)
+        
+        # Update finance
+        cursor.execute('''
+            INSERT INTO finance (current_balance, total_income, total_expenses)
+            SELECT
+                current_balance + ?,
+                total_income + ?,
+                total_expenses
+            FROM finance
+            ORDER BY id DESC LIMIT 1
+        ''', (total_amount, total_amount))
+        
+        return total_amount
+    
+    def checkout(self, items, payment_method: str = "", discount: float = 0, admin_fee: int = 0,
+                 notes: str = "", include_bonus: bool = True, reservation: str = None,
+                 location: str = DEFAULT_LOCATION):
+        """Price cart with the pricing engine and record every line in one transaction.
+        
+        Stock at `location` is decremented only while enough is left that
+        other carts have not reserved; otherwise nothing is recorded and
+        OutOfStockError is raised. The cart's own reservation is consumed.
+        A bonus that is out of stock is left off the quote instead.
+        """
+        quote = pricing.price_cart(items, payment_method, discount, admin_fee)
+        lines = [(line, 'pack_sale' if line.size == 'PACKED' else 'retail_sale') for line in quote.lines]
+        if include_bonus:
+            lines += [(line, 'bonus') for line in quote.bonus_items]
+        
+        costs = [self._unit_cost(line.product, line.size) * line.quantity for line, _ in lines]
+        
+        run_write(self.conn, self._checkout, quote, lines, costs, payment_method, discount, notes, reservation, location)
+        catalog.invalidate()
+        return quote
+    
+    def _checkout(self, cursor, quote, lines, costs, payment_method, discount, notes, reservation, location):
+        for (line, category), cost in zip(lines, costs):
+            if category == 'bonus':
+                cursor.execute("SAVEPOINT bonus_line")
+                try:
+                    self._record_line(cursor, line, category, cost, payment_method, discount, notes,
+                                      reservation, location)
+                except OutOfStockError:
+                    cursor.execute("ROLLBACK TO bonus_line")
+                    quote.bonus_items.remove(line)
+                cursor.execute("RELEASE bonus_line")
+            else:
+                self._record_line(cursor, line, category, cost, payment_method, discount, notes,
+                                  reservation, location)
+        release_reservation(cursor, reservation)
+        
+        # Update finance
         cursor.execute('''
-            SELECT name, size, selling_price, quantity 
-            FROM products p
-            LEFT JOIN stock s ON p.name = s.item_name AND p.size = s.size
-            WHERE s.item_type = 'finished' AND s.quantity > 0
-            ORDER BY p.name, p.size
-        ''')
-        return cursor.fetchall()
+            INSERT INTO finance (current_balance, total_income, total_expenses)
+            SELECT
+                current_balance + ?,
+                total_income + ?,
+                total_expenses
+            FROM finance
+            ORDER BY id DESC LIMIT 1
+        ''', (quote.total, quote.total))
+    
+    def _record_line(self, cursor, line, category, cost, payment_method, discount, notes, reservation, location):
+        """Record one cart line and take it out of stock"""
+        # Record transaction
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, size, discount, notes,
+                                      product_name, payment_method, location, gross_amount, cost_amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ('sale', category, line.amount, line.quantity, line.size, discount,
+              f"Penjualan {line.product} {line.size} - {payment_method} - {notes}",
+              line.product, payment_method, location, line.gross, cost))
+        
+        # Update stock
+        move_stock(cursor, 'finished', line.product, line.size, -line.quantity,
+                   'bonus' if category == 'bonus' else 'sale', cursor.lastrowid,
+                   check_available=True, reservation=reservation, location=location)
+    
+    def _unit_cost(self, product_name, size):
+        """Cost per unit from catalog, stored on the sale row for margin analytics"""
+        entry = catalog.get(product_name, size)
+        return rupiah(entry.cost_per_piece) if entry else 0
+    
+    def get_available_products(self):
+        """Get available products for sale from the catalog cache"""
+        return [ProductOffer(entry.name, entry.size, entry.selling_price, entry.stock)
+                for entry in catalog.get_available()]
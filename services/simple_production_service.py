@@ -2,93 +2,89 @@
 Simplified production service for VPants
 """
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from config.database import get_connection
+from services.catalog_service import catalog
+from services.stock_ledger_service import move_stock
+from services.write_queue import run_write
+from models.money import rupiah
+from models.product import MaterialPrice, ProductionTotal
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
 
+@instrumented
 class SimpleProductionService:
     def __init__(self):
         self.conn = get_connection()
     
-    def record_production(self, product_name: str, size: str, quantity: int, cost_per_piece: float):
+    def record_production(self, product_name: str, size: str, quantity: int, cost_per_piece: int):
         """Record simple production - hanya quantity dan cost"""
-        cursor = self.conn.cursor()
+        if quantity <= 0:
+            raise ValueError("Production quantity must be positive")
+        result = run_write(self.conn, self._record_production, product_name, size, quantity, cost_per_piece)
+        catalog.invalidate()
+        return result
+    
+    def _record_production(self, cursor, product_name, size, quantity, cost_per_piece):
+        total_cost = rupiah(cost_per_piece) * quantity
+        
+        # Insert production record
+        cursor.execute('''
+            INSERT INTO production_batches 
+            (product_name, size, quantity_produced, labor_cost, materials_cost, total_cost, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (product_name, size, quantity, total_cost, 0, total_cost, "Produksi sederhana"))
+        
+        # Update finished goods stock
+        move_stock(cursor, 'finished', product_name, size, quantity, 'production')
+        
+        # Record as expense
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ('expense', 'production', total_cost, quantity, f"Produksi {quantity}pcs {product_name} {size}"))
         
-        try:
-            total_cost = cost_per_piece * quantity
-            
-            # Insert production record
-            cursor.execute('''
-                INSERT INTO production_batches 
-                (product_name, size, quantity_produced, labor_cost, materials_cost, total_cost, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (product_name, size, quantity, total_cost, 0, total_cost, "Produksi sederhana"))
-            
-            # Update finished goods stock
-            cursor.execute('''
-                INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                VALUES ('finished', ?, ?, COALESCE(
-                    (SELECT quantity FROM stock WHERE item_type='finished' AND item_name=? AND size=?), 0
-                ) + ?)
-            ''', (product_name, size, product_name, size, quantity))
-            
-            # Record as expense
-            cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, notes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', ('expense', 'production', total_cost, quantity, f"Produksi {quantity}pcs {product_name} {size}"))
-            
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        return True
     
     def get_raw_materials_simple(self):
         """Get simplified raw materials list"""
         return [
-            (1, "Kain Siap Jahit", "pcs", 25000),
-            (2, "Karet Elastis", "meter", 5000),
-            (3, "Benang", "roll", 8000),
-            (4, "Aksesoris Lain", "pcs", 2000),
-            (5, "Kemasan", "pcs", 1500)
+            MaterialPrice(1, "Kain Siap Jahit", "pcs", 25000),
+            MaterialPrice(2, "Karet Elastis", "meter", 5000),
+            MaterialPrice(3, "Benang", "roll", 8000),
+            MaterialPrice(4, "Aksesoris Lain", "pcs", 2000),
+            MaterialPrice(5, "Kemasan", "pcs", 1500)
         ]
     
-    def record_packing(self, product_name: str, pack_size: int, quantity: int, pack_cost: float):
-        """Record packing process"""
-        cursor = self.conn.cursor()
+    def record_packing(self, product_name: str, size: str, pack_size: int, quantity: int, pack_cost: int):
+        """Record packing process, taking the pieces from the given size's stock into the catalog's pack SKU"""
+        if pack_size <= 0 or quantity <= 0:
+            raise ValueError("Pack size and quantity must be positive")
+        pack = catalog.get_pack(product_name, pack_size)
+        if pack is None:
+            raise ValueError(f"No {pack_size}pcs pack of {product_name} in the catalog")
+        result = run_write(self.conn, self._record_packing, product_name, size, pack.name, pack_size, quantity,
+                           pack_cost)
+        catalog.invalidate()
+        return result
+    
+    def _record_packing(self, cursor, product_name, size, pack_name, pack_size, quantity, pack_cost):
+        total_items = pack_size * quantity
+        total_cost = rupiah(pack_cost) * quantity
+        
+        # Update stock (reduce loose items, add packed items), refused when the size has too few pieces
+        move_stock(cursor, 'finished', product_name, size, -total_items, 'packing')
+        
+        # Add packed items
+        move_stock(cursor, 'finished', pack_name, 'PACKED', quantity, 'packing')
+        
+        # Record packing cost
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ('expense', 'packing', total_cost, quantity, f"Packing {quantity} pack @ {pack_size}pcs {product_name} {size}"))
         
-        try:
-            total_items = pack_size * quantity
-            total_cost = pack_cost * quantity
-            
-            # Update stock (reduce loose items, add packed items)
-            cursor.execute('''
-                UPDATE stock SET quantity = quantity - ?
-                WHERE item_type = 'finished' AND item_name = ? AND size IS NULL
-            ''', (total_items, product_name))
-            
-            # Add packed items
-            packed_product_name = f"{product_name} Pack {pack_size}pcs"
-            cursor.execute('''
-                INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                VALUES ('finished', ?, 'PACKED', COALESCE(
-                    (SELECT quantity FROM stock WHERE item_type='finished' AND item_name=? AND size='PACKED'), 0
-                ) + ?)
-            ''', (packed_product_name, packed_product_name, quantity))
-            
-            # Record packing cost
-            cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, notes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', ('expense', 'packing', total_cost, quantity, f"Packing {quantity} pack @ {pack_size}pcs"))
-            
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        return True
     
     def get_production_summary(self, days: int = 30):
         """Get production summary"""
@@ -103,4 +99,4 @@ class SimpleProductionService:
             GROUP BY product_name, size
         ''', (start_date,))
         
-        return cursor.fetchall()
+        return rows_to_models(cursor, ProductionTotal)
@@ -0,0 +1,192 @@
+"""
+Stock movement ledger, availability checks and inventory snapshots for VPants
+"""
+from datetime import datetime, timedelta
+from config.database import DEFAULT_LOCATION, get_connection, get_read_connection, read_transaction
+from models.stock import LocationStockQuantity, StockMovement, StockQuantity
+from services.write_queue import run_write
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
+
+# Quantity held by unexpired cart reservations other than the given token
+RESERVED_QUANTITY_SQL = '''
+    (SELECT COALESCE(SUM(r.quantity), 0) FROM stock_reservations r
+     WHERE r.item_type = stock.item_type AND r.item_name = stock.item_name AND r.size IS stock.size
+     AND r.location = stock.location
+     AND r.expires_at > CURRENT_TIMESTAMP AND r.token IS NOT ?)
+'''
+
+class OutOfStockError(ValueError):
+    """Requested quantity exceeds stock not held by other reservations"""
+    
+    def __init__(self, item_name, size, requested, available, location=DEFAULT_LOCATION):
+        self.item_name = item_name
+        self.size = size
+        self.requested = requested
+        self.available = available
+        self.location = location
+        super().__init__(f"Insufficient stock for {item_name} {size or ''} at {location}: "
+                         f"requested {requested}, available {available}")
+
+def available_stock(cursor, item_type, item_name, size, reservation=None, location=DEFAULT_LOCATION):
+    """Quantity on hand at a location minus what other carts have reserved there"""
+    cursor.execute(f'''
+        SELECT quantity - {RESERVED_QUANTITY_SQL}
+        FROM stock WHERE item_type = ? AND item_name = ? AND size IS ? AND location = ?
+    ''', (reservation, item_type, item_name, size, location))
+    result = cursor.fetchone()
+    return max(result[0], 0) if result else 0
+
+def move_stock(cursor, item_type, item_name, size, change, reason, transaction_id=None,
+               check_available=True, reservation=None, location=DEFAULT_LOCATION):
+    """Change a SKU's quantity at a location and append the movement to the ledger.
+    
+    Creates the stock row when the SKU does not exist there yet. Returns the
+    quantity after the movement. A decrement is conditional on stock not
+    reserved by other carts and raises OutOfStockError instead of going
+    below it; only stocktakes (set_stock) pass check_available=False.
+    Stock that does not exist is never created with a negative quantity.
+    """
+    if check_available and change < 0:
+        cursor.execute(f'''
+            UPDATE stock SET quantity = quantity + ?, last_updated = CURRENT_TIMESTAMP
+            WHERE item_type = ? AND item_name = ? AND size IS ? AND location = ?
+            AND quantity + ? >= {RESERVED_QUANTITY_SQL}
+        ''', (change, item_type, item_name, size, location, change, reservation))
+        if cursor.rowcount == 0:
+            raise OutOfStockError(item_name, size, -change,
+                                  available_stock(cursor, item_type, item_name, size, reservation, location),
+                                  location)
+    else:
+        cursor.execute('''
+            UPDATE stock SET quantity = quantity + ?, last_updated = CURRENT_TIMESTAMP
+            WHERE item_type = ? AND item_name = ? AND size IS ? AND location = ?
+        ''', (change, item_type, item_name, size, location))
+    if cursor.rowcount == 0:
+        if change < 0:
+            raise OutOfStockError(item_name, size, -change, 0, location)
+        cursor.execute('''
+            INSERT INTO stock (item_type, item_name, size, location, quantity)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (item_type, item_name, size, location, change))
+    
+    cursor.execute('''
+        INSERT INTO stock_movements (stock_id, item_type, item_name, size, location, quantity_change,
+                                     quantity_after, reason, transaction_id)
+        SELECT id, item_type, item_name, size, location, ?, quantity, ?, ?
+        FROM stock WHERE item_type = ? AND item_name = ? AND size IS ? AND location = ?
+    ''', (change, reason, transaction_id, item_type, item_name, size, location))
+    
+    cursor.execute('SELECT quantity_after FROM stock_movements WHERE id = ?', (cursor.lastrowid,))
+    return cursor.fetchone()[0]
+
+def release_reservation(cursor, reservation):
+    """Drop a cart's reservations, along with any that have expired"""
+    # Two statements so each one can use its own index
+    if reservation is not None:
+        cursor.execute('DELETE FROM stock_reservations WHERE token = ?', (reservation,))
+    cursor.execute('DELETE FROM stock_reservations WHERE expires_at <= CURRENT_TIMESTAMP')
+
+def set_stock(cursor, item_type, item_name, size, quantity, reason, transaction_id=None, location=DEFAULT_LOCATION):
+    """Set a SKU at a location to an absolute quantity (stocktake), ledgered as the difference"""
+    cursor.execute('''
+        SELECT COALESCE(SUM(quantity), 0) FROM stock
+        WHERE item_type = ? AND item_name = ? AND size IS ? AND location = ?
+    ''', (item_type, item_name, size, location))
+    change = quantity - cursor.fetchone()[0]
+    return move_stock(cursor, item_type, item_name, size, change, reason, transaction_id,
+                      check_available=False, location=location)
+
+def transfer_stock(cursor, item_type, item_name, size, quantity, from_location, to_location):
+    """Move quantity between locations as a ledgered out/in pair, raises OutOfStockError at the source"""
+    if quantity <= 0:
+        raise ValueError("Transfer quantity must be positive")
+    if from_location == to_location:
+        raise ValueError("Transfer needs two different locations")
+    move_stock(cursor, item_type, item_name, size, -quantity, 'transfer_out', location=from_location)
+    return move_stock(cursor, item_type, item_name, size, quantity, 'transfer_in', location=to_location)
+
+@instrumented
+class StockLedgerService:
+    """Historical inventory from snapshots plus the movements recorded after them.
+    
+    A snapshot copies every SKU quantity together with the last movement id it
+    includes, so stock as of any date is the nearest earlier snapshot plus the
+    movements between it and that date.
+    """
+    
+    def __init__(self):
+        self.conn = get_connection()
+        self.read_conn = get_read_connection()
+    
+    def take_snapshot(self):
+        """Snapshot current quantities of every SKU"""
+        return run_write(self.conn, self._take_snapshot)
+    
+    def _take_snapshot(self, cursor):
+        cursor.execute('''
+            INSERT INTO stock_snapshots (last_movement_id)
+            SELECT COALESCE(MAX(id), 0) FROM stock_movements
+        ''')
+        snapshot_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO stock_snapshot_items (snapshot_id, item_type, item_name, size, location, quantity)
+            SELECT ?, item_type, item_name, size, location, SUM(quantity)
+            FROM stock
+            GROUP BY item_type, item_name, size, location
+        ''', (snapshot_id,))
+        return snapshot_id
+    
+    def ensure_snapshot(self, max_age_days: int = 1):
+        """Take a snapshot when the latest one is older than max_age_days"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT MAX(created_at) >= DATETIME('now', ?) FROM stock_snapshots
+        ''', (f'-{max_age_days} days',))
+        if cursor.fetchone()[0]:
+            return None
+        return self.take_snapshot()
+    
+    def get_stock_as_of(self, as_of, by_location: bool = False):
+        """Quantity per SKU (and location when by_location) at the end of a date, or at an exact datetime"""
+        columns = 'item_type, item_name, size, location' if by_location else 'item_type, item_name, size'
+        
+        if isinstance(as_of, datetime):
+            until = as_of.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            until = (as_of + timedelta(days=1)).isoformat()
+        
+        with read_transaction(self.read_conn) as cursor:
+            cursor.execute('''
+                SELECT id, last_movement_id FROM stock_snapshots
+                WHERE created_at < ?
+                ORDER BY id DESC LIMIT 1
+            ''', (until,))
+            snapshot = cursor.fetchone() or (None, 0)
+            
+            cursor.execute(f'''
+                SELECT {columns}, SUM(quantity) as quantity
+                FROM (
+                    SELECT item_type, item_name, size, location, quantity
+                    FROM stock_snapshot_items WHERE snapshot_id = ?
+                    UNION ALL
+                    SELECT item_type, item_name, size, location, quantity_change
+                    FROM stock_movements WHERE id > ? AND created_at < ?
+                )
+                GROUP BY {columns}
+                ORDER BY {columns}
+            ''', (snapshot[0], snapshot[1], until))
+            return rows_to_models(cursor, LocationStockQuantity if by_location else StockQuantity)
+    
+    def get_movements(self, start, end, item_type: str = None):
+        """Ledger rows between two dates (inclusive), newest first"""
+        with read_transaction(self.read_conn) as cursor:
+            cursor.execute('''
+                SELECT item_type, item_name, size, location, quantity_change, quantity_after,
+                       reason, transaction_id, created_at
+                FROM stock_movements
+                WHERE created_at >= ? AND created_at < ?
+                AND (? IS NULL OR item_type = ?)
+                ORDER BY id DESC
+            ''', (start.isoformat(), (end + timedelta(days=1)).isoformat(), item_type, item_type))
+            return rows_to_models(cursor, StockMovement)
@@ -1,30 +1,35 @@
 import sqlite3
 from datetime import datetime
-from config.database import get_connection
-from models.stock import StockItem
-from utils.helpers import safe_float
+from config.database import DEFAULT_LOCATION, get_connection
+from services.catalog_service import catalog
+from services.stock_ledger_service import move_stock, set_stock, transfer_stock
+from services.write_queue import run_write
+from models.stock import Location, LocationSummary, MaterialTotal, SizeTotal, StockItem, StockRecord
+from models.transaction import AdjustmentRecord
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
 
+# Estimated value per unit for the stock value summary
+RAW_UNIT_VALUE = 50000
+FINISHED_UNIT_VALUE = 80000
+
+@instrumented
 class StockManagementService:
     def __init__(self):
         self.conn = get_connection()
     
     def initialize_stock(self, stock_items):
         """Initialize stock with multiple items"""
-        cursor = self.conn.cursor()
+        result = run_write(self.conn, self._initialize_stock, stock_items)
+        catalog.invalidate()
+        return result
+    
+    def _initialize_stock(self, cursor, stock_items):
+        for item in stock_items:
+            set_stock(cursor, item.item_type, item.item_name, item.size, item.quantity, 'initial',
+                      location=item.location)
         
-        try:
-            for item in stock_items:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                    VALUES (?, ?, ?, ?)
-                ''', (item.item_type, item.item_name, item.size, item.quantity))
-            
-            self.conn.commit()
-            return True
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        return True
     
     def get_stock_summary(self):
         """Get complete stock summary"""
@@ -34,10 +39,10 @@ class StockManagementService:
         cursor.execute('''
             SELECT item_name, SUM(quantity) as total_quantity
             FROM stock 
-            WHERE item_type = 'raw'
+            WHERE item_type = 'material'
             GROUP BY item_name
         ''')
-        raw_materials = cursor.fetchall() or []
+        raw_materials = rows_to_models(cursor, MaterialTotal)
         
         # Finished goods summary by size
         cursor.execute('''
@@ -46,19 +51,19 @@ class StockManagementService:
             WHERE item_type = 'finished' AND size IS NOT NULL
             GROUP BY size
         ''')
-        finished_goods = cursor.fetchall() or []
+        finished_goods = rows_to_models(cursor, SizeTotal)
         
         # Total stock value estimation
         cursor.execute('''
             SELECT 
-                COALESCE(SUM(CASE WHEN item_type = 'raw' THEN quantity * 50000 ELSE 0 END), 0) as raw_value,
-                COALESCE(SUM(CASE WHEN item_type = 'finished' THEN quantity * 80000 ELSE 0 END), 0) as finished_value
+                COALESCE(SUM(CASE WHEN item_type = 'material' THEN quantity * ? ELSE 0 END), 0) as raw_value,
+                COALESCE(SUM(CASE WHEN item_type = 'finished' THEN quantity * ? ELSE 0 END), 0) as finished_value
             FROM stock
-        ''')
+        ''', (RAW_UNIT_VALUE, FINISHED_UNIT_VALUE))
         stock_value = cursor.fetchone()
         
-        raw_value = safe_float(stock_value[0]) if stock_value else 0
-        finished_value = safe_float(stock_value[1]) if stock_value else 0
+        raw_value = stock_value[0] if stock_value else 0
+        finished_value = stock_value[1] if stock_value else 0
         
         return {
             'raw_materials': raw_materials,
@@ -67,58 +72,90 @@ class StockManagementService:
             'total_finished_value': finished_value
         }
     
-    def adjust_stock(self, item_type, item_name, adjustment, size=None, notes=""):
-        """Adjust stock quantity (positive or negative)"""
-        cursor = self.conn.cursor()
-        
-        try:
-            # Check current stock
-            if size:
-                cursor.execute('''
-                    SELECT id, quantity FROM stock 
-                    WHERE item_type = ? AND item_name = ? AND size = ?
-                ''', (item_type, item_name, size))
-            else:
-                cursor.execute('''
-                    SELECT id, quantity FROM stock 
-                    WHERE item_type = ? AND item_name = ? AND (size IS NULL OR size = '')
-                ''', (item_type, item_name))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                stock_id, current_quantity = result
-                new_quantity = current_quantity + adjustment
-                
-                if new_quantity < 0:
-                    raise ValueError(f"Stock cannot be negative. Current: {current_quantity}, Adjustment: {adjustment}")
-                
-                cursor.execute('''
-                    UPDATE stock SET quantity = ?, last_updated = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (new_quantity, stock_id))
-            else:
-                if adjustment < 0:
-                    raise ValueError(f"Cannot reduce stock for non-existent item: {item_name}")
-                
-                cursor.execute('''
-                    INSERT INTO stock (item_type, item_name, size, quantity)
-                    VALUES (?, ?, ?, ?)
-                ''', (item_type, item_name, size, adjustment))
-            
-            # Log the adjustment
+    def adjust_stock(self, item_type, item_name, adjustment, size=None, notes="", location=DEFAULT_LOCATION):
+        """Adjust stock quantity at a location (positive or negative)"""
+        result = run_write(self.conn, self._adjust_stock, item_type, item_name, adjustment, size, notes, location)
+        catalog.invalidate()
+        return result
+    
+    def _adjust_stock(self, cursor, item_type, item_name, adjustment, size, notes, location):
+        # Check current stock
+        if size:
             cursor.execute('''
-                INSERT INTO transactions (type, category, amount, quantity, notes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', ('stock_adjustment', f'stock_{item_type}', 0, adjustment, 
-                  f"Stock adjustment: {item_name} {size or ''} - {notes}"))
-            
-            self.conn.commit()
-            return True
+                SELECT id, quantity, size FROM stock 
+                WHERE item_type = ? AND item_name = ? AND size = ? AND location = ?
+            ''', (item_type, item_name, size, location))
+        else:
+            cursor.execute('''
+                SELECT id, quantity, size FROM stock 
+                WHERE item_type = ? AND item_name = ? AND (size IS NULL OR size = '') AND location = ?
+            ''', (item_type, item_name, location))
+        
+        result = cursor.fetchone()
+        
+        if result:
+            stock_id, current_quantity, size = result
+            new_quantity = current_quantity + adjustment
             
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+            if new_quantity < 0:
+                raise ValueError(f"Stock cannot be negative. Current: {current_quantity}, Adjustment: {adjustment}")
+        elif adjustment < 0:
+            raise ValueError(f"Cannot reduce stock for non-existent item: {item_name}")
+        
+        # Log the adjustment
+        cursor.execute('''
+            INSERT INTO transactions (type, category, amount, quantity, size, notes, product_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('stock_adjustment', f'stock_{item_type}', 0, adjustment, size,
+              f"Stock adjustment: {item_name} {size or ''} - {notes}", item_name))
+        
+        move_stock(cursor, item_type, item_name, size, adjustment, 'adjustment', cursor.lastrowid,
+                   location=location)
+        
+        return True
+    
+    def transfer_stock(self, item_type, item_name, quantity, from_location, to_location, size=None):
+        """Move stock between locations, raises OutOfStockError when the source is short"""
+        result = run_write(self.conn, transfer_stock, item_type, item_name, size, quantity,
+                           from_location, to_location)
+        catalog.invalidate()
+        return result
+    
+    def get_locations(self):
+        """Stock locations as (code, name)"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT code, name FROM locations ORDER BY name')
+        return rows_to_models(cursor, Location)
+    
+    def get_stock_by_location(self, item_type: str = None):
+        """Stock per SKU with one column per location and a total, in one grouped query"""
+        import pandas as pd
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT item_type, item_name, COALESCE(size, '') as size, location, SUM(quantity) as quantity
+            FROM stock
+            WHERE ? IS NULL OR item_type = ?
+            GROUP BY item_type, item_name, size, location
+        ''', (item_type, item_type))
+        rows = pd.DataFrame(cursor.fetchall(), columns=['item_type', 'item_name', 'size', 'location', 'quantity'])
+        
+        table = rows.pivot_table(index=['item_type', 'item_name', 'size'], columns='location',
+                                 values='quantity', aggfunc='sum', fill_value=0)
+        table['total'] = table.sum(axis=1)
+        return table.reset_index()
+    
+    def get_location_summary(self):
+        """Item count and total quantity per location and item type"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT l.code, l.name, s.item_type, COUNT(s.id), COALESCE(SUM(s.quantity), 0)
+            FROM locations l
+            LEFT JOIN stock s ON s.location = l.code
+            GROUP BY l.code, s.item_type
+            ORDER BY l.name, s.item_type
+        ''')
+        return rows_to_models(cursor, LocationSummary)
     
     def get_stock_history(self, days=30):
         """Get stock adjustment history"""
@@ -132,45 +169,34 @@ class StockManagementService:
             ORDER BY created_at DESC
         ''', (f'-{days} days',))
         
-        return cursor.fetchall() or []
+        return rows_to_models(cursor, AdjustmentRecord)
     
     def bulk_update_stock(self, updates):
         """Bulk update multiple stock items"""
-        cursor = self.conn.cursor()
-        
-        try:
-            for update in updates:
-                item_type = update['item_type']
-                item_name = update['item_name']
-                quantity = update['quantity']
-                size = update.get('size')
-                
-                if size:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                        VALUES (?, ?, ?, ?)
-                    ''', (item_type, item_name, size, quantity))
-                else:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO stock (item_type, item_name, size, quantity)
-                        VALUES (?, ?, NULL, ?)
-                    ''', (item_type, item_name, quantity))
-            
-            self.conn.commit()
-            return True
+        result = run_write(self.conn, self._bulk_update_stock, updates)
+        catalog.invalidate()
+        return result
+    
+    def _bulk_update_stock(self, cursor, updates):
+        for update in updates:
+            item_type = update['item_type']
+            item_name = update['item_name']
+            quantity = update['quantity']
+            size = update.get('size') or None
+            location = update.get('location', DEFAULT_LOCATION)
             
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+            set_stock(cursor, item_type, item_name, size, quantity, 'stocktake', location=location)
+        
+        return True
     
     def get_all_stock_items(self):
         """Get all stock items for display"""
         cursor = self.conn.cursor()
         
         cursor.execute('''
-            SELECT item_type, item_name, size, quantity, last_updated
+            SELECT item_type, item_name, size, quantity, last_updated, location
             FROM stock 
-            ORDER BY item_type, item_name, size
+            ORDER BY item_type, item_name, size, location
         ''')
         
-        return cursor.fetchall() or []
+        return rows_to_models(cursor, StockRecord)
@@ -1,68 +1,50 @@
 import sqlite3
 from config.database import get_connection
-from models.stock import StockItem
+from services.catalog_service import catalog
+from services.stock_ledger_service import move_stock
+from services.write_queue import run_write
+from models.stock import LowStockItem, StockItem, StockLevel
+from utils.helpers import rows_to_models
+from utils.metrics import instrumented
 
+@instrumented
 class StockService:
     def __init__(self):
         self.conn = get_connection()
     
     def update_stock(self, stock_item: StockItem):
         """Update stock quantity"""
-        cursor = self.conn.cursor()
-        
-        try:
-            # Check if stock item exists
-            cursor.execute('''
-                SELECT id, quantity FROM stock 
-                WHERE item_type = ? AND item_name = ? AND size = ?
-            ''', (stock_item.item_type, stock_item.item_name, stock_item.size))
-            
-            result = cursor.fetchone()
-            
-            if result:
-                # Update existing stock
-                stock_id, current_quantity = result
-                new_quantity = current_quantity + stock_item.quantity
-                cursor.execute('''
-                    UPDATE stock SET quantity = ?, last_updated = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (new_quantity, stock_id))
-            else:
-                # Insert new stock item
-                cursor.execute('''
-                    INSERT INTO stock (item_type, item_name, size, quantity)
-                    VALUES (?, ?, ?, ?)
-                ''', (stock_item.item_type, stock_item.item_name, stock_item.size, stock_item.quantity))
-            
-            self.conn.commit()
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        result = run_write(self.conn, self._update_stock, stock_item)
+        catalog.invalidate()
+        return result
+    
+    def _update_stock(self, cursor, stock_item):
+        # Add to existing stock, or insert new stock item
+        move_stock(cursor, stock_item.item_type, stock_item.item_name, stock_item.size,
+                   stock_item.quantity, 'adjustment', location=stock_item.location)
     
-    def get_stock_levels(self, item_type: str = None):
-        """Get stock levels with optional filtering"""
+    def get_stock_levels(self, item_type: str = None, location: str = None):
+        """Get stock levels with optional filtering, summed across locations unless one is given"""
         cursor = self.conn.cursor()
         
-        if item_type:
-            cursor.execute('''
-                SELECT item_type, item_name, size, quantity, last_updated
-                FROM stock WHERE item_type = ? ORDER BY item_name, size
-            ''', (item_type,))
-        else:
-            cursor.execute('''
-                SELECT item_type, item_name, size, quantity, last_updated
-                FROM stock ORDER BY item_type, item_name, size
-            ''')
+        # Only filter on given columns so location lookups use idx_stock_location
+        filters = [(column, value) for column, value in (('location', location), ('item_type', item_type)) if value]
+        where = ' AND '.join(f'{column} = ?' for column, _ in filters) or '1'
+        cursor.execute(f'''
+            SELECT item_type, item_name, size, SUM(quantity), MAX(last_updated)
+            FROM stock WHERE {where}
+            GROUP BY item_type, item_name, size
+            ORDER BY item_type, item_name, size
+        ''', [value for _, value in filters])
         
-        return cursor.fetchall()
+        return rows_to_models(cursor, StockLevel)
     
-    def get_low_stock_items(self, threshold: int = 10):
-        """Get items with low stock"""
+    def get_low_stock_items(self, threshold: int = None):
+        """Get items with low stock per location, against each item's own threshold unless one is given"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT item_type, item_name, size, quantity
-            FROM stock WHERE quantity <= ? ORDER BY quantity ASC
+            SELECT item_type, item_name, size, quantity, location
+            FROM stock WHERE quantity <= COALESCE(?, low_stock_threshold) ORDER BY quantity ASC
         ''', (threshold,))
         
-        return cursor.fetchall()
+        return rows_to_models(cursor, LowStockItem)
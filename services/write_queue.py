@@ -0,0 +1,177 @@
+"""
+Single writer queue for VPants
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from config.database import get_connection, WRITE_QUEUE_ENABLED
+
+# Seconds BEGIN IMMEDIATE waits for another process's write lock before the group fails
+WRITE_LOCK_TIMEOUT = 5.0
+
+class WriteQueue:
+    """One writer thread applying queued write operations in grouped transactions.
+
+    An operation is a callable taking a cursor as first argument. Operations
+    waiting in the queue are applied together inside one BEGIN IMMEDIATE ...
+    COMMIT, each under its own SAVEPOINT so a failing operation only rolls
+    back itself. Callers wait on the returned Future. When the write lock
+    stays taken for lock_timeout seconds the whole group fails with
+    sqlite3.OperationalError.
+    """
+
+    def __init__(self, max_group_size: int = 64, lock_timeout: float = WRITE_LOCK_TIMEOUT):
+        self.max_group_size = max_group_size
+        self.lock_timeout = lock_timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="vpants-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """Apply what is queued, then stop writer thread"""
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, operation, *args, **kwargs) -> Future:
+        """Queue a write operation, returns Future resolved after its group commits"""
+        future = Future()
+        self._queue.put((operation, args, kwargs, future))
+        return future
+
+    def _next_group(self):
+        """Block for one operation, then take whatever else is already waiting"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        group = [first]
+        while len(group) < self.max_group_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            group.append(item)
+        return group
+
+    def _run(self):
+        conn = get_connection()
+        conn.isolation_level = None  # transactions managed here
+        conn.execute(f"PRAGMA busy_timeout = {int(self.lock_timeout * 1000)}")
+        try:
+            while True:
+                group = self._next_group()
+                if not group:
+                    if self._stopping.is_set() and self._queue.empty():
+                        break
+                    continue
+                self._apply_group(conn, group)
+        finally:
+            conn.close()
+
+    def _apply_group(self, conn, group):
+        cursor = conn.cursor()
+        results = []
+
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, args, kwargs, future in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT write_op")
+                try:
+                    results.append((future, operation(cursor, *args, **kwargs), None))
+                    cursor.execute("RELEASE write_op")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_op")
+                    cursor.execute("RELEASE write_op")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+            _notify_committed()
+
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Operations not reached yet fail too, a failed BEGIN reaches none
+            for operation, args, kwargs, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+_commit_listeners = []
+
+def add_commit_listener(listener):
+    """Call listener() after every write this process commits through run_write"""
+    _commit_listeners.append(listener)
+
+def remove_commit_listener(listener):
+    if listener in _commit_listeners:
+        _commit_listeners.remove(listener)
+
+def _notify_committed():
+    for listener in list(_commit_listeners):
+        listener()
+
+def enable_write_queue(max_group_size: int = 64) -> WriteQueue:
+    """Route service writes through the single writer thread"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(max_group_size)
+            _write_queue.start()
+        return _write_queue
+
+def disable_write_queue():
+    """Drain and stop the writer, services commit on their own connection again"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is not None:
+            _write_queue.stop()
+            _write_queue = None
+
+def get_write_queue():
+    """Active write queue, or None when writes run on the caller's connection"""
+    if _write_queue is None and WRITE_QUEUE_ENABLED:
+        return enable_write_queue()
+    return _write_queue
+
+def run_write(conn, operation, *args, **kwargs):
+    """Run write operation(cursor, ...) and commit.
+
+    Goes through the writer thread when the write queue is enabled, otherwise
+    runs on `conn` directly with commit/rollback.
+    """
+    write_queue = get_write_queue()
+    if write_queue is not None:
+        return write_queue.submit(operation, *args, **kwargs).result()
+
+    cursor = conn.cursor()
+    try:
+        result = operation(cursor, *args, **kwargs)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    _notify_committed()
+    return result
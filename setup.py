@@ -5,7 +5,7 @@ setup(
     version="1.0.0",
     packages=find_packages(),
     install_requires=[
-        "streamlit==1.28.0",
+        "streamlit==1.37.1",
         "pandas==2.0.3", 
         "plotly==5.15.0",
         "Pillow==10.0.1",
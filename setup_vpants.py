@@ -2,7 +2,7 @@
 """
 Script setup awal untuk VPants
 """
-from config.database import init_database
+from config.database import fresh_database
 from services.initial_setup_service import InitialSetupService
 from services.stock_management_service import StockManagementService
 from models.stock import StockItem
@@ -10,8 +10,8 @@ from models.stock import StockItem
 def main():
     print("🚀 Setting up VPants system...")
     
-    # Initialize database
-    init_database()
+    # Initialize database from the prebuilt template
+    fresh_database()
     print("✅ Database initialized")
     
     # Setup services
@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
 import sys
 import os
+import time
+
+script_started = time.perf_counter()
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -30,17 +32,28 @@ else:
 
 # Import services
 try:
-    from config.database import init_database
+    from config.database import ensure_database, init_database
     from services.finance_service import FinanceService
     from services.stock_service import StockService
     from services.stock_management_service import StockManagementService
     from services.initial_setup_service import InitialSetupService
     from services.report_service import ReportService
+    from services.dashboard_service import DashboardService
+    from services.event_service import EventService, start_dispatcher
+    from services.backup_service import BackupService, start_backup_scheduler
+    from services.analytics_service import AnalyticsService
+    from services.forecast_service import ForecastService
+    from services.alert_service import AlertService
+    from services.stock_ledger_service import StockLedgerService
     from services.simple_production_service import SimpleProductionService
     from services.sales_service import SalesService
+    from services.catalog_service import catalog
+    from services.pricing_service import pricing
     from models.transaction import Transaction
     from models.stock import StockItem
-    from utils.helpers import format_currency
+    from utils.helpers import format_currency, format_rupiah
+    from utils.metrics import observe_page_render, start_metrics_server
+    from utils.ui import METRICS_REFRESH_SECONDS
     SERVICES_AVAILABLE = True
 except ImportError as e:
     st.error(f"Error: {e}")
@@ -49,12 +62,20 @@ except ImportError as e:
 # Initialize services
 if SERVICES_AVAILABLE:
     try:
-        init_database()
+        ensure_database()
+        start_dispatcher()
+        start_metrics_server()
+        start_backup_scheduler()
         finance_service = FinanceService()
         stock_service = StockService()
         stock_management = StockManagementService()
         setup_service = InitialSetupService()
         report_service = ReportService()
+        analytics_service = AnalyticsService()
+        forecast_service = ForecastService()
+        alert_service = AlertService()
+        stock_ledger = StockLedgerService()
+        stock_ledger.ensure_snapshot()
         production_service = SimpleProductionService()
         sales_service = SalesService()
     except Exception as e:
@@ -109,6 +130,18 @@ page = st.sidebar.radio(
     ["🏠 Dashboard", "🏭 Produksi", "💰 Penjualan", "📦 Stok", "📈 Laporan", "⚙️ Lainnya"]
 )
 
+# Low stock alerts queued by stock triggers
+if SERVICES_AVAILABLE:
+    pending_alerts = alert_service.get_pending_alerts()
+    if pending_alerts:
+        st.sidebar.markdown("---")
+        st.sidebar.warning(f"🚨 {len(pending_alerts)} stok menipis")
+        for alert in pending_alerts:
+            st.sidebar.write(f"🔴 {alert.item_name} {alert.size or ''} @ {alert.location}: **{alert.quantity}** pcs (batas {alert.threshold})")
+        if st.sidebar.button("✅ Tandai Sudah Dilihat", use_container_width=True):
+            alert_service.acknowledge([alert.id for alert in pending_alerts])
+            st.rerun()
+
 # Header
 st.markdown('<div class="main-header">👙 VPants - Sistem Sederhana</div>', unsafe_allow_html=True)
 
@@ -116,35 +149,80 @@ if not SERVICES_AVAILABLE:
     st.error("❌ System services tidak tersedia")
     st.stop()
 
-# Dashboard
-if page == "🏠 Dashboard":
+# Stock locations for sale and stock forms
+location_names = dict(stock_management.get_locations())
+
+# Display names for StockLevel fields in stock tables
+STOCK_COLUMNS = {'item_type': 'Type', 'item_name': 'Nama', 'size': 'Size', 'quantity': 'Quantity'}
+
+# Page sections - each is a fragment that reruns on its own when its widgets change,
+# creating the services it reads from itself
+
+@st.fragment(run_every=METRICS_REFRESH_SECONDS)
+def dashboard_metrics():
+    """Balance, totals and today's activity from one snapshot, re-read only after a change event"""
+    latest_event = EventService().latest_id()
+    snapshot = st.session_state.get('dashboard_snapshot')
+    if (snapshot is None or snapshot.date != datetime.now().date().isoformat()
+            or st.session_state.get('dashboard_event_id') != latest_event):
+        snapshot = DashboardService().get_snapshot()
+        st.session_state.dashboard_snapshot = snapshot
+        st.session_state.dashboard_event_id = latest_event
+    
     col1, col2, col3 = st.columns(3)
     
-    # Current balance
-    balance = finance_service.get_current_balance()
+    # Current balance and financial summary
     with col1:
-        st.metric("Saldo Saat Ini", format_currency(balance))
+        st.metric("Saldo Saat Ini", format_currency(snapshot.balance))
+    with col2:
+        st.metric("Total Pemasukan", format_currency(snapshot.total_income))
+    with col3:
+        st.metric("Total Pengeluaran", format_currency(snapshot.total_expenses))
     
-    # Financial summary
-    summary = report_service.get_financial_summary()
-    if summary:
-        with col2:
-            st.metric("Total Pemasukan", format_currency(summary['total_income']))
-        with col3:
-            st.metric("Total Pengeluaran", format_currency(summary['total_expenses']))
+    # Recent transactions
+    st.subheader("📋 Aktivitas Terbaru")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pemasukan Hari Ini", format_currency(snapshot.today_income))
+    with col2:
+        st.metric("Pengeluaran Hari Ini", format_currency(snapshot.today_expenses))
+    with col3:
+        profit_color = "green" if snapshot.today_profit >= 0 else "red"
+        st.markdown(f"**Profit Hari Ini:** <span style='color: {profit_color}'>{format_currency(snapshot.today_profit)}</span>", unsafe_allow_html=True)
+    with col4:
+        st.metric("Transaksi Hari Ini", snapshot.today_transactions)
+
+@st.fragment
+def dashboard_stock():
+    """Stock levels coloured by forecast reorder points"""
+    stock_service = StockService()
+    forecast_service = ForecastService()
     
     # Stock overview
     st.subheader("📊 Ringkasan Stok")
     
+    # Status from forecast demand: red at/below reorder point, yellow under two lead times of cover
+    lead_time_days = 7
+    forecast = forecast_service.get_forecast(lead_time_days).set_index(['item_type', 'item_name', 'size'])
+    
+    def stock_status(item_type, item_name, size):
+        key = (item_type, item_name, size or '')
+        if key not in forecast.index:
+            return "🟢"
+        row = forecast.loc[key]
+        if row['needs_reorder']:
+            return "🔴"
+        return "🟡" if row['days_of_cover'] < 2 * lead_time_days else "🟢"
+    
     col1, col2 = st.columns(2)
     with col1:
         st.write("**📦 Bahan Siap Jahit:**")
         materials = stock_service.get_stock_levels('material')
         if materials:
             for material in materials:
-                quantity = material[3]
-                status = "🟢" if quantity > 20 else "🟡" if quantity > 10 else "🔴"
-                st.write(f"{status} {material[1]} {material[2] or ''}: **{quantity}** pcs")
+                status = stock_status('material', material.item_name, material.size)
+                st.write(f"{status} {material.item_name} {material.size or ''}: **{material.quantity}** pcs")
         else:
             st.info("Belum ada stok bahan")
     
@@ -153,26 +231,254 @@ if page == "🏠 Dashboard":
         finished = stock_service.get_stock_levels('finished')
         if finished:
             for item in finished:
-                quantity = item[3]
-                status = "🟢" if quantity > 15 else "🟡" if quantity > 5 else "🔴"
-                st.write(f"{status} {item[1]} {item[2] or ''}: **{quantity}** pcs")
+                status = stock_status('finished', item.item_name, item.size)
+                st.write(f"{status} {item.item_name} {item.size or ''}: **{item.quantity}** pcs")
         else:
             st.info("Belum ada barang jadi")
+
+@st.fragment
+def retail_sale_form():
+    """Single item retail sale"""
+    sales_service = SalesService()
     
-    # Recent transactions
-    st.subheader("📋 Aktivitas Terbaru")
-    daily_report = report_service.get_daily_profit()
+    st.subheader("Penjualan Retail")
     
-    col1, col2, col3, col4 = st.columns(4)
+    # Get available products
+    products = sales_service.get_available_products()
+    
+    with st.form("retail_sale"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if products:
+                product_options = [f"{p.name} {p.size} - {format_currency(p.selling_price)} (Stok: {p.stock or 0})" for p in products]
+                selected_product = st.selectbox("Pilih Produk", product_options)
+                
+                # Extract product info
+                product_parts = selected_product.split(' - ')[0].split(' ')
+                product_name = ' '.join(product_parts[:-1])
+                product_size = product_parts[-1]
+                
+                quantity = st.number_input("Jumlah", min_value=1, value=1)
+            else:
+                st.warning("Tidak ada produk tersedia")
+                product_name = ""
+                product_size = ""
+                quantity = 1
+        
+        with col2:
+            discount = st.number_input("Diskon (%)", min_value=0, max_value=100, value=0)
+            payment_method = st.selectbox("Metode Bayar", ["Cash", "Transfer", "Shopee", "Tokopedia"])
+            location = st.selectbox("Lokasi Stok", list(location_names), format_func=location_names.get)
+            customer_notes = st.text_input("Catatan")
+            
+            cart = [{'product': product_name, 'size': product_size, 'quantity': quantity}]
+            quote = pricing.price_cart(cart, payment_method, discount)
+            for label, amount in quote.adjustments:
+                st.write(f"- {label}: {format_currency(amount)}")
+            st.info(f"**Total Penjualan:** {format_currency(quote.total)}")
+        
+        if st.form_submit_button("💳 Simpan Penjualan"):
+            try:
+                sales_service.checkout(cart, payment_method, discount, notes=customer_notes, include_bonus=False,
+                                       location=location)
+                st.success(f"✅ Penjualan {quantity} pcs {product_name} {product_size} berhasil dicatat!")
+            except Exception as e:
+                st.error(f"❌ Error: {e}")
+
+@st.fragment
+def pack_sale_form():
+    """Pack sale"""
+    sales_service = SalesService()
+    
+    st.subheader("Penjualan Pack")
+    
+    with st.form("pack_sale"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            packs = [entry for entry in catalog.get_entries() if entry.size == 'PACKED']
+            pack_type = st.selectbox("Jenis Pack", [entry.name for entry in packs])
+            quantity = st.number_input("Jumlah Pack", min_value=1, value=1)
+            
+            st.write(f"Harga per pack: {format_currency(pricing.unit_price(pack_type, 'PACKED'))}")
+        
+        with col2:
+            discount = st.number_input("Diskon Pack (%)", min_value=0, max_value=100, value=0)
+            payment_method = st.selectbox("Metode Pembayaran", ["Cash", "Transfer", "Shopee", "Tokopedia"])
+            location = st.selectbox("Lokasi Stok Pack", list(location_names), format_func=location_names.get)
+            customer_notes = st.text_input("Catatan Pelanggan")
+            
+            cart = [{'product': pack_type, 'size': 'PACKED', 'quantity': quantity}]
+            quote = pricing.price_cart(cart, payment_method, discount)
+            st.info(f"**Total Penjualan:** {format_currency(quote.total)}")
+        
+        if st.form_submit_button("📦 Simpan Penjualan Pack"):
+            try:
+                sales_service.checkout(cart, payment_method, discount, notes=customer_notes, include_bonus=False,
+                                       location=location)
+                st.success(f"✅ Penjualan {quantity} pack {pack_type} berhasil dicatat!")
+            except Exception as e:
+                st.error(f"❌ Error: {e}")
+
+@st.fragment
+def report_finance():
+    """Financial summary and daily profit"""
+    report_service = ReportService()
+    
+    st.subheader("Laporan Keuangan")
+    
+    # Financial summary
+    summary = report_service.get_financial_summary()
+    if summary:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Saldo Saat Ini", format_currency(summary['current_balance']))
+        with col2:
+            st.metric("Total Pemasukan", format_currency(summary['total_income']))
+        with col3:
+            st.metric("Total Pengeluaran", format_currency(summary['total_expenses']))
+        with col4:
+            st.metric("Total Transaksi", summary['income_transactions'] + summary['expense_transactions'])
+    
+    # Daily profit
+    st.subheader("Profit Harian")
+    date_input = st.date_input("Pilih Tanggal", datetime.now())
+    
+    if st.button("Generate Laporan Harian"):
+        daily_report = report_service.get_daily_profit(date_input)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Pemasukan", format_currency(daily_report['income']))
+        with col2:
+            st.metric("Pengeluaran", format_currency(daily_report['expenses']))
+        with col3:
+            profit_color = "green" if daily_report['profit'] >= 0 else "red"
+            st.markdown(f"**Profit:** <span style='color: {profit_color}'>{format_currency(daily_report['profit'])}</span>", unsafe_allow_html=True)
+
+@st.fragment
+def report_sales():
+    """Sales per day for a period"""
+    report_service = ReportService()
+    
+    st.subheader("Laporan Penjualan")
+    
+    days = st.slider("Tampilkan data berapa hari terakhir?", 7, 90, 30)
+    
+    if st.button("Generate Laporan Penjualan"):
+        df_sales = report_service.get_sales_report(days, as_frame=True)
+        
+        if not df_sales.empty:
+            # Summary
+            total_sales = df_sales['total_sales'].sum()
+            total_quantity = df_sales['total_quantity'].sum()
+            
+            df_sales.columns = ['Tanggal', 'Jumlah Transaksi', 'Total Penjualan', 'Total Quantity']
+            df_sales['Total Penjualan'] = format_rupiah(df_sales['Total Penjualan'])
+            st.dataframe(df_sales, hide_index=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total Penjualan Period", format_currency(total_sales))
+            with col2:
+                st.metric("Total Quantity Terjual", f"{total_quantity} pcs")
+        else:
+            st.info("Tidak ada data penjualan dalam periode ini")
+
+@st.fragment
+def report_stock():
+    """Current and historical stock"""
+    import pandas as pd
+    
+    report_service = ReportService()
+    stock_ledger = StockLedgerService()
+    
+    st.subheader("Laporan Stok")
+    
+    df_stock = report_service.get_stock_report(as_frame=True)
+    
+    if not df_stock.empty:
+        df_stock.columns = ['Jenis', 'Nama', 'Size', 'Quantity', 'Status']
+        st.dataframe(df_stock, hide_index=True)
+        
+        # Stock alerts
+        low_stock = df_stock[df_stock['Status'] == 'LOW']
+        if not low_stock.empty:
+            st.warning("🚨 Stok Menipis:")
+            st.dataframe(low_stock[['Nama', 'Size', 'Quantity']], hide_index=True)
+    else:
+        st.info("Tidak ada data stok")
+    
+    # Historical inventory from snapshots + movement ledger
+    st.write("**📅 Stok per Tanggal:**")
+    as_of = st.date_input("Tanggal", value=datetime.now().date(), key="stock_as_of")
+    stock_as_of = stock_ledger.get_stock_as_of(as_of)
+    if stock_as_of:
+        df_as_of = pd.DataFrame(stock_as_of, columns=['Jenis', 'Nama', 'Size', 'Quantity'])
+        st.dataframe(df_as_of, hide_index=True)
+    else:
+        st.info("Tidak ada data stok pada tanggal ini")
+
+@st.fragment
+def report_profit():
+    """Profit and loss per period"""
+    report_service = ReportService()
+    
+    st.subheader("Laporan Laba Rugi")
+    
+    col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Pemasukan Hari Ini", format_currency(daily_report['income']))
+        start_date = st.date_input("Dari Tanggal", datetime.now() - timedelta(days=365))
     with col2:
-        st.metric("Pengeluaran Hari Ini", format_currency(daily_report['expenses']))
+        end_date = st.date_input("Sampai Tanggal", datetime.now())
     with col3:
-        profit_color = "green" if daily_report['profit'] >= 0 else "red"
-        st.markdown(f"**Profit Hari Ini:** <span style='color: {profit_color}'>{format_currency(daily_report['profit'])}</span>", unsafe_allow_html=True)
-    with col4:
-        st.metric("Transaksi Hari Ini", daily_report['transaction_count'])
+        granularity = st.selectbox("Periode", ["month", "week", "day"],
+                                   format_func={"month": "Bulanan", "week": "Mingguan", "day": "Harian"}.get)
+    
+    df_profit = report_service.get_profit_series(start_date, end_date, granularity, as_frame=True)
+    
+    st.bar_chart(df_profit.set_index('period')[['income', 'expenses', 'profit']])
+    
+    df_view = df_profit[['period', 'income', 'expenses', 'withdrawal_fees', 'profit', 'profit_delta']].copy()
+    df_view.columns = ['Periode', 'Pemasukan', 'Pengeluaran', 'Biaya Penarikan', 'Profit', 'Perubahan Profit']
+    for column in df_view.columns[1:]:
+        df_view[column] = format_rupiah(df_view[column])
+    st.dataframe(df_view, hide_index=True)
+
+@st.fragment
+def report_margin():
+    """Margin per product, size, channel, location or period"""
+    analytics_service = AnalyticsService()
+    
+    st.subheader("Margin per Produk")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        margin_start = st.date_input("Dari", datetime.now() - timedelta(days=90), key="margin_start")
+    with col2:
+        margin_end = st.date_input("Sampai", datetime.now(), key="margin_end")
+    with col3:
+        dimensions = st.multiselect("Kelompokkan per", ["product_name", "size", "payment_method", "location", "period"],
+                                    default=["product_name"])
+    
+    if dimensions:
+        df_margin = analytics_service.get_margin_report(margin_start, margin_end, dimensions)
+        
+        if not df_margin.empty:
+            for column in ['gross', 'revenue', 'cogs', 'gross_margin', 'discount_leakage']:
+                df_margin[column] = format_rupiah(df_margin[column])
+            df_margin['margin_pct'] = df_margin['margin_pct'].round(1)
+            df_margin['leakage_pct'] = df_margin['leakage_pct'].round(1)
+            st.dataframe(df_margin, hide_index=True)
+        else:
+            st.info("Tidak ada penjualan dalam periode ini")
+
+
+# Dashboard
+if page == "🏠 Dashboard":
+    dashboard_metrics()
+    dashboard_stock()
 
 # Produksi
 elif page == "🏭 Produksi":
@@ -213,7 +519,9 @@ elif page == "🏭 Produksi":
             
             with col1:
                 product_type = st.selectbox("Produk untuk Packing", ["Celana Dalam VPants"])
-                pack_size = st.selectbox("Ukuran Pack", [1, 3, 5, 10])
+                pack_item_size = st.selectbox("Size", ["S", "M", "L", "XL", "XXL"], key="packing_size")
+                pack_size = st.selectbox("Ukuran Pack", sorted({entry.pieces_per_pack for entry in catalog.get_entries()
+                                                                if entry.size == 'PACKED'}))
                 quantity_packs = st.number_input("Jumlah Pack", min_value=1, value=5)
             
             with col2:
@@ -229,7 +537,7 @@ elif page == "🏭 Produksi":
             
             if st.form_submit_button("📦 Proses Packing"):
                 try:
-                    production_service.record_packing(product_type, pack_size, quantity_packs, pack_cost)
+                    production_service.record_packing(product_type, pack_item_size, pack_size, quantity_packs, pack_cost)
                     st.success(f"✅ Berhasil packing {quantity_packs} pack @ {pack_size}pcs")
                 except Exception as e:
                     st.error(f"❌ Error: {e}")
@@ -241,92 +549,18 @@ elif page == "💰 Penjualan":
     tab1, tab2 = st.tabs(["🛒 Penjualan Retail", "📦 Penjualan Pack"])
     
     with tab1:
-        st.subheader("Penjualan Retail")
-        
-        # Get available products
-        products = sales_service.get_available_products()
-        
-        with st.form("retail_sale"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if products:
-                    product_options = [f"{p[0]} {p[1]} - {format_currency(p[2])} (Stok: {p[3] or 0})" for p in products]
-                    selected_product = st.selectbox("Pilih Produk", product_options)
-                    
-                    # Extract product info
-                    product_parts = selected_product.split(' - ')[0].split(' ')
-                    product_name = ' '.join(product_parts[:-1])
-                    product_size = product_parts[-1]
-                    
-                    quantity = st.number_input("Jumlah", min_value=1, value=1)
-                    unit_price = st.number_input("Harga per pcs", min_value=0, value=75000)
-                else:
-                    st.warning("Tidak ada produk tersedia")
-                    product_name = ""
-                    product_size = ""
-                    quantity = 1
-                    unit_price = 0
-            
-            with col2:
-                discount = st.number_input("Diskon (%)", min_value=0, max_value=100, value=0)
-                payment_method = st.selectbox("Metode Bayar", ["Cash", "Transfer", "Shopee", "Tokopedia"])
-                customer_notes = st.text_input("Catatan")
-                
-                total_amount = (unit_price * quantity) * (1 - discount/100)
-                st.info(f"**Total Penjualan:** {format_currency(total_amount)}")
-            
-            if st.form_submit_button("💳 Simpan Penjualan"):
-                try:
-                    sales_service.record_sale(product_name, product_size, quantity, unit_price, discount, payment_method, customer_notes)
-                    st.success(f"✅ Penjualan {quantity} pcs {product_name} {product_size} berhasil dicatat!")
-                except Exception as e:
-                    st.error(f"❌ Error: {e}")
+        retail_sale_form()
     
     with tab2:
-        st.subheader("Penjualan Pack")
-        
-        with st.form("pack_sale"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                pack_type = st.selectbox("Jenis Pack", [
-                    "Celana Dalam Pack 3pcs",
-                    "Celana Dalam Pack 5pcs", 
-                    "Celana Dalam Pack 10pcs"
-                ])
-                quantity = st.number_input("Jumlah Pack", min_value=1, value=1)
-                
-                # Set prices based on pack type
-                if "3pcs" in pack_type:
-                    unit_price = 200000
-                elif "5pcs" in pack_type:
-                    unit_price = 300000
-                else:
-                    unit_price = 550000
-                
-                st.write(f"Harga per pack: {format_currency(unit_price)}")
-            
-            with col2:
-                discount = st.number_input("Diskon Pack (%)", min_value=0, max_value=100, value=0)
-                payment_method = st.selectbox("Metode Pembayaran", ["Cash", "Transfer", "Shopee", "Tokopedia"])
-                customer_notes = st.text_input("Catatan Pelanggan")
-                
-                total_amount = (unit_price * quantity) * (1 - discount/100)
-                st.info(f"**Total Penjualan:** {format_currency(total_amount)}")
-            
-            if st.form_submit_button("📦 Simpan Penjualan Pack"):
-                try:
-                    sales_service.record_pack_sale(pack_type, quantity, unit_price, discount, payment_method, customer_notes)
-                    st.success(f"✅ Penjualan {quantity} pack {pack_type} berhasil dicatat!")
-                except Exception as e:
-                    st.error(f"❌ Error: {e}")
+        pack_sale_form()
 
 # Stok
 elif page == "📦 Stok":
+    import pandas as pd
+    
     st.header("📦 Management Stok")
     
-    tab1, tab2 = st.tabs(["📊 Lihat Stok", "✏️ Update Stok"])
+    tab1, tab2, tab3 = st.tabs(["📊 Lihat Stok", "✏️ Update Stok", "🚚 Transfer Stok"])
     
     with tab1:
         st.subheader("Stok Saat Ini")
@@ -337,7 +571,7 @@ elif page == "📦 Stok":
             st.write("**📦 Bahan Mentah:**")
             materials = stock_service.get_stock_levels('material')
             if materials:
-                df_materials = pd.DataFrame(materials, columns=['Type', 'Nama', 'Size', 'Quantity'])
+                df_materials = pd.DataFrame(materials).rename(columns=STOCK_COLUMNS)
                 st.dataframe(df_materials[['Nama', 'Size', 'Quantity']], hide_index=True)
             else:
                 st.info("Belum ada stok bahan")
@@ -346,10 +580,28 @@ elif page == "📦 Stok":
             st.write("**👙 Barang Jadi:**")
             finished = stock_service.get_stock_levels('finished')
             if finished:
-                df_finished = pd.DataFrame(finished, columns=['Type', 'Nama', 'Size', 'Quantity'])
+                df_finished = pd.DataFrame(finished).rename(columns=STOCK_COLUMNS)
                 st.dataframe(df_finished[['Nama', 'Size', 'Quantity']], hide_index=True)
             else:
                 st.info("Belum ada barang jadi")
+        
+        st.write("**📍 Stok per Lokasi:**")
+        df_locations = stock_management.get_stock_by_location()
+        if not df_locations.empty:
+            st.dataframe(df_locations.rename(columns=location_names), hide_index=True)
+        
+        with st.expander("🚨 Batas Stok Menipis"):
+            with st.form("threshold_form"):
+                items = stock_service.get_stock_levels()
+                item = st.selectbox("Item", items, format_func=lambda row: f"{row.item_name} {row.size or ''}")
+                threshold = st.number_input("Batas Minimum", min_value=0, value=10)
+                
+                if st.form_submit_button("💾 Simpan Batas"):
+                    try:
+                        alert_service.set_threshold(item.item_type, item.item_name, item.size, threshold)
+                        st.success(f"✅ Batas {item.item_name} {item.size or ''} diset ke {threshold}")
+                    except Exception as e:
+                        st.error(f"❌ Error: {e}")
     
     with tab2:
         st.subheader("Update Stok Manual")
@@ -368,6 +620,7 @@ elif page == "📦 Stok":
                     size = st.selectbox("Ukuran", ["S", "M", "L", "XL", "UMUM"])
                 quantity = st.number_input("Quantity", value=0)
                 adjustment_type = st.selectbox("Tipe Adjustment", ["Tambah", "Kurangi"])
+                location = st.selectbox("Lokasi", list(location_names), format_func=location_names.get)
             
             notes = st.text_input("Catatan")
             
@@ -376,93 +629,55 @@ elif page == "📦 Stok":
                     final_quantity = quantity if adjustment_type == "Tambah" else -quantity
                     stock_type = "material" if item_type == "Bahan Mentah" else "finished"
                     
-                    stock_item = StockItem(stock_type, item_name, final_quantity, size)
+                    stock_item = StockItem(stock_type, item_name, final_quantity, size, location=location)
                     stock_service.update_stock(stock_item)
                     
                     st.success("✅ Stok berhasil diupdate!")
                 except Exception as e:
                     st.error(f"❌ Error: {e}")
+    
+    with tab3:
+        st.subheader("Transfer Antar Lokasi")
+        
+        with st.form("stock_transfer"):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                items = stock_service.get_stock_levels()
+                item = st.selectbox("Item", items, format_func=lambda row: f"{row.item_name} {row.size or ''}")
+                quantity = st.number_input("Jumlah", min_value=1, value=1)
+            
+            with col2:
+                from_location = st.selectbox("Dari", list(location_names), format_func=location_names.get)
+                to_location = st.selectbox("Ke", list(location_names), index=1, format_func=location_names.get)
+            
+            if st.form_submit_button("🚚 Transfer"):
+                try:
+                    stock_management.transfer_stock(item.item_type, item.item_name, quantity, from_location, to_location, item.size)
+                    st.success(f"✅ {quantity} {item.item_name} {item.size or ''} dipindah ke {location_names[to_location]}")
+                except Exception as e:
+                    st.error(f"❌ Error: {e}")
 
 # Laporan
 elif page == "📈 Laporan":
     st.header("📈 Laporan & Analytics")
     
-    tab1, tab2, tab3 = st.tabs(["💰 Keuangan", "📊 Penjualan", "📦 Stok"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["💰 Keuangan", "📊 Penjualan", "📦 Stok", "📅 Laba Rugi", "💹 Margin"])
     
     with tab1:
-        st.subheader("Laporan Keuangan")
-        
-        # Financial summary
-        summary = report_service.get_financial_summary()
-        if summary:
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Saldo Saat Ini", format_currency(summary['current_balance']))
-            with col2:
-                st.metric("Total Pemasukan", format_currency(summary['total_income']))
-            with col3:
-                st.metric("Total Pengeluaran", format_currency(summary['total_expenses']))
-            with col4:
-                st.metric("Total Transaksi", summary['income_transactions'] + summary['expense_transactions'])
-        
-        # Daily profit
-        st.subheader("Profit Harian")
-        date_input = st.date_input("Pilih Tanggal", datetime.now())
-        
-        if st.button("Generate Laporan Harian"):
-            daily_report = report_service.get_daily_profit(date_input)
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Pemasukan", format_currency(daily_report['income']))
-            with col2:
-                st.metric("Pengeluaran", format_currency(daily_report['expenses']))
-            with col3:
-                profit_color = "green" if daily_report['profit'] >= 0 else "red"
-                st.markdown(f"**Profit:** <span style='color: {profit_color}'>{format_currency(daily_report['profit'])}</span>", unsafe_allow_html=True)
+        report_finance()
     
     with tab2:
-        st.subheader("Laporan Penjualan")
-        
-        days = st.slider("Tampilkan data berapa hari terakhir?", 7, 90, 30)
-        
-        if st.button("Generate Laporan Penjualan"):
-            sales_data = report_service.get_sales_report(days)
-            
-            if sales_data:
-                df_sales = pd.DataFrame(sales_data, columns=['Tanggal', 'Jumlah Transaksi', 'Total Penjualan', 'Total Quantity'])
-                df_sales['Total Penjualan'] = df_sales['Total Penjualan'].apply(format_currency)
-                st.dataframe(df_sales, hide_index=True)
-                
-                # Summary
-                total_sales = sum(row[2] for row in sales_data)
-                total_quantity = sum(row[3] for row in sales_data)
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Total Penjualan Period", format_currency(total_sales))
-                with col2:
-                    st.metric("Total Quantity Terjual", f"{total_quantity} pcs")
-            else:
-                st.info("Tidak ada data penjualan dalam periode ini")
+        report_sales()
     
     with tab3:
-        st.subheader("Laporan Stok")
-        
-        stock_report = report_service.get_stock_report()
-        
-        if stock_report:
-            df_stock = pd.DataFrame(stock_report, columns=['Jenis', 'Nama', 'Size', 'Quantity', 'Status'])
-            st.dataframe(df_stock, hide_index=True)
-            
-            # Stock alerts
-            low_stock = [item for item in stock_report if item[4] == 'LOW']
-            if low_stock:
-                st.warning("🚨 Stok Menipis:")
-                for item in low_stock:
-                    st.write(f"- {item[1]} {item[2] or ''}: {item[3]} pcs")
-        else:
-            st.info("Tidak ada data stok")
+        report_stock()
+    
+    with tab4:
+        report_profit()
+    
+    with tab5:
+        report_margin()
 
 # Lainnya
 elif page == "⚙️ Lainnya":
@@ -478,8 +693,9 @@ elif page == "⚙️ Lainnya":
         with col1:
             if st.button("🔄 Reset Database", type="secondary"):
                 try:
+                    backup = BackupService().create_backup()
                     init_database()
-                    st.success("✅ Database berhasil direset!")
+                    st.success(f"✅ Database berhasil direset! Backup data lama: {backup.path}")
                 except Exception as e:
                     st.error(f"❌ Error: {e}")
             
@@ -520,3 +736,6 @@ st.sidebar.markdown("""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+if SERVICES_AVAILABLE:
+    observe_page_render(page, time.perf_counter() - script_started)
@@ -2,6 +2,12 @@
 """
 Test database constraints
 """
+import sqlite3
+from datetime import date
+
+import pytest
+
+import config.database as database
 from config.database import get_connection
 
 def test_transaction_types():
@@ -40,5 +46,329 @@ def test_transaction_types():
     
     conn.close()
 
+# Schema of the first release, before pricing, locations, the stock ledger and the outbox
+BASELINE_SCHEMA = """
+    CREATE TABLE products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, size TEXT NOT NULL,
+        selling_price DECIMAL(10,2) NOT NULL, cost_per_piece DECIMAL(10,2) NOT NULL,
+        pieces_per_pack INTEGER NOT NULL DEFAULT 1, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL CHECK(type IN ('sale', 'purchase', 'expense', 'withdrawal', 'se_income',
+                                          'stock_adjustment', 'initial_balance', 'production', 'packing')),
+        category TEXT NOT NULL, amount DECIMAL(10,2) NOT NULL, quantity INTEGER, size TEXT, unit TEXT,
+        discount DECIMAL(5,2) DEFAULT 0, notes TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE stock (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_type TEXT NOT NULL CHECK(item_type IN ('material', 'finished')),
+        item_name TEXT NOT NULL, size TEXT, quantity INTEGER NOT NULL,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE production_batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, product_name TEXT NOT NULL, size TEXT NOT NULL,
+        quantity_produced INTEGER NOT NULL, labor_cost DECIMAL(10,2) NOT NULL,
+        materials_cost DECIMAL(10,2) NOT NULL, total_cost DECIMAL(10,2) NOT NULL, notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE finance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, current_balance DECIMAL(10,2) DEFAULT 0,
+        total_income DECIMAL(10,2) DEFAULT 0, total_expenses DECIMAL(10,2) DEFAULT 0,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO products (name, size, selling_price, cost_per_piece) VALUES ('Celana Dalam VPants', 'M', 75000, 35000);
+    INSERT INTO transactions (type, category, amount) VALUES ('sale', 'lama', 12345.5);
+    INSERT INTO finance (current_balance, total_income, total_expenses) VALUES (1000.49, 2.5, 0);
+    INSERT INTO stock (item_type, item_name, size, quantity) VALUES ('finished', 'Celana Dalam VPants', 'M', 4);
+    INSERT INTO stock (item_type, item_name, size, quantity) VALUES ('finished', 'Celana Dalam VPants', 'M', 6);
+"""
+
+def test_baseline_migration(tmp_path):
+    """Database dari rilis pertama: skema lengkap, nominal rupiah utuh, layanan langsung jalan"""
+    from models.stock import StockItem
+    from services.sales_service import SalesService
+    from services.stock_ledger_service import StockLedgerService
+    from services.stock_service import StockService
+    
+    database.DB_PATH = tmp_path / "vpants.db"
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    
+    assert database.migrate_database()
+    assert not database.migrate_database()
+    assert list((tmp_path / "backups").glob("vpants-*.db"))
+    
+    conn = sqlite3.connect(database.DB_PATH)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    assert conn.execute("SELECT amount, typeof(amount) FROM transactions WHERE category = 'lama'").fetchone() \
+        == (12346, 'integer')
+    assert conn.execute("SELECT current_balance, total_income FROM finance ORDER BY id DESC LIMIT 1").fetchone() == (1000, 3)
+    # Duplicate SKU rows merged, so the unique stock index could be built
+    assert conn.execute("SELECT quantity, location FROM stock WHERE size = 'M'").fetchall() == [(10, 'home')]
+    conn.close()
+    
+    StockService().update_stock(StockItem('finished', 'Celana Dalam VPants', 5, 'M'))
+    SalesService().record_sale('Celana Dalam VPants', 'M', 2, payment_method='Cash')
+    assert StockLedgerService().get_stock_as_of(date.today()) == [('finished', 'Celana Dalam VPants', 'M', 13)]
+
+def test_write_queue_lock_timeout(tmp_path):
+    """Kunci tulis dipegang proses lain: antrian menyerah dengan OperationalError, tidak menggantung"""
+    from services.write_queue import WriteQueue
+    
+    database.DB_PATH = tmp_path / "vpants.db"
+    database.fresh_database()
+    holder = sqlite3.connect(database.DB_PATH, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    
+    write_queue = WriteQueue(lock_timeout=0.2)
+    write_queue.start()
+    try:
+        insert = lambda cursor: cursor.execute("INSERT INTO locations (code, name) VALUES ('pop-up', 'Pop-up')")
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            write_queue.submit(insert).result(timeout=10)
+        
+        holder.execute("ROLLBACK")
+        write_queue.submit(insert).result(timeout=10)
+    finally:
+        write_queue.stop()
+        holder.close()
+    
+    conn = sqlite3.connect(database.DB_PATH)
+    assert conn.execute("SELECT name FROM locations WHERE code = 'pop-up'").fetchone() == ('Pop-up',)
+    conn.close()
+
+def test_pack_then_sell():
+    """Hasil packing masuk ke SKU pack di katalog dan bisa langsung dijual"""
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_ledger_service import OutOfStockError
+    
+    production = SimpleProductionService()
+    production.record_production('Celana Dalam VPants', 'M', 20, 30000)
+    production.record_packing('Celana Dalam VPants', 'M', 3, 5, 5000)
+    with pytest.raises(ValueError):
+        production.record_packing('Celana Dalam VPants', 'M', 4, 1, 5000)
+    
+    sales = SalesService()
+    assert sales.record_pack_sale('Celana Dalam Pack 3pcs', 1) == 200000
+    with pytest.raises(OutOfStockError):
+        sales.record_pack_sale('Celana Dalam Pack 3pcs', 5)
+    
+    conn = get_connection()
+    assert conn.execute('''
+        SELECT item_name, size, quantity FROM stock WHERE item_type = 'finished' AND quantity > 0 ORDER BY item_name
+    ''').fetchall() == [('Celana Dalam Pack 3pcs', 'PACKED', 4), ('Celana Dalam VPants', 'M', 5)]
+    conn.close()
+
+def test_backup_verify_rotate(tmp_path):
+    """Backup online lolos integrity check, rotasi menyisakan backup terbaru, restore mengembalikan data"""
+    from datetime import datetime, timedelta
+    from services.backup_service import BackupService, verify_backup
+    
+    database.DB_PATH = tmp_path / "vpants.db"
+    database.fresh_database()
+    service = BackupService()
+    backup = service.create_backup()
+    verify_backup(backup.path)
+    
+    broken = tmp_path / "broken.db"
+    broken.write_bytes(b"bukan database" * 100)
+    with pytest.raises(sqlite3.DatabaseError):
+        verify_backup(broken)
+    
+    # Nine older daily backups, rotation keeps the newest three days
+    for days in range(1, 10):
+        stamp = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d-%H%M%S")
+        (tmp_path / "backups" / f"vpants-{stamp}.db").write_bytes(open(backup.path, "rb").read())
+    deleted = service.rotate(keep_daily=3, keep_weekly=0, keep_monthly=0)
+    assert len(deleted) == 7
+    assert [b.path for b in service.get_backups()][0] == backup.path
+    assert len(service.get_backups()) == 3
+    assert service.run_scheduled(interval_hours=1) is None
+    
+    conn = get_connection()
+    conn.execute("INSERT INTO locations (code, name) VALUES ('pop-up', 'Pop-up')")
+    conn.commit()
+    conn.close()
+    service.restore_backup(backup.path)
+    conn = get_connection()
+    assert conn.execute("SELECT 1 FROM locations WHERE code = 'pop-up'").fetchone() is None
+    conn.close()
+
+def test_pricing_mixed_cart():
+    """Harga keranjang campuran: bundling pack, pack jadi, diskon dan bonus 5+ pcs"""
+    from services.pricing_service import pricing
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    
+    cart = [{'product': 'Celana Dalam VPants', 'size': 'M', 'quantity': 4},
+            {'product': 'Celana Dalam VPants', 'size': 'L', 'quantity': 4},
+            {'product': 'Celana Dalam Pack 3pcs', 'size': 'PACKED', 'quantity': 1}]
+    quote = pricing.price_cart(cart, 'Cash', discount=10)
+    # 8 loose pieces bundle as one 5pcs and one 3pcs pack, the packed item keeps its own price
+    assert quote.subtotal == 800000
+    assert quote.adjustments == [('Pack 5pcs Celana Dalam VPants x1', -75000),
+                                 ('Pack 3pcs Celana Dalam VPants x1', -25000), ('Diskon 10%', -70000)]
+    assert quote.total == 630000
+    assert sum(line.amount for line in quote.lines) == quote.total
+    assert [(b.product, b.size, b.quantity) for b in quote.bonus_items] == [('Celana Dalam VPants', 'M', 1)]
+    assert not pricing.price_cart(cart[:1]).bonus_items
+    
+    production = SimpleProductionService()
+    production.record_production('Celana Dalam VPants', 'M', 8, 30000)
+    production.record_production('Celana Dalam VPants', 'L', 4, 30000)
+    production.record_packing('Celana Dalam VPants', 'M', 3, 1, 0)
+    SalesService().checkout(cart, 'Cash', discount=10)
+    
+    conn = get_connection()
+    assert conn.execute("SELECT SUM(amount) FROM transactions WHERE type = 'sale'").fetchone()[0] == 630000
+    assert conn.execute("SELECT product_name, size, quantity FROM transactions WHERE category = 'bonus'").fetchall() \
+        == [('Celana Dalam VPants', 'M', 1)]
+    conn.close()
+
+def test_reservation_blocks_competing_sale():
+    """Stok yang ditahan keranjang lain tidak bisa dijual, keranjang pemegangnya tetap bisa"""
+    from services.reservation_service import ReservationService
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_ledger_service import OutOfStockError
+    
+    SimpleProductionService().record_production('Celana Dalam VPants', 'M', 5, 30000)
+    reservations = ReservationService()
+    token = reservations.new_token()
+    reservations.hold(token, [{'product': 'Celana Dalam VPants', 'size': 'M', 'quantity': 4}])
+    
+    sales = SalesService()
+    with pytest.raises(OutOfStockError) as refused:
+        sales.record_sale('Celana Dalam VPants', 'M', 2)
+    assert (refused.value.requested, refused.value.available) == (2, 1)
+    with pytest.raises(OutOfStockError):
+        reservations.hold(reservations.new_token(), [{'product': 'Celana Dalam VPants', 'size': 'M', 'quantity': 2}])
+    
+    sales.record_sale('Celana Dalam VPants', 'M', 4, reservation=token)
+    sales.record_sale('Celana Dalam VPants', 'M', 1)
+    conn = get_connection()
+    assert conn.execute("SELECT quantity FROM stock WHERE item_name = 'Celana Dalam VPants' AND size = 'M'").fetchone() == (0,)
+    assert conn.execute("SELECT COUNT(*) FROM stock_reservations").fetchone() == (0,)
+    conn.close()
+
+def test_low_stock_alert_trigger():
+    """Alert masuk saat stok turun ke batas minimum dan selesai sendiri setelah restock"""
+    from models.stock import StockItem
+    from services.alert_service import AlertService
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_service import StockService
+    
+    alerts = AlertService()
+    before = alerts.count_pending()
+    SimpleProductionService().record_production('Celana Dalam VPants', 'M', 20, 30000)
+    assert alerts.count_pending() == before
+    
+    sales = SalesService()
+    sales.record_sale('Celana Dalam VPants', 'M', 11)
+    sales.record_sale('Celana Dalam VPants', 'M', 1)
+    pending = [alert for alert in alerts.get_pending_alerts() if alert.item_name == 'Celana Dalam VPants']
+    assert [(alert.size, alert.quantity, alert.threshold) for alert in pending] == [('M', 9, 10)]
+    
+    StockService().update_stock(StockItem('finished', 'Celana Dalam VPants', 5, 'M'))
+    assert alerts.count_pending() == before
+    
+    alerts.set_threshold('finished', 'Celana Dalam VPants', 'M', 15)
+    assert [(alert.quantity, alert.threshold) for alert in alerts.get_pending_alerts()
+            if alert.item_name == 'Celana Dalam VPants'] == [(13, 15)]
+    assert alerts.acknowledge() == before + 1
+    assert alerts.count_pending() == 0
+
+def test_stock_as_of_snapshot():
+    """Stok per tanggal = snapshot terakhir sebelum tanggal itu + mutasi sesudahnya"""
+    from datetime import datetime, timedelta
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_ledger_service import StockLedgerService
+    
+    ledger = StockLedgerService()
+    SimpleProductionService().record_production('Celana Dalam VPants', 'M', 10, 30000)
+    ledger.take_snapshot()
+    
+    # Snapshot and the movement before it date from yesterday; the movement itself is gone,
+    # so yesterday's 10 can only come from the snapshot
+    yesterday = date.today() - timedelta(days=1)
+    conn = get_connection()
+    conn.execute("UPDATE stock_snapshots SET created_at = ?", (f"{yesterday} 10:00:00",))
+    conn.execute("DELETE FROM stock_movements")
+    conn.commit()
+    
+    SalesService().record_sale('Celana Dalam VPants', 'M', 3)
+    conn.execute("UPDATE stock_movements SET created_at = ?", (f"{date.today()} 09:00:00",))
+    conn.commit()
+    conn.close()
+    
+    def as_of(when):
+        return [row.quantity for row in ledger.get_stock_as_of(when) if row.item_name == 'Celana Dalam VPants']
+    
+    assert as_of(yesterday) == [10]
+    assert as_of(date.today()) == [7]
+    assert as_of(datetime.combine(date.today(), datetime.min.time()).replace(hour=8)) == [10]
+    assert as_of(yesterday - timedelta(days=1)) == []
+
+def test_transfer_between_locations():
+    """Transfer antar lokasi tercatat sebagai keluar/masuk, stok sumber tidak bisa minus"""
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_ledger_service import OutOfStockError, StockLedgerService
+    from services.stock_management_service import StockManagementService
+    
+    SimpleProductionService().record_production('Celana Dalam VPants', 'M', 10, 30000)
+    stock = StockManagementService()
+    stock.transfer_stock('finished', 'Celana Dalam VPants', 4, 'home', 'reseller', size='M')
+    with pytest.raises(OutOfStockError):
+        stock.transfer_stock('finished', 'Celana Dalam VPants', 5, 'reseller', 'shopee', size='M')
+    with pytest.raises(ValueError):
+        stock.transfer_stock('finished', 'Celana Dalam VPants', 1, 'home', 'home', size='M')
+    
+    rows = StockLedgerService().get_stock_as_of(date.today(), by_location=True)
+    assert [(row.location, row.quantity) for row in rows if row.item_name == 'Celana Dalam VPants'] \
+        == [('home', 6), ('reseller', 4)]
+    conn = get_connection()
+    assert conn.execute('''
+        SELECT reason, location, quantity_change FROM stock_movements
+        WHERE reason LIKE 'transfer%' ORDER BY id
+    ''').fetchall() == [('transfer_out', 'home', -4), ('transfer_in', 'reseller', 4)]
+    conn.close()
+
+def test_archive_year_reads_through_view(tmp_path):
+    """Tahun buku yang diarsip pindah ke archive_YYYY.db dan tetap terbaca laporan"""
+    from services.archive_service import ArchiveService
+    from services.report_service import ReportService
+    
+    database.DB_PATH = tmp_path / "vpants.db"
+    database.fresh_database()
+    year = date.today().year - 1
+    conn = get_connection()
+    conn.executemany('''
+        INSERT INTO transactions (type, category, amount, created_at) VALUES (?, ?, ?, ?)
+    ''', [('sale', 'retail_sale', 100000, f"{year}-03-10 10:00:00"),
+          ('expense', 'listrik', 40000, f"{year}-03-15 10:00:00"),
+          ('sale', 'retail_sale', 75000, f"{year + 1}-01-05 10:00:00")])
+    conn.commit()
+    
+    archives = ArchiveService()
+    assert archives.get_archivable_years() == [year]
+    archive = archives.archive_year(year)
+    assert (archive.row_count, archive.income_count, archive.expense_count) == (2, 1, 1)
+    assert (tmp_path / f"archive_{year}.db").exists()
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (1,)
+    conn.close()
+    assert archives.get_archivable_years() == []
+    
+    series = ReportService().get_profit_series(date(year, 3, 1), date(year + 1, 1, 31), 'month')
+    totals = {row['period']: (row['income'], row['expenses']) for row in series}
+    assert totals[f"{year}-03-01"] == (100000, 40000)
+    assert totals[f"{year + 1}-01-01"] == (75000, 0)
+    with pytest.raises(ValueError):
+        archives.archive_year(date.today().year)
+
 if __name__ == "__main__":
     test_transaction_types()
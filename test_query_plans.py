@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Query plan regression test for hot-path service calls
+
+Runs the hot paths against a fixture database sized like a few years of
+trading, records every statement they issue and checks its EXPLAIN QUERY
+PLAN: no full scan of a large table, and the same plan as pinned in
+query_plans.json. After an intended change, re-pin with
+    python test_query_plans.py --update
+"""
+import json
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import config.database as database
+
+PINNED_PLANS = Path(__file__).with_name("query_plans.json")
+
+# Tables with more rows than this in the fixture must not be scanned on a hot path
+LARGE_TABLE_ROWS = 1000
+
+FIXTURE_DAYS = 730
+FIXTURE_TRANSACTIONS = 60000
+FIXTURE_PRODUCTS = 100
+SIZES = ('S', 'M', 'L', 'XL', 'XXL')
+LOCATIONS = ('home', 'reseller', 'shopee')
+
+def build_fixture(path: Path):
+    """Database with two years of sales, a large catalog, ledger and outbox"""
+    database.DB_PATH = path
+    database.fresh_database()
+    
+    rng = random.Random(42)
+    products = [f"Produk {i:03d}" for i in range(FIXTURE_PRODUCTS)]
+    start = datetime.now() - timedelta(days=FIXTURE_DAYS)
+    
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT INTO products (name, size, selling_price, cost_per_piece, pieces_per_pack)
+        VALUES (?, ?, ?, ?, 1)
+    ''', [(name, size, 75000, 35000) for name in products for size in SIZES])
+    cursor.executemany('''
+        INSERT INTO stock (item_type, item_name, size, location, quantity, low_stock_threshold)
+        VALUES ('finished', ?, ?, ?, ?, 10)
+    ''', [(name, size, location, rng.randint(0, 200))
+          for name in products for size in SIZES for location in LOCATIONS])
+    
+    sales = []
+    for i in range(FIXTURE_TRANSACTIONS):
+        created_at = (start + timedelta(seconds=i * FIXTURE_DAYS * 86400 // FIXTURE_TRANSACTIONS)).strftime('%Y-%m-%d %H:%M:%S')
+        kind = rng.random()
+        if kind < 0.8:
+            sales.append(('sale', 'retail_sale', 75000, 1, rng.choice(SIZES), rng.choice(products),
+                          rng.choice(LOCATIONS), created_at))
+        else:
+            sales.append(('expense', 'production', 35000, 1, None, None, None, created_at))
+    cursor.executemany('''
+        INSERT INTO transactions (type, category, amount, quantity, size, product_name, location, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', sales)
+    cursor.execute('''
+        INSERT INTO finance (current_balance, total_income, total_expenses, last_updated)
+        SELECT 1000000 + id * 1000, id * 1000, 0, created_at FROM transactions
+    ''')
+    cursor.execute('''
+        INSERT INTO stock_movements (stock_id, item_type, item_name, size, location, quantity_change,
+                                     quantity_after, reason, transaction_id, created_at)
+        SELECT s.id, 'finished', t.product_name, t.size, t.location, -1, s.quantity, 'sale', t.id, t.created_at
+        FROM transactions t
+        JOIN stock s ON s.item_type = 'finished' AND s.item_name = t.product_name
+            AND s.size = t.size AND s.location = t.location
+        WHERE t.type = 'sale'
+    ''')
+    cursor.executemany('''
+        INSERT INTO stock_reservations (token, item_type, item_name, size, location, quantity, expires_at)
+        VALUES (?, 'finished', ?, ?, 'home', 1, DATETIME('now', ?))
+    ''', [(f"cart{i}", rng.choice(products), rng.choice(SIZES), f"{rng.randint(-60, 10)} minutes")
+          for i in range(2000)])
+    conn.commit()
+    conn.close()
+    
+    from services.catalog_service import catalog
+    from services.stock_ledger_service import StockLedgerService
+    catalog.invalidate()
+    StockLedgerService().take_snapshot()
+
+def hot_paths():
+    """Label -> call for every path that runs per click, sale or dashboard refresh"""
+    from models.stock import StockItem
+    from services.alert_service import AlertService
+    from services.dashboard_service import DashboardService
+    from services.event_service import EventService
+    from services.report_service import ReportService
+    from services.reservation_service import ReservationService
+    from services.sales_service import SalesService
+    from services.simple_production_service import SimpleProductionService
+    from services.stock_management_service import StockManagementService
+    from services.stock_service import StockService
+    
+    cart = [{'product': 'Produk 001', 'size': 'M', 'quantity': 1}, {'product': 'Produk 002', 'size': 'L', 'quantity': 1}]
+    return {
+        'record_sale': lambda: SalesService().record_sale('Produk 001', 'M', 1, payment_method='Cash'),
+        'checkout': lambda: SalesService().checkout(cart, 'Cash', reservation='pos-1'),
+        'reservation_hold': lambda: ReservationService().hold('pos-1', cart),
+        'reservation_available': lambda: ReservationService().get_available('Produk 001', 'M', 'pos-1'),
+        'record_production': lambda: SimpleProductionService().record_production('Produk 003', 'S', 10, 30000),
+        'update_stock': lambda: StockService().update_stock(StockItem('finished', 'Produk 004', 5, 'M')),
+        'adjust_stock': lambda: StockManagementService().adjust_stock('finished', 'Produk 005', -1, 'M'),
+        'transfer_stock': lambda: StockManagementService().transfer_stock('finished', 'Produk 006', 1, 'home', 'shopee', 'L'),
+        'stock_levels': lambda: StockService().get_stock_levels('finished'),
+        'stock_levels_location': lambda: StockService().get_stock_levels('finished', 'shopee'),
+        'dashboard_snapshot': lambda: DashboardService().get_snapshot(),
+        'daily_profit': lambda: ReportService().get_daily_profit(),
+        'recent_transactions': lambda: ReportService().get_recent_transactions(),
+        'pending_alerts': lambda: AlertService().get_pending_alerts(),
+        'events_latest': lambda: EventService().latest_id(),
+        'events_read': lambda: EventService().read('pos-sync'),
+    }
+
+def normalize(sql: str) -> str:
+    """Statement with literals replaced by ? and whitespace collapsed, the pin key"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'(?<![\w.])-?\d+(?:\.\d+)?\b', '?', sql)
+    return ' '.join(sql.split())
+
+def collect_statements(call):
+    """Data statements issued while running call, in order, without repeats"""
+    seen = []
+    database.set_statement_tracer(seen.append)
+    try:
+        call()
+    finally:
+        database.set_statement_tracer(None)
+    
+    statements = {}
+    for sql in seen:
+        if re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', sql, re.IGNORECASE):
+            statements.setdefault(normalize(sql), sql)
+    return statements
+
+def explain(conn, sql: str):
+    """EXPLAIN QUERY PLAN detail lines"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+def _aliases(sql: str):
+    """Alias (or name) -> table for FROM/JOIN clauses"""
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|ON|JOIN|LEFT|GROUP|ORDER|SET|VALUES|SELECT|LIMIT)(\w+))?',
+                                   sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+def full_scans(sql: str, plan, large_tables):
+    """Large tables the plan reads in full without an index"""
+    aliases = _aliases(sql)
+    # Newest-rows lookups walk the rowid backwards and stop at the limit
+    bounded = re.search(r'ORDER BY (?:\w+\.)?id DESC LIMIT', sql, re.IGNORECASE) and \
+        not any('TEMP B-TREE' in line for line in plan)
+    scans = []
+    for line in plan:
+        match = re.match(r'SCAN (\w+)$', line)
+        if not match or bounded:
+            continue
+        table = aliases.get(match.group(1), match.group(1))
+        if table in large_tables:
+            scans.append(table)
+    return scans
+
+def collect_plans(path: Path):
+    """Label -> [(normalized sql, plan)] for every hot path, plus large table names"""
+    build_fixture(path)
+    conn = database.get_read_connection()
+    large_tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                    if conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] > LARGE_TABLE_ROWS}
+    
+    plans = {}
+    for label, call in hot_paths().items():
+        plans[label] = [(key, sql, explain(conn, sql)) for key, sql in collect_statements(call).items()]
+    conn.close()
+    return plans, large_tables
+
+def _pins(plans):
+    return {label: [{'sql': key, 'plan': plan} for key, _, plan in statements]
+            for label, statements in plans.items()}
+
+def test_query_plans():
+    """Hot paths avoid full scans of large tables and keep their pinned plans"""
+    with tempfile.TemporaryDirectory() as tmp:
+        plans, large_tables = collect_plans(Path(tmp) / "fixture.db")
+    
+    problems = []
+    for label, statements in plans.items():
+        for key, sql, plan in statements:
+            for table in full_scans(sql, plan, large_tables):
+                problems.append(f"{label}: full scan of {table}\n    {key}\n    {plan}")
+    
+    pinned = json.loads(PINNED_PLANS.read_text()) if PINNED_PLANS.exists() else {}
+    for label, statements in _pins(plans).items():
+        if pinned.get(label) != statements:
+            problems.append(f"{label}: query plans differ from {PINNED_PLANS.name}\n"
+                            f"    now: {json.dumps(statements, indent=2)}\n"
+                            f"    pinned: {json.dumps(pinned.get(label), indent=2)}")
+    
+    assert not problems, ("Query plan regressions (re-pin intended changes with "
+                          "`python test_query_plans.py --update`):\n" + "\n".join(problems))
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        with tempfile.TemporaryDirectory() as tmp:
+            plans, _ = collect_plans(Path(tmp) / "fixture.db")
+        PINNED_PLANS.write_text(json.dumps(_pins(plans), indent=2, ensure_ascii=False) + "\n")
+        print(f"✅ Pinned {sum(len(s) for s in plans.values())} statements in {PINNED_PLANS.name}")
+    else:
+        test_query_plans()
+        print("✅ Query plans OK")
@@ -1,4 +1,6 @@
+import functools
 from datetime import datetime
+from models.money import rupiah_array
 
 def format_currency(amount: float) -> str:
     """Format amount as Indonesian Rupiah"""
@@ -6,6 +8,49 @@ def format_currency(amount: float) -> str:
         return "Rp 0"
     return f"Rp {amount:,.0f}".replace(",", ".")
 
+def format_rupiah(amounts):
+    """Format a whole column as Indonesian Rupiah, vectorized format_currency"""
+    import pandas as pd
+    
+    amounts = pd.to_numeric(pd.Series(amounts), errors='coerce').fillna(0).round().astype('int64')
+    return "Rp " + amounts.astype(str).str.replace(r'\B(?=(\d{3})+$)', '.', regex=True)
+
+def rows_to_frame(cursor, dtypes=None):
+    """Build a typed DataFrame from a cursor's result set, columns named after the SELECT.
+    
+    dtypes for columns the query did not select are ignored; 'rupiah' makes whole
+    rupiah int64, also from amounts stored before the integer migration.
+    """
+    import pandas as pd
+    
+    columns = [column[0] for column in cursor.description]
+    frame = pd.DataFrame(cursor.fetchall(), columns=columns)
+    
+    for column, dtype in (dtypes or {}).items():
+        if column not in frame:
+            continue
+        if dtype == 'datetime':
+            frame[column] = pd.to_datetime(frame[column])
+        elif dtype == 'rupiah':
+            frame[column] = rupiah_array(frame[column])
+        else:
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+@functools.lru_cache(maxsize=None)
+def row_factory(model):
+    """sqlite3 row factory building model instances (NamedTuple) straight from result rows"""
+    make = model._make
+    return lambda cursor, row: make(row)
+
+def rows_to_models(cursor, model):
+    """Fetch the rest of a cursor's result set as a list of model instances"""
+    cursor.row_factory = row_factory(model)
+    try:
+        return cursor.fetchall()
+    finally:
+        cursor.row_factory = None
+
 def parse_date(date_str: str) -> datetime:
     """Parse date string to datetime object"""
     return datetime.strptime(date_str, '%Y-%m-%d')
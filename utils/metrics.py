@@ -0,0 +1,204 @@
+"""
+Prometheus-style metrics for VPants
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local port of the /metrics endpoint started by start_metrics_server()
+METRICS_PORT = int(os.environ.get("VPANTS_METRICS_PORT", "9108"))
+
+# Latency histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = ((name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+class MetricsRegistry:
+    """Counters and histograms kept in process, rendered in Prometheus text format"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+    
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+    
+    def inc(self, name: str, labels=(), amount: float = 1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def observe(self, name: str, value: float, labels=()):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(LATENCY_BUCKETS) + [0, 0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += 1
+            histogram[-1] += value
+    
+    def render(self, gauges=()) -> str:
+        """Text exposition of every metric plus (name, labels, value) gauges"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        
+        lines = []
+        described = set()
+        
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                help_kind, help_text = self._help.get(name, (kind, name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {help_kind}")
+        
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram[-2]}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram[-2]}")
+        
+        for name, labels, value in gauges:
+            header(name, 'gauge')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('vpants_service_calls_total', 'counter', 'Service method calls by outcome')
+metrics.describe('vpants_service_latency_seconds', 'histogram', 'Service method latency')
+metrics.describe('vpants_db_busy_errors_total', 'counter', 'Calls that failed with database is locked/busy')
+metrics.describe('vpants_page_render_seconds', 'histogram', 'Streamlit page script run time')
+metrics.describe('vpants_db_file_bytes', 'gauge', 'Database file size')
+metrics.describe('vpants_db_wal_bytes', 'gauge', 'WAL file size, grows until checkpointed')
+metrics.describe('vpants_db_page_count', 'gauge', 'Database pages')
+metrics.describe('vpants_db_page_size', 'gauge', 'Database page size in bytes')
+metrics.describe('vpants_db_freelist_count', 'gauge', 'Unused database pages')
+metrics.describe('vpants_db_cache_size', 'gauge', 'Page cache size per connection (negative: KiB)')
+metrics.describe('vpants_outbox_last_id', 'gauge', 'Id of the newest change event')
+metrics.describe('vpants_backup_age_seconds', 'gauge', 'Age of the newest verified backup')
+
+def _is_busy(error) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+def instrumented(cls):
+    """Class decorator counting and timing every public method of a service"""
+    service = cls.__name__
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith('_') or not isinstance(attribute, types.FunctionType):
+            continue
+        setattr(cls, name, _timed(service, name, attribute))
+    return cls
+
+def _timed(service, method, func):
+    labels = (('service', service), ('method', method))
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = func(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        except ValueError:
+            # Validation and out of stock, the request was refused rather than failed
+            outcome = 'rejected'
+            raise
+        except Exception as e:
+            if _is_busy(e):
+                metrics.inc('vpants_db_busy_errors_total', labels)
+            raise
+        finally:
+            metrics.observe('vpants_service_latency_seconds', time.perf_counter() - start, labels)
+            metrics.inc('vpants_service_calls_total', labels + (('outcome', outcome),))
+    return wrapper
+
+def observe_page_render(page: str, seconds: float):
+    """Record one Streamlit script run for a page"""
+    metrics.observe('vpants_page_render_seconds', seconds, (('page', page),))
+
+def database_gauges():
+    """Current database file, WAL and page statistics as gauges"""
+    from config.database import DB_PATH, backup_dir, get_read_connection
+    
+    gauges = []
+    for name, path in (('vpants_db_file_bytes', f"{DB_PATH}"), ('vpants_db_wal_bytes', f"{DB_PATH}-wal")):
+        gauges.append((name, (), os.path.getsize(path) if os.path.exists(path) else 0))
+    backups = [path.stat().st_mtime for path in backup_dir().glob('vpants-*.db')]
+    if backups:
+        gauges.append(('vpants_backup_age_seconds', (), round(time.time() - max(backups))))
+    
+    try:
+        conn = get_read_connection()
+    except sqlite3.Error:
+        return gauges
+    try:
+        for pragma in ('page_count', 'page_size', 'freelist_count', 'cache_size'):
+            gauges.append((f'vpants_db_{pragma}', (), conn.execute(f'PRAGMA {pragma}').fetchone()[0]))
+        gauges.append(('vpants_outbox_last_id', (), conn.execute('SELECT COALESCE(MAX(id), 0) FROM outbox').fetchone()[0]))
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+    return gauges
+
+def render_metrics() -> str:
+    """Everything /metrics serves"""
+    return metrics.render(database_gauges())
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1"):
+    """Serve /metrics from a background thread once per process, None when the port is taken"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {e}")
+                _server = False
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="vpants-metrics", daemon=True).start()
+        return _server or None
@@ -0,0 +1,5 @@
+"""
+Streamlit helpers for VPants
+"""
+# Dashboard metrics check for change events this often, and re-query only when there are some
+METRICS_REFRESH_SECONDS = 5